@@ -14,7 +14,78 @@ def get_env(name: str, default: str | None = None):
 CASSANDRA_HOST = get_env("CASSANDRA_HOST", "cassandra")
 CASSANDRA_PORT = int(get_env("CASSANDRA_PORT", "9042"))
 CASSANDRA_KEYSPACE = get_env("CASSANDRA_KEYSPACE", "foros")
+# Varios contact points separados por coma; si no se define se usa CASSANDRA_HOST
+CASSANDRA_HOSTS = [
+    h.strip() for h in get_env("CASSANDRA_HOSTS", CASSANDRA_HOST).split(",") if h.strip()
+]
+CASSANDRA_LOCAL_DC = get_env("CASSANDRA_LOCAL_DC")
+CASSANDRA_READ_CONSISTENCY = get_env("CASSANDRA_READ_CONSISTENCY", "LOCAL_QUORUM").upper()
+CASSANDRA_WRITE_CONSISTENCY = get_env("CASSANDRA_WRITE_CONSISTENCY", "ONE").upper()
+# Timeouts en segundos
+CASSANDRA_CONNECT_TIMEOUT = float(get_env("CASSANDRA_CONNECT_TIMEOUT", "5"))
+CASSANDRA_READ_TIMEOUT = float(get_env("CASSANDRA_READ_TIMEOUT", "5"))
+CASSANDRA_WRITE_TIMEOUT = float(get_env("CASSANDRA_WRITE_TIMEOUT", "10"))
+# Speculative retry para lecturas idempotentes (0 lo desactiva)
+CASSANDRA_SPECULATIVE_DELAY_MS = int(get_env("CASSANDRA_SPECULATIVE_DELAY_MS", "50"))
+CASSANDRA_SPECULATIVE_MAX_ATTEMPTS = int(get_env("CASSANDRA_SPECULATIVE_MAX_ATTEMPTS", "2"))
 
 NEO4J_URI = get_env("NEO4J_URI", "bolt://neo4j:7687")
 NEO4J_USER = get_env("NEO4J_USER", "neo4j")
 NEO4J_PASSWORD = get_env("NEO4J_PASSWORD", "admin")
+
+# Cache de metadata de hilos: "memory" (por proceso) o "redis" (compartido)
+THREAD_CACHE_BACKEND = get_env("THREAD_CACHE_BACKEND", "memory")
+THREAD_CACHE_TTL_SECONDS = float(get_env("THREAD_CACHE_TTL_SECONDS", "30"))
+THREAD_CACHE_MAX_ENTRIES = int(get_env("THREAD_CACHE_MAX_ENTRIES", "10000"))
+REDIS_URL = get_env("REDIS_URL", "redis://localhost:6379/0")
+
+# Modo opcional de particiones por mes para posts_by_thread / posts_by_user
+CASSANDRA_BUCKETED_POSTS = get_env("CASSANDRA_BUCKETED_POSTS", "false").lower() in ("1", "true", "yes")
+
+# Pool de conexiones de Neo4j (compartido por el driver sync y el async)
+NEO4J_MAX_POOL_SIZE = int(get_env("NEO4J_MAX_POOL_SIZE", "100"))
+NEO4J_ACQUISITION_TIMEOUT = float(get_env("NEO4J_ACQUISITION_TIMEOUT", "60"))
+
+# Tamaño de chunk para los escritores UNWIND de Neo4j
+NEO4J_BATCH_SIZE = int(get_env("NEO4J_BATCH_SIZE", "1000"))
+
+# recomendar(): estrategias en paralelo, con timeout por estrategia (segundos)
+NEO4J_STRATEGY_WORKERS = int(get_env("NEO4J_STRATEGY_WORKERS", "12"))
+NEO4J_STRATEGY_TIMEOUT = float(get_env("NEO4J_STRATEGY_TIMEOUT", "2"))
+
+# Recomendaciones materializadas (database/materialize.py)
+MATERIALIZE_ENABLED = get_env("MATERIALIZE_ENABLED", "true").lower() in ("1", "true", "yes")
+MATERIALIZE_TOP_N = int(get_env("MATERIALIZE_TOP_N", "50"))
+MATERIALIZE_MAX_AGE_SECONDS = int(get_env("MATERIALIZE_MAX_AGE_SECONDS", "3600"))
+MATERIALIZE_BATCH_SIZE = int(get_env("MATERIALIZE_BATCH_SIZE", "100"))
+# vecinos SIMILAR_TO que ensucia un PERFORMED, y cola máxima para seguir expandiendo
+MATERIALIZE_MAX_NEIGHBORS = int(get_env("MATERIALIZE_MAX_NEIGHBORS", "20"))
+MATERIALIZE_MAX_PENDING = int(get_env("MATERIALIZE_MAX_PENDING", "10000"))
+
+# Motor de recomendaciones en memoria (database/graph_engine.py)
+GRAPH_ENGINE_ENABLED = get_env("GRAPH_ENGINE_ENABLED", "false").lower() in ("1", "true", "yes")
+# recarga periódica aunque no haya escrituras locales (0 = solo después de escribir)
+GRAPH_ENGINE_REFRESH_SECONDS = float(get_env("GRAPH_ENGINE_REFRESH_SECONDS", "0"))
+GRAPH_ENGINE_MIN_REFRESH_SECONDS = float(get_env("GRAPH_ENGINE_MIN_REFRESH_SECONDS", "5"))
+# Motor por defecto de los endpoints de recomendación: "materialized" (lookup de lo
+# precalculado, cae a cypher si no hay entrada), o "cypher"/"memory" para recorrer el grafo
+RECOMMEND_ENGINE = get_env("RECOMMEND_ENGINE", "materialized")
+
+# Buffer de escritura para register_performance (database/write_buffer.py)
+PERFORMANCE_BUFFER_ENABLED = get_env("PERFORMANCE_BUFFER_ENABLED", "true").lower() in ("1", "true", "yes")
+PERFORMANCE_BUFFER_WINDOW_SECONDS = float(get_env("PERFORMANCE_BUFFER_WINDOW_SECONDS", "2"))
+PERFORMANCE_BUFFER_MAX_KEYS = int(get_env("PERFORMANCE_BUFFER_MAX_KEYS", "50000"))
+
+# Métricas en /metrics (metrics.py); desactivarlas saca el costo de los wrappers
+METRICS_ENABLED = get_env("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Vista en memoria de los hilos por curso (database/course_view.py)
+COURSE_VIEW_ENABLED = get_env("COURSE_VIEW_ENABLED", "true").lower() in ("1", "true", "yes")
+COURSE_VIEW_TOP_K = int(get_env("COURSE_VIEW_TOP_K", "200"))
+COURSE_VIEW_MAX_COURSES = int(get_env("COURSE_VIEW_MAX_COURSES", "1000"))
+COURSE_VIEW_RECONCILE_SECONDS = float(get_env("COURSE_VIEW_RECONCILE_SECONDS", "30"))
+COURSE_VIEW_IDLE_SECONDS = float(get_env("COURSE_VIEW_IDLE_SECONDS", "900"))
+
+# Registro de cursos (tabla courses) y su cache en memoria (database/course_registry.py)
+COURSES_CACHE_TTL_SECONDS = float(get_env("COURSES_CACHE_TTL_SECONDS", "30"))
+COURSES_ACTIVITY_WRITE_SECONDS = float(get_env("COURSES_ACTIVITY_WRITE_SECONDS", "60"))
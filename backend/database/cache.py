@@ -0,0 +1,175 @@
+"""
+Cache read-through para metadata de hilos (thread_metadata + thread_counts).
+
+Por defecto vive en memoria del proceso (TTL + LRU). Con THREAD_CACHE_BACKEND=redis
+los workers de uvicorn comparten el mismo cache; para eso hace falta el paquete
+`redis` (opcional, comentado en requirements.txt). El cliente de Redis es
+bloqueante: el código async lo llama a través de ThreadCache.run.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+
+class MemoryBackend:
+    """
+    Dict ordenado con expiración por entrada y desalojo LRU al pasar max_entries.
+    """
+
+    # solo toma un lock: se puede llamar desde el event loop
+    blocking = False
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def record_post(self, key: str, created_at: str):
+        """
+        Suma el post a la entrada (si está) dentro del lock, sin tocar su vencimiento.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return
+            expires_at, value = entry
+            last_activity_at = max(value.get("last_activity_at") or created_at, created_at)
+            self._data[key] = (
+                expires_at,
+                dict(value, post_count=value["post_count"] + 1, last_activity_at=last_activity_at),
+            )
+
+    def size(self) -> int:
+        return len(self._data)
+
+
+class RedisBackend:
+    """
+    Mismo contrato que MemoryBackend pero compartido entre procesos.
+    Redis se encarga del TTL y del desalojo (maxmemory-policy allkeys-lru).
+    Conviene una base de Redis solo para el cache: size() es el DBSIZE.
+    """
+
+    # cada llamada es un round trip a Redis
+    blocking = True
+
+    def __init__(self, url: str, ttl_seconds: float, prefix: str = "thread:"):
+        try:
+            import redis
+        except ImportError as exc:  # pragma: no cover - depende del entorno
+            raise RuntimeError("THREAD_CACHE_BACKEND=redis requiere `pip install redis`") from exc
+        self._client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key: str):
+        raw = self._client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: dict):
+        self._client.set(self.prefix + key, json.dumps(value), ex=max(1, int(self.ttl_seconds)))
+
+    def delete(self, key: str):
+        self._client.delete(self.prefix + key)
+
+    def record_post(self, key: str, created_at: str):
+        # GET + SET desde varios workers pierde incrementos; se tira la entrada y
+        # el próximo get la relee de Cassandra
+        self.delete(key)
+
+    def size(self) -> int:
+        # contador que mantiene Redis, O(1); un SCAN por prefijo recorre todo el keyspace
+        return self._client.dbsize()
+
+
+class ThreadCache:
+    """
+    Fachada con métricas de hit/miss sobre cualquiera de los backends.
+    Las claves son el thread_id en texto y los valores el dict de format_thread.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def run(self, fn, *args):
+        """
+        Llama fn (cualquier función que use el cache) desde código async: con un
+        backend bloqueante en un thread del pool, si no directo.
+        """
+        if self.backend.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def get(self, thread_id: str):
+        value = self.backend.get(thread_id)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, thread_id: str, value: dict):
+        self.backend.set(thread_id, value)
+
+    def invalidate(self, thread_id: str):
+        self.backend.delete(thread_id)
+
+    def record_post(self, thread_id: str, created_at: str):
+        """
+        Aplica un post nuevo sobre la entrada cacheada. Cada backend lo hace de
+        forma atómica: en memoria se parchea bajo el lock, en Redis se invalida.
+        """
+        self.backend.record_post(thread_id, created_at)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "evictions": self.backend.evictions,
+            "size": self.backend.size(),
+        }
+
+
+def _build_backend():
+    if config.THREAD_CACHE_BACKEND == "redis":
+        return RedisBackend(config.REDIS_URL, config.THREAD_CACHE_TTL_SECONDS)
+    return MemoryBackend(config.THREAD_CACHE_TTL_SECONDS, config.THREAD_CACHE_MAX_ENTRIES)
+
+
+thread_cache = ThreadCache(_build_backend())
@@ -1,29 +1,567 @@
-from cassandra.cluster import Cluster
-from cassandra.query import SimpleStatement
-from cassandra import ConsistencyLevel
+from cassandra.cluster import EXEC_PROFILE_DEFAULT, Cluster, ExecutionProfile
+from cassandra.policies import (
+    ConstantSpeculativeExecutionPolicy,
+    DCAwareRoundRobinPolicy,
+    TokenAwarePolicy,
+)
+from cassandra.protocol import ProtocolException
+from cassandra.query import BatchStatement, BatchType, PreparedStatement
+from cassandra import ConsistencyLevel, InvalidRequest
+import base64
+import json
+import time
 import uuid
+import weakref
 from datetime import datetime, timezone
 import config
+import metrics
+from database.cache import thread_cache
+from database.course_registry import course_registry
+from database.course_view import course_views, decode_view_token, encode_view_token
 
 KEYSPACE = config.CASSANDRA_KEYSPACE
-CLUSTER_HOSTS = [config.CASSANDRA_HOST]
+CLUSTER_HOSTS = config.CASSANDRA_HOSTS
 CLUSTER_PORT = config.CASSANDRA_PORT
 
 cluster = None
 session = None
 
+# Particiones por mes (thread_id, bucket) / (user_id, bucket); se activa con
+# CASSANDRA_BUCKETED_POSTS o init_cassandra(bucketed=True)
+bucketed_posts = config.CASSANDRA_BUCKETED_POSTS
+
 # Consistency levels según lo que pusiste en el doc:
-# Escrituras rápidas: CL.ONE, lecturas: LOCAL_QUORUM
-CL_WRITE = ConsistencyLevel.ONE
-CL_READ = ConsistencyLevel.LOCAL_QUORUM
+# Escrituras rápidas: CL.ONE, lecturas: LOCAL_QUORUM (configurables por env)
+CL_WRITE = ConsistencyLevel.name_to_value[config.CASSANDRA_WRITE_CONSISTENCY]
+CL_READ = ConsistencyLevel.name_to_value[config.CASSANDRA_READ_CONSISTENCY]
+
+# Execution profiles: las escrituras van por el default (también lo usan los
+# scripts con execute_concurrent), las lecturas por "read" con su propio
+# timeout y speculative retry. Toda sentencia idempotente se considera lectura.
+PROFILE_WRITE = EXEC_PROFILE_DEFAULT
+PROFILE_READ = "read"
+
+MAX_LIMIT = 500
+
+# Lecturas por id de hilo en vuelo a la vez en get_threads_metadata
+BATCH_GET_CONCURRENCY = 128
+
+# Primer byte de los page_token con paging_state: cambiarlo invalida los tokens viejos
+PAGE_TOKEN_VERSION = 1
+
+# Partición única del registro de cursos: son pocos (miles) y listarlos es una
+# sola lectura en vez de un SELECT DISTINCT sobre todo el anillo
+COURSE_REGISTRY = "all"
+
+# Registro de sentencias: nombre -> (CQL, execution profile).
+# Se preparan una sola vez en init_cassandra() y se reutilizan en cada request.
+# Ninguna lleva LIMIT: el tamaño de página es el fetch_size de cada ejecución.
+STATEMENTS = {
+    "insert_thread_by_course": ("""
+        INSERT INTO threads_by_course (
+            course_id, thread_id, title, author_id, created_at, last_activity_at
+        ) VALUES (?, ?, ?, ?, ?, ?)
+    """, PROFILE_WRITE),
+    "insert_thread_metadata": ("""
+        INSERT INTO thread_metadata (
+            thread_id, course_id, title, author_id, created_at, last_activity_at
+        ) VALUES (?, ?, ?, ?, ?, ?)
+    """, PROFILE_WRITE),
+    "init_thread_count": ("""
+        UPDATE thread_counts SET post_count = post_count + 0 WHERE thread_id = ?
+    """, PROFILE_WRITE),
+    "incr_thread_count": ("""
+        UPDATE thread_counts SET post_count = post_count + 1 WHERE thread_id = ?
+    """, PROFILE_WRITE),
+    "add_thread_count": ("""
+        UPDATE thread_counts SET post_count = post_count + ? WHERE thread_id = ?
+    """, PROFILE_WRITE),
+    "select_threads_by_course": ("""
+        SELECT thread_id, title, author_id, created_at, last_activity_at
+        FROM threads_by_course
+        WHERE course_id = ?
+    """, PROFILE_READ),
+    # continuación keyset de las páginas servidas por la vista (database/course_view.py)
+    "select_threads_by_course_before": ("""
+        SELECT thread_id, title, author_id, created_at, last_activity_at
+        FROM threads_by_course
+        WHERE course_id = ? AND (created_at, thread_id) < (?, ?)
+    """, PROFILE_READ),
+    "select_thread_counts_in": ("""
+        SELECT thread_id, post_count FROM thread_counts
+        WHERE thread_id IN ?
+    """, PROFILE_READ),
+    # last_activity_at con USING TIMESTAMP = la actividad misma: gana siempre la
+    # más reciente aunque las escrituras lleguen desordenadas (bulk load, backfill)
+    "update_course_activity": ("""
+        UPDATE courses USING TIMESTAMP ?
+        SET last_activity_at = ?
+        WHERE registry = ? AND course_id = ?
+    """, PROFILE_WRITE),
+    "add_course_thread_count": ("""
+        UPDATE course_thread_counts SET thread_count = thread_count + ?
+        WHERE registry = ? AND course_id = ?
+    """, PROFILE_WRITE),
+    "select_course_registry": ("""
+        SELECT course_id, last_activity_at FROM courses WHERE registry = ?
+    """, PROFILE_READ),
+    "select_course_thread_counts": ("""
+        SELECT course_id, thread_count FROM course_thread_counts WHERE registry = ?
+    """, PROFILE_READ),
+    "select_thread_metadata": ("""
+        SELECT thread_id, course_id, title, author_id, created_at, last_activity_at
+        FROM thread_metadata
+        WHERE thread_id = ?
+    """, PROFILE_READ),
+    "select_thread_count": ("""
+        SELECT post_count FROM thread_counts WHERE thread_id = ?
+    """, PROFILE_READ),
+    "select_thread_course_key": ("""
+        SELECT course_id, created_at, title, author_id, last_activity_at
+        FROM thread_metadata
+        WHERE thread_id = ?
+    """, PROFILE_READ),
+    "insert_thread_activity": ("""
+        INSERT INTO threads_by_course_activity (
+            course_id, activity_bucket, last_activity_at, thread_id, title, author_id, created_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, PROFILE_WRITE),
+    "delete_thread_activity": ("""
+        DELETE FROM threads_by_course_activity
+        WHERE course_id = ? AND activity_bucket = ? AND last_activity_at = ? AND thread_id = ?
+    """, PROFILE_WRITE),
+    "insert_course_activity_bucket": ("""
+        INSERT INTO activity_buckets_by_course (course_id, bucket) VALUES (?, ?)
+    """, PROFILE_WRITE),
+    "select_course_activity_buckets": ("""
+        SELECT bucket FROM activity_buckets_by_course
+        WHERE course_id = ? AND bucket <= ?
+    """, PROFILE_READ),
+    "select_threads_by_activity": ("""
+        SELECT thread_id, title, author_id, created_at, last_activity_at
+        FROM threads_by_course_activity
+        WHERE course_id = ? AND activity_bucket = ?
+    """, PROFILE_READ),
+    "select_threads_by_activity_before": ("""
+        SELECT thread_id, title, author_id, created_at, last_activity_at
+        FROM threads_by_course_activity
+        WHERE course_id = ? AND activity_bucket = ? AND (last_activity_at, thread_id) < (?, ?)
+    """, PROFILE_READ),
+    "insert_post_by_thread": ("""
+        INSERT INTO posts_by_thread (
+            thread_id, post_id, user_id, content, created_at
+        ) VALUES (?, ?, ?, ?, ?)
+    """, PROFILE_WRITE),
+    "insert_post_by_user": ("""
+        INSERT INTO posts_by_user (
+            user_id, created_at, thread_id, post_id, content
+        ) VALUES (?, ?, ?, ?, ?)
+    """, PROFILE_WRITE),
+    "update_thread_metadata_activity": ("""
+        UPDATE thread_metadata
+        SET last_activity_at = ?
+        WHERE thread_id = ?
+    """, PROFILE_WRITE),
+    "update_thread_course_activity": ("""
+        UPDATE threads_by_course
+        SET last_activity_at = ?
+        WHERE course_id = ? AND created_at = ? AND thread_id = ?
+    """, PROFILE_WRITE),
+    "select_posts_by_thread": ("""
+        SELECT post_id, user_id, content, created_at
+        FROM posts_by_thread
+        WHERE thread_id = ?
+        ORDER BY created_at ASC, post_id ASC
+    """, PROFILE_READ),
+    "select_posts_by_user": ("""
+        SELECT created_at, thread_id, post_id, content
+        FROM posts_by_user
+        WHERE user_id = ?
+    """, PROFILE_READ),
+}
+
+# Sentencias del modo por buckets; solo se preparan si las tablas existen
+BUCKETED_STATEMENTS = {
+    "insert_post_by_thread_bucketed": ("""
+        INSERT INTO posts_by_thread_bucketed (
+            thread_id, bucket, post_id, user_id, content, created_at
+        ) VALUES (?, ?, ?, ?, ?, ?)
+    """, PROFILE_WRITE),
+    "insert_post_by_user_bucketed": ("""
+        INSERT INTO posts_by_user_bucketed (
+            user_id, bucket, created_at, thread_id, post_id, content
+        ) VALUES (?, ?, ?, ?, ?, ?)
+    """, PROFILE_WRITE),
+    "insert_thread_post_bucket": ("""
+        INSERT INTO post_buckets_by_thread (thread_id, bucket) VALUES (?, ?)
+    """, PROFILE_WRITE),
+    "insert_user_post_bucket": ("""
+        INSERT INTO post_buckets_by_user (user_id, bucket) VALUES (?, ?)
+    """, PROFILE_WRITE),
+    "select_thread_post_buckets": ("""
+        SELECT bucket FROM post_buckets_by_thread
+        WHERE thread_id = ? AND bucket >= ?
+    """, PROFILE_READ),
+    "select_user_post_buckets": ("""
+        SELECT bucket FROM post_buckets_by_user
+        WHERE user_id = ? AND bucket <= ?
+    """, PROFILE_READ),
+    "select_posts_by_thread_bucketed": ("""
+        SELECT post_id, user_id, content, created_at
+        FROM posts_by_thread_bucketed
+        WHERE thread_id = ? AND bucket = ?
+        ORDER BY created_at ASC, post_id ASC
+    """, PROFILE_READ),
+    "select_posts_by_user_bucketed": ("""
+        SELECT created_at, thread_id, post_id, content
+        FROM posts_by_user_bucketed
+        WHERE user_id = ? AND bucket = ?
+    """, PROFILE_READ),
+}
+
+# Cotas para el primer request sin token (hilos: desde el bucket más viejo,
+# usuarios: desde el más nuevo)
+MIN_BUCKET = 0
+MAX_BUCKET = 999912
+
+prepared: dict[str, PreparedStatement] = {}
+# sentencia (preparada o batch) -> nombre para las métricas
+statement_names = weakref.WeakKeyDictionary()
+
+
+def prepare_statements(s, statements=STATEMENTS):
+    """
+    Prepara todas las sentencias del registro contra la sesión dada.
+    El driver las vuelve a preparar solo si un nodo se reinicia (reprepare_on_up)
+    o si el coordinador responde UNPREPARED.
+    """
+    for name, (cql, profile) in statements.items():
+        stmt = s.prepare(cql)
+        # solo las lecturas son idempotentes: habilita speculative execution
+        stmt.is_idempotent = profile == PROFILE_READ
+        prepared[name] = stmt
+        statement_names[stmt] = name
+    return prepared
+
+
+def statement(name: str) -> PreparedStatement:
+    if not session:
+        init_cassandra()
+    return prepared[name]
+
+
+def _write_batch(name: str, *statements) -> BatchStatement:
+    """
+    Agrupa las escrituras desnormalizadas en un único batch LOGGED:
+    un solo round trip y todas las tablas quedan consistentes entre sí.
+    Los counters no pueden ir acá (Cassandra no mezcla counters en un batch normal).
+    """
+    batch = BatchStatement(batch_type=BatchType.LOGGED)
+    for stmt, params in statements:
+        batch.add(stmt, params)
+    statement_names[batch] = name
+    return batch
+
+
+def _profile_for(stmt):
+    return PROFILE_READ if stmt.is_idempotent else PROFILE_WRITE
+
+
+def query_name(stmt) -> str:
+    return statement_names.get(getattr(stmt, "prepared_statement", stmt), "adhoc")
+
 
+def _consistency_name(stmt) -> str:
+    level = stmt.consistency_level
+    if level is None:
+        level = CL_READ if _profile_for(stmt) == PROFILE_READ else CL_WRITE
+    return ConsistencyLevel.value_to_name.get(level, str(level))
 
-def init_cassandra():
-    global cluster, session
+
+def _record(response_future, stmt):
+    """
+    Latencia, filas y errores de la llamada, con los callbacks del driver (corren
+    en su thread de I/O, así se mide también lo que se espera desde asyncio).
+    Solo cuenta la primera página: el driver vuelve a llamar los callbacks en
+    cada página que pide el ResultSet al iterar, y esas se ignoran.
+    """
+    name = query_name(stmt)
+    consistency = _consistency_name(stmt)
+    db_time = metrics.request_db_time()
+    started = time.perf_counter()
+    recorded = False
+
+    def on_success(rows):
+        nonlocal recorded
+        if recorded:
+            return
+        recorded = True
+        metrics.record_query(
+            "cassandra", name, time.perf_counter() - started,
+            rows=len(rows) if rows else 0, consistency=consistency, db_time=db_time,
+        )
+
+    def on_error(exc):
+        nonlocal recorded
+        if recorded:
+            return
+        recorded = True
+        metrics.record_query(
+            "cassandra", name, time.perf_counter() - started,
+            error=exc, consistency=consistency, db_time=db_time,
+        )
+
+    response_future.add_callbacks(on_success, on_error)
+
+
+def execute(stmt, params=None, **kwargs):
+    """
+    session.execute con el execution profile que corresponde a la sentencia.
+    """
+    try:
+        return execute_async(stmt, params, **kwargs).result()
+    except (InvalidRequest, ProtocolException) as exc:
+        error = paging_error(exc, kwargs.get("paging_state"))
+        if error is exc:
+            raise
+        raise error from exc
+
+
+def paging_error(exc, paging_state):
+    """
+    Un paging_state armado a mano pasa la validación del token y lo rechaza el
+    coordinador (InvalidRequest o ProtocolException): para el cliente es un
+    page_token inválido, no un error del servidor.
+    """
+    if paging_state and isinstance(exc, (InvalidRequest, ProtocolException)):
+        return ValueError("Invalid page_token")
+    return exc
+
+
+def execute_async(stmt, params=None, **kwargs):
+    response_future = session.execute_async(stmt, params, execution_profile=_profile_for(stmt), **kwargs)
+    if config.METRICS_ENABLED:
+        _record(response_future, stmt)
+    return response_future
+
+
+def _execute_concurrently(*requests):
+    """
+    Lanza sentencias independientes con execute_async y espera a todas,
+    así la latencia es la del más lento y no la suma.
+    """
+    futures = [execute_async(stmt, params) for stmt, params in requests]
+    return [f.result() for f in futures]
+
+
+def safe_limit(limit: int) -> int:
+    return max(1, min(int(limit), MAX_LIMIT))
+
+
+def decode_token_bytes(page_token: str) -> bytes:
+    """
+    base64 url-safe estricto: caracteres fuera del alfabeto, padding roto o un
+    token vacío levantan ValueError en vez de decodificar a b"".
+    """
+    raw = base64.b64decode(page_token.encode("ascii"), altchars=b"-_", validate=True)
+    if not raw:
+        raise ValueError("Invalid page_token")
+    return raw
+
+
+def encode_page_token(paging_state, name: str) -> str | None:
+    """
+    paging_state del driver -> token opaco: versión + nombre de la sentencia +
+    paging_state, así un token de otro listado se rechaza sin llegar a Cassandra.
+    """
+    if not paging_state:
+        return None
+    raw = bytes([PAGE_TOKEN_VERSION]) + name.encode("ascii") + b"\0" + paging_state
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_page_token(page_token: str | None, name: str):
+    """
+    Token opaco -> paging_state de la sentencia `name`. Un token mal formado o
+    de otra sentencia levanta ValueError.
+    """
+    if not page_token:
+        return None
+    raw = decode_token_bytes(page_token)
+    token_name, sep, paging_state = raw[1:].partition(b"\0")
+    if raw[0] != PAGE_TOKEN_VERSION or not sep or not paging_state or token_name != name.encode("ascii"):
+        raise ValueError("Invalid page_token")
+    return paging_state
+
+
+def page_request(name: str, params, limit: int):
+    """
+    Bound statement con fetch_size = limit: cada request lee exactamente una
+    página de una sola partición y el driver devuelve el paging_state siguiente.
+    """
+    bound = statement(name).bind(params)
+    bound.fetch_size = safe_limit(limit)
+    return bound
+
+
+def format_page(items, paging_state, name: str):
+    return {"items": items, "next_page_token": encode_page_token(paging_state, name)}
+
+
+def month_bucket(dt: datetime) -> int:
+    return dt.year * 100 + dt.month
+
+
+def utc_now() -> datetime:
+    """
+    Ahora en UTC truncado a milisegundos, la precisión de timestamp en Cassandra:
+    lo que queda en cache/vista y en los cursores coincide con lo que se lee.
+    """
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def as_utc(dt: datetime) -> datetime:
+    # el driver devuelve timestamps naive (en UTC)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def write_timestamp(dt: datetime) -> int:
+    """
+    Write timestamp de Cassandra (microsegundos desde epoch) para USING TIMESTAMP.
+    """
+    return int(as_utc(dt).timestamp() * 1_000_000)
+
+
+def course_activity_request(course_id: str, activity):
+    return statement("update_course_activity"), (write_timestamp(activity), activity, COURSE_REGISTRY, course_id)
+
+
+def encode_bucket_token(bucket: int | None, name: str, paging_state=None) -> str | None:
+    """
+    En modo por buckets el cursor es (bucket, paging_state dentro de ese bucket).
+    """
+    if bucket is None:
+        return None
+    state = encode_page_token(paging_state, name)
+    raw = json.dumps({"bucket": bucket, "state": state}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_bucket_token(page_token: str | None, name: str):
+    if not page_token:
+        return None, None
+    data = json.loads(decode_token_bytes(page_token))
+    if (
+        not isinstance(data, dict)
+        or not isinstance(data.get("bucket"), int)
+        or not isinstance(data.get("state"), (str, type(None)))
+    ):
+        raise ValueError("Invalid page_token")
+    return data["bucket"], decode_page_token(data["state"], name)
+
+
+def next_bucket_token(buckets: list, index: int, paging_state, name: str) -> str | None:
+    """
+    Token para seguir después de leer buckets[index]: mismo bucket si quedó
+    página pendiente, el siguiente bucket si éste se agotó, o None si no hay más.
+    """
+    if paging_state:
+        return encode_bucket_token(buckets[index], name, paging_state)
+    if index + 1 < len(buckets):
+        return encode_bucket_token(buckets[index + 1], name)
+    return None
+
+
+def create_bucketed_tables(s):
+    s.execute("""
+        CREATE TABLE IF NOT EXISTS posts_by_thread_bucketed (
+            thread_id uuid,
+            bucket int,
+            post_id timeuuid,
+            user_id text,
+            content text,
+            created_at timestamp,
+            PRIMARY KEY ((thread_id, bucket), created_at, post_id)
+        ) WITH CLUSTERING ORDER BY (created_at DESC, post_id DESC)
+    """)
+
+    s.execute("""
+        CREATE TABLE IF NOT EXISTS posts_by_user_bucketed (
+            user_id text,
+            bucket int,
+            created_at timestamp,
+            thread_id uuid,
+            post_id timeuuid,
+            content text,
+            PRIMARY KEY ((user_id, bucket), created_at, post_id)
+        ) WITH CLUSTERING ORDER BY (created_at DESC, post_id DESC)
+    """)
+
+    # Índices de buckets: qué meses tienen posts, para no recorrer meses vacíos
+    s.execute("""
+        CREATE TABLE IF NOT EXISTS post_buckets_by_thread (
+            thread_id uuid,
+            bucket int,
+            PRIMARY KEY ((thread_id), bucket)
+        ) WITH CLUSTERING ORDER BY (bucket ASC)
+    """)
+
+    s.execute("""
+        CREATE TABLE IF NOT EXISTS post_buckets_by_user (
+            user_id text,
+            bucket int,
+            PRIMARY KEY ((user_id), bucket)
+        ) WITH CLUSTERING ORDER BY (bucket DESC)
+    """)
+
+
+def _load_balancing_policy():
+    # Token-aware sobre el DC local: el coordinador es una réplica del dato
+    return TokenAwarePolicy(DCAwareRoundRobinPolicy(local_dc=config.CASSANDRA_LOCAL_DC or ""))
+
+
+def execution_profiles():
+    speculative = None
+    if config.CASSANDRA_SPECULATIVE_DELAY_MS > 0:
+        speculative = ConstantSpeculativeExecutionPolicy(
+            delay=config.CASSANDRA_SPECULATIVE_DELAY_MS / 1000,
+            max_attempts=config.CASSANDRA_SPECULATIVE_MAX_ATTEMPTS,
+        )
+    return {
+        PROFILE_WRITE: ExecutionProfile(
+            load_balancing_policy=_load_balancing_policy(),
+            consistency_level=CL_WRITE,
+            request_timeout=config.CASSANDRA_WRITE_TIMEOUT,
+        ),
+        PROFILE_READ: ExecutionProfile(
+            load_balancing_policy=_load_balancing_policy(),
+            consistency_level=CL_READ,
+            request_timeout=config.CASSANDRA_READ_TIMEOUT,
+            speculative_execution_policy=speculative,
+        ),
+    }
+
+
+def init_cassandra(bucketed: bool | None = None):
+    global cluster, session, bucketed_posts
+    if bucketed is not None:
+        bucketed_posts = bucketed
     if session:
+        if bucketed_posts and not BUCKETED_STATEMENTS.keys() <= prepared.keys():
+            # se pasó a bucketed con la sesión ya abierta: faltan tablas y statements
+            create_bucketed_tables(session)
+            prepare_statements(session, BUCKETED_STATEMENTS)
         return session
 
-    cluster = Cluster(CLUSTER_HOSTS, port=CLUSTER_PORT)
+    cluster = Cluster(
+        CLUSTER_HOSTS,
+        port=CLUSTER_PORT,
+        execution_profiles=execution_profiles(),
+        connect_timeout=config.CASSANDRA_CONNECT_TIMEOUT,
+        prepare_on_all_hosts=True,
+        reprepare_on_up=True,
+    )
     tmp_session = cluster.connect()
 
     # Crear keyspace y tablas si no existen
@@ -85,36 +623,154 @@ def init_cassandra():
         ) WITH CLUSTERING ORDER BY (created_at DESC, post_id DESC)
     """)
 
+    # Hilos por última actividad: cada post mueve la fila del hilo (DELETE de la
+    # vieja + INSERT de la nueva), así que la partición junta tombstones; por
+    # mes acota cuántos hay que saltear al leer la cabeza del curso.
+    tmp_session.execute("""
+        CREATE TABLE IF NOT EXISTS threads_by_course_activity (
+            course_id text,
+            activity_bucket int,
+            last_activity_at timestamp,
+            thread_id uuid,
+            title text,
+            author_id text,
+            created_at timestamp,
+            PRIMARY KEY ((course_id, activity_bucket), last_activity_at, thread_id)
+        ) WITH CLUSTERING ORDER BY (last_activity_at DESC, thread_id DESC)
+    """)
+
+    tmp_session.execute("""
+        CREATE TABLE IF NOT EXISTS activity_buckets_by_course (
+            course_id text,
+            bucket int,
+            PRIMARY KEY ((course_id), bucket)
+        ) WITH CLUSTERING ORDER BY (bucket DESC)
+    """)
+
+    tmp_session.execute("""
+        CREATE TABLE IF NOT EXISTS courses (
+            registry text,
+            course_id text,
+            last_activity_at timestamp,
+            PRIMARY KEY ((registry), course_id)
+        )
+    """)
+
+    tmp_session.execute("""
+        CREATE TABLE IF NOT EXISTS course_thread_counts (
+            registry text,
+            course_id text,
+            thread_count counter,
+            PRIMARY KEY ((registry), course_id)
+        )
+    """)
+
+    prepare_statements(tmp_session)
+    if bucketed_posts:
+        create_bucketed_tables(tmp_session)
+        prepare_statements(tmp_session, BUCKETED_STATEMENTS)
     session = tmp_session
     return session
 
 
-def create_thread(course_id: str, title: str, author_id: str):
-    if not session:
-        init_cassandra()
-    thread_id = uuid.uuid4()
-    now = datetime.now(timezone.utc)
+# --------- Sentencias y formato compartidos con database.cassandra_async ----------
+def activity_write_requests(tid, course_id: str, title: str, author_id: str, created_at, activity, previous=None):
+    """
+    Mueve la fila del hilo en threads_by_course_activity: borra la de `previous`
+    (la actividad anterior) e inserta la de `activity`, más la marca del bucket.
+    Con el mismo timestamp no se borra: DELETE e INSERT del mismo batch llevan
+    el mismo write timestamp y ganaría el tombstone.
+    """
+    requests = []
+    if previous is not None and as_utc(previous) != as_utc(activity):
+        requests.append(
+            (statement("delete_thread_activity"), (course_id, month_bucket(previous), previous, tid))
+        )
+    bucket = month_bucket(activity)
+    requests += [
+        (statement("insert_thread_activity"), (course_id, bucket, activity, tid, title, author_id, created_at)),
+        (statement("insert_course_activity_bucket"), (course_id, bucket)),
+    ]
+    return requests
 
-    # 1) threads_by_course
-    q1 = SimpleStatement("""
-        INSERT INTO threads_by_course (
-            course_id, thread_id, title, author_id, created_at, last_activity_at
-        ) VALUES (%s, %s, %s, %s, %s, %s)
-    """, consistency_level=CL_WRITE)
 
-    # 2) thread_metadata
-    q2 = SimpleStatement("""
-        INSERT INTO thread_metadata (
-            thread_id, course_id, title, author_id, created_at, last_activity_at
-        ) VALUES (%s, %s, %s, %s, %s, %s)
-    """, consistency_level=CL_WRITE)
+def thread_write_requests(thread_id, course_id: str, title: str, author_id: str, now):
+    """
+    threads_by_course, thread_metadata, threads_by_course_activity y el registro
+    de cursos en un batch; los counters (hilo y curso) en paralelo.
+    """
+    batch = _write_batch(
+        "create_thread_batch",
+        (statement("insert_thread_by_course"), (course_id, thread_id, title, author_id, now, now)),
+        (statement("insert_thread_metadata"), (thread_id, course_id, title, author_id, now, now)),
+        *activity_write_requests(thread_id, course_id, title, author_id, now, now),
+        course_activity_request(course_id, now),
+    )
+    return [
+        (batch, None),
+        (statement("init_thread_count"), (thread_id,)),
+        (statement("add_course_thread_count"), (1, COURSE_REGISTRY, course_id)),
+    ]
+
+
+def post_write_requests(
+    tid, post_id, user_id: str, content: str, now,
+    course_id: str, thread_created_at, title: str, author_id: str, last_activity_at,
+):
+    """
+    posts_by_thread, posts_by_user, last_activity_at y la fila de actividad en un
+    solo batch (más la actividad del curso si toca, ver course_registry);
+    el incremento del counter va aparte pero concurrente.
+    """
+    if bucketed_posts:
+        bucket = month_bucket(now)
+        post_inserts = [
+            (statement("insert_post_by_thread_bucketed"), (tid, bucket, post_id, user_id, content, now)),
+            (statement("insert_post_by_user_bucketed"), (user_id, bucket, now, tid, post_id, content)),
+            (statement("insert_thread_post_bucket"), (tid, bucket)),
+            (statement("insert_user_post_bucket"), (user_id, bucket)),
+        ]
+    else:
+        post_inserts = [
+            (statement("insert_post_by_thread"), (tid, post_id, user_id, content, now)),
+            (statement("insert_post_by_user"), (user_id, now, tid, post_id, content)),
+        ]
+    batch = _write_batch(
+        "create_post_batch",
+        *post_inserts,
+        (statement("update_thread_metadata_activity"), (now, tid)),
+        (
+            statement("update_thread_course_activity"),
+            (now, course_id, thread_created_at, tid),
+        ),
+        *activity_write_requests(
+            tid, course_id, title, author_id, thread_created_at, now,
+            previous=last_activity_at or thread_created_at,
+        ),
+        *([course_activity_request(course_id, now)] if course_registry.activity_due(course_id) else []),
+    )
+    return [
+        (batch, None),
+        (statement("incr_thread_count"), (tid,)),
+    ]
 
-    session.execute(q1, (course_id, thread_id, title, author_id, now, now))
-    session.execute(q2, (thread_id, course_id, title, author_id, now, now))
-    session.execute(SimpleStatement("""
-        UPDATE thread_counts SET post_count = post_count + 0 WHERE thread_id = %s
-    """, consistency_level=CL_WRITE), (thread_id,))
 
+def thread_key_of(row):
+    """
+    (course_id, created_at, title, author_id, last_activity_at) de la fila de
+    thread_metadata: lo que create_post necesita para actualizar threads_by_course
+    y mover la fila de threads_by_course_activity. Se lee siempre de Cassandra y
+    no del cache: con un last_activity_at atrasado el DELETE no encuentra la
+    fila vigente y el hilo queda dos veces en el listado.
+    """
+    return row.course_id, row.created_at, row.title, row.author_id, row.last_activity_at
+
+
+def post_count_of(row) -> int:
+    return int(row.post_count) if row and row.post_count is not None else 0
+
+
+def format_new_thread(thread_id, course_id: str, title: str, author_id: str, now):
     return {
         "thread_id": str(thread_id),
         "course_id": course_id,
@@ -126,95 +782,412 @@ def create_thread(course_id: str, title: str, author_id: str):
     }
 
 
-def list_threads_by_course(course_id: str, limit: int = 20):
-    if not session:
-        init_cassandra()
-    # Cassandra no admite bind markers en LIMIT, así que interpolamos el valor (sanitizado)
-    safe_limit = max(1, min(int(limit), 500))
-    q = SimpleStatement(
-        f"""
-        SELECT thread_id, title, author_id, created_at, last_activity_at
-        FROM threads_by_course
-        WHERE course_id = %s
-        LIMIT {safe_limit}
-    """,
-        consistency_level=CL_READ,
-    )
+def format_thread_summary(r, post_count: int):
+    return {
+        "thread_id": str(r.thread_id),
+        "title": r.title,
+        "author_id": r.author_id,
+        "created_at": r.created_at.isoformat(),
+        "last_activity_at": r.last_activity_at.isoformat() if r.last_activity_at else None,
+        "post_count": post_count,
+    }
+
+
+def format_thread(row, post_count: int):
+    return {
+        "thread_id": str(row.thread_id),
+        "course_id": row.course_id,
+        "title": row.title,
+        "author_id": row.author_id,
+        "created_at": row.created_at.isoformat(),
+        "post_count": post_count,
+        "last_activity_at": row.last_activity_at.isoformat() if row.last_activity_at else None,
+    }
+
+
+def format_keyset_page(items, more, sort: str = "created"):
+    """
+    Página de las queries de respaldo de la vista: el token sigue siendo keyset.
+    """
+    next_page_token = encode_view_token(items[-1], sort) if items and more else None
+    return {"items": items, "next_page_token": next_page_token}
+
+
+def activity_page_rows(rows: list, limit: int):
+    """
+    Filas de threads_by_course_activity (hasta limit + 1) -> (filas, hay más, viejas).
+    Un hilo repetido es una fila que el DELETE de create_post no alcanzó (dos
+    posts al mismo hilo a la vez desde procesos distintos): vale la más reciente.
+    Las viejas las borra la reconciliación de la vista (load_course_view), no la lectura.
+    """
+    seen = set()
+    fresh, stale = [], []
+    for r in rows:
+        if r.thread_id in seen:
+            stale.append(r)
+            continue
+        seen.add(r.thread_id)
+        fresh.append(r)
+    return fresh[:limit], len(rows) > limit, stale
 
-    rows = list(session.execute(q, (course_id,)))
-    counts: dict[uuid.UUID, int] = {}
-    if rows:
-        placeholders = ", ".join(["%s"] * len(rows))
-        counts_stmt = SimpleStatement(
-            f"""
-            SELECT thread_id, post_count FROM thread_counts
-            WHERE thread_id IN ({placeholders})
-        """,
-            consistency_level=CL_READ,
-        )
-        for c in session.execute(counts_stmt, tuple(r.thread_id for r in rows)):
-            counts[c.thread_id] = int(c.post_count) if c.post_count is not None else 0
 
+def stale_activity_deletes(course_id: str, stale: list):
     return [
+        (
+            statement("delete_thread_activity"),
+            (course_id, month_bucket(r.last_activity_at), r.last_activity_at, r.thread_id),
+        )
+        for r in stale
+    ]
+
+
+def activity_start_bucket(cursor) -> int:
+    return MAX_BUCKET if cursor is None else month_bucket(cursor[0])
+
+
+def activity_slice_request(course_id: str, bucket: int, cursor, limit: int):
+    """
+    Lectura de un bucket: desde el principio o, en el bucket del cursor, desde
+    (last_activity_at, thread_id) en adelante.
+    """
+    if cursor is not None and bucket == activity_start_bucket(cursor):
+        return page_request("select_threads_by_activity_before", (course_id, bucket, *cursor), limit)
+    return page_request("select_threads_by_activity", (course_id, bucket), limit)
+
+
+def format_courses(registry_rows, count_rows) -> list:
+    counts = {r.course_id: int(r.thread_count or 0) for r in count_rows}
+    courses = [
         {
-            "thread_id": str(r.thread_id),
-            "title": r.title,
-            "author_id": r.author_id,
-            "created_at": r.created_at.isoformat(),
+            "course_id": r.course_id,
+            "thread_count": counts.get(r.course_id, 0),
             "last_activity_at": r.last_activity_at.isoformat() if r.last_activity_at else None,
-            "post_count": counts.get(r.thread_id, 0),
         }
-        for r in rows
+        for r in registry_rows
     ]
+    return sorted(courses, key=lambda c: c["course_id"])
 
 
-def list_courses(limit: int = 100):
+def parse_thread_ids(thread_ids: list):
     """
-    Devuelve los course_id presentes en threads_by_course (distintos).
+    -> (uuid o None por cada id pedido, uuids distintos en orden).
     """
+    parsed = []
+    for thread_id in thread_ids:
+        try:
+            parsed.append(uuid.UUID(str(thread_id)))
+        except ValueError:
+            parsed.append(None)
+    return parsed, list(dict.fromkeys(t for t in parsed if t is not None))
+
+
+def cached_threads(tids: list):
+    """
+    -> ({thread_id: hilo} de lo que está en el cache, uuids que faltan).
+    """
+    found, misses = {}, []
+    for tid in tids:
+        cached = thread_cache.get(str(tid))
+        if cached:
+            found[str(tid)] = dict(cached)
+        else:
+            misses.append(tid)
+    return found, misses
+
+
+def thread_read_requests(tids: list):
+    """
+    Metadata y counter de cada hilo como lecturas de una partición: token-aware,
+    cada una va directo a una réplica (un IN pasaría todo por un coordinador).
+    """
+    return [
+        request
+        for tid in tids
+        for request in ((statement("select_thread_metadata"), (tid,)), (statement("select_thread_count"), (tid,)))
+    ]
+
+
+def apply_thread_reads(tids: list, results: list, found: dict):
+    for i, tid in enumerate(tids):
+        row = results[2 * i].one()
+        if not row:
+            continue
+        thread = format_thread(row, post_count_of(results[2 * i + 1].one()))
+        thread_cache.set(str(tid), thread)
+        found[str(tid)] = thread
+
+
+def attach_threads(items: list, found: dict):
+    """
+    include=thread: agrega a cada post la metadata de su hilo (o None si no existe).
+    """
+    for item in items:
+        thread = found.get(item["thread_id"])
+        item["thread"] = dict(thread) if thread else None
+    return items
+
+
+def format_thread_batch(thread_ids: list, parsed: list, found: dict) -> list:
+    """
+    Una entrada por id pedido, en el mismo orden; los que no existen (o no son
+    UUID) quedan con found=false y thread=null.
+    """
+    items = []
+    for thread_id, tid in zip(thread_ids, parsed):
+        thread = found.get(str(tid)) if tid is not None else None
+        item = {"thread_id": thread_id, "found": thread is not None, "thread": dict(thread) if thread else None}
+        if tid is None:
+            item["error"] = "Invalid thread_id"
+        items.append(item)
+    return items
+
+
+def format_new_post(thread_id: str, post_id, user_id: str, content: str, now):
+    return {
+        "thread_id": thread_id,
+        "post_id": str(post_id),
+        "user_id": user_id,
+        "content": content,
+        "created_at": now.isoformat(),
+    }
+
+
+def format_thread_post(r):
+    return {
+        "post_id": str(r.post_id),
+        "user_id": r.user_id,
+        "content": r.content,
+        "created_at": r.created_at.isoformat(),
+    }
+
+
+def format_user_post(r):
+    return {
+        "thread_id": str(r.thread_id),
+        "post_id": str(r.post_id),
+        "content": r.content,
+        "created_at": r.created_at.isoformat(),
+    }
+
+
+# --------- API sincrónica ----------
+def create_thread(course_id: str, title: str, author_id: str):
     if not session:
         init_cassandra()
-    safe_limit = max(1, min(int(limit), 500))
-    q = SimpleStatement(
-        f"""
-        SELECT DISTINCT course_id
-        FROM threads_by_course
-        LIMIT {safe_limit}
-    """,
-        consistency_level=CL_READ,
+    thread_id = uuid.uuid4()
+    now = utc_now()
+
+    _execute_concurrently(*thread_write_requests(thread_id, course_id, title, author_id, now))
+    thread = format_new_thread(thread_id, course_id, title, author_id, now)
+    thread_cache.set(thread["thread_id"], thread)
+    course_views.record_thread(course_id, thread)
+    course_registry.record_thread(course_id, thread["created_at"])
+    return thread
+
+
+def _activity_rows(course_id: str, limit: int, cursor=None):
+    """
+    Recorre los buckets de actividad del curso del más nuevo al más viejo hasta
+    juntar limit + 1 filas: lee O(limit) filas, no la partición entera.
+    """
+    start = activity_start_bucket(cursor)
+    buckets = [r.bucket for r in execute(statement("select_course_activity_buckets"), (course_id, start))]
+    rows = []
+    for bucket in buckets:
+        rows.extend(execute(activity_slice_request(course_id, bucket, cursor, limit + 1 - len(rows))).current_rows)
+        if len(rows) > limit:
+            break
+    return activity_page_rows(rows, limit)
+
+
+def _thread_counts(thread_ids: list) -> dict:
+    """
+    thread_id (texto) -> post_count, con IN de a 100 hilos en paralelo.
+    """
+    counts: dict[str, int] = {}
+    for counts_rs in _execute_concurrently(*[
+        (statement("select_thread_counts_in"), (thread_ids[i:i + 100],))
+        for i in range(0, len(thread_ids), 100)
+    ]):
+        for c in counts_rs:
+            counts[str(c.thread_id)] = post_count_of(c)
+    return counts
+
+
+def load_course_view(course_id: str, repair: bool = False):
+    """
+    Carga (o reconcilia) la vista del curso: los top_k más nuevos de
+    threads_by_course y los top_k más activos de threads_by_course_activity,
+    más sus contadores. Son dos lecturas de O(top_k) filas.
+    Con repair (el worker de reconciliación) además borra las filas de actividad
+    duplicadas que encontró; una fila vieja siempre queda detrás de la vigente,
+    así que las del top_k se limpian todas.
+    """
+    if not session:
+        init_cassandra()
+    top_k = course_views.top_k
+    created_rs = execute(page_request("select_threads_by_course", (course_id,), top_k + 1))
+    created = created_rs.current_rows
+    active, _, stale = _activity_rows(course_id, top_k)
+    if repair and stale:
+        _execute_concurrently(*stale_activity_deletes(course_id, stale))
+        print(f"[CASSANDRA] removed {len(stale)} stale activity rows for {course_id}")
+
+    selected = {str(r.thread_id): format_thread_summary(r, 0) for r in created[:top_k]}
+    for r in active:
+        selected.setdefault(str(r.thread_id), format_thread_summary(r, 0))
+    counts = _thread_counts([uuid.UUID(thread_id) for thread_id in selected])
+    for t in selected.values():
+        t["post_count"] = counts.get(t["thread_id"], 0)
+    complete = len(created) <= top_k and not created_rs.paging_state
+    course_views.put(course_id, list(selected.values()), complete=complete)
+
+
+def ensure_course_view(course_id: str):
+    """
+    Carga la vista solo si el curso está en el registro: un course_id
+    inexistente no cuesta una carga ni ocupa lugar en las vistas.
+    """
+    known = course_registry.contains(course_id)
+    if known is None:
+        course_registry.set(load_courses())
+        known = course_registry.contains(course_id)
+    if not known:
+        return
+    with course_views.load_lock(course_id):
+        if not course_views.loaded(course_id):
+            load_course_view(course_id)
+
+
+def list_threads_by_activity(course_id: str, limit: int = 20, cursor=None):
+    """
+    Hilos del curso por last_activity_at DESC desde threads_by_course_activity.
+    cursor es (last_activity_at, thread_id) del último hilo de la página anterior.
+    """
+    if not session:
+        init_cassandra()
+    rows, more, _ = _activity_rows(course_id, safe_limit(limit), cursor)
+    counts = _thread_counts([r.thread_id for r in rows]) if rows else {}
+    items = [format_thread_summary(r, counts.get(str(r.thread_id), 0)) for r in rows]
+    return format_keyset_page(items, more, "activity")
+
+
+def list_threads_by_course(
+    course_id: str, limit: int = 20, page_token: str | None = None, sort: str = "created"
+):
+    """
+    La primera página sale de la vista en memoria; las páginas fuera de la
+    ventana van a threads_by_course (created) o threads_by_course_activity (activity).
+    Con sort=activity un token que no es keyset levanta ValueError.
+    """
+    if not session:
+        init_cassandra()
+    limit = safe_limit(limit)
+    page = course_views.page(course_id, limit, page_token, sort)
+    if page is None and config.COURSE_VIEW_ENABLED and not course_views.loaded(course_id):
+        ensure_course_view(course_id)
+        page = course_views.page(course_id, limit, page_token, sort)
+    if page is not None:
+        return page
+
+    cursor = decode_view_token(page_token)
+    if sort == "activity":
+        if page_token and cursor is None:
+            raise ValueError("Invalid page_token")
+        return list_threads_by_activity(course_id, limit, cursor)
+    if cursor is not None:
+        rs = execute(page_request("select_threads_by_course_before", (course_id, *cursor), limit))
+    else:
+        rs = execute(
+            page_request("select_threads_by_course", (course_id,), limit),
+            paging_state=decode_page_token(page_token, "select_threads_by_course"),
+        )
+    rows = rs.current_rows
+    counts: dict[uuid.UUID, int] = {}
+    if rows:
+        for c in execute(
+            statement("select_thread_counts_in"), ([r.thread_id for r in rows],)
+        ):
+            counts[c.thread_id] = post_count_of(c)
+
+    items = [format_thread_summary(r, counts.get(r.thread_id, 0)) for r in rows]
+    if cursor is not None:
+        return format_keyset_page(items, rs.paging_state)
+    return format_page(items, rs.paging_state, "select_threads_by_course")
+
+
+def load_courses() -> list:
+    """
+    Registro de cursos con su cantidad de hilos: dos lecturas de una sola
+    partición, en paralelo.
+    """
+    registry_rs, counts_rs = _execute_concurrently(
+        (statement("select_course_registry"), (COURSE_REGISTRY,)),
+        (statement("select_course_thread_counts"), (COURSE_REGISTRY,)),
     )
-    rows = session.execute(q)
-    return [r.course_id for r in rows if r.course_id]
+    return format_courses(registry_rs, counts_rs)
+
+
+def list_courses(limit: int = 100, details: bool = False):
+    """
+    course_id del registro (o, con details, dicts con thread_count y
+    last_activity_at), servidos desde el cache mientras no venza.
+    """
+    if not session:
+        init_cassandra()
+    courses = course_registry.get()
+    if courses is None:
+        courses = load_courses()
+        course_registry.set(courses)
+    courses = courses[:safe_limit(limit)]
+    return courses if details else [c["course_id"] for c in courses]
 
 
 def get_thread_metadata(thread_id: str):
     if not session:
         init_cassandra()
     tid = uuid.UUID(thread_id)
-    q = SimpleStatement("""
-        SELECT thread_id, course_id, title, author_id, created_at, last_activity_at
-        FROM thread_metadata
-        WHERE thread_id = %s
-    """, consistency_level=CL_READ)
+    cached = thread_cache.get(str(tid))
+    if cached:
+        return dict(cached)
 
-    row = session.execute(q, (tid,)).one()
+    # metadata y counter son independientes: se piden a la vez
+    meta_rs, count_rs = _execute_concurrently(
+        (statement("select_thread_metadata"), (tid,)),
+        (statement("select_thread_count"), (tid,)),
+    )
+    row = meta_rs.one()
     if not row:
         return None
 
-    count_row = session.execute(SimpleStatement("""
-        SELECT post_count FROM thread_counts WHERE thread_id = %s
-    """, consistency_level=CL_READ), (tid,)).one()
-    post_count = int(count_row.post_count) if count_row and count_row.post_count is not None else 0
+    thread = format_thread(row, post_count_of(count_rs.one()))
+    thread_cache.set(str(tid), thread)
+    return thread
 
-    return {
-        "thread_id": str(row.thread_id),
-        "course_id": row.course_id,
-        "title": row.title,
-        "author_id": row.author_id,
-        "created_at": row.created_at.isoformat(),
-        "post_count": post_count,
-        "last_activity_at": row.last_activity_at.isoformat() if row.last_activity_at else None,
-    }
+
+def fetch_threads(tids: list) -> dict:
+    """
+    thread_id -> hilo para los uuids dados (distintos): lo que no está en el
+    cache se lee con lecturas concurrentes de a BATCH_GET_CONCURRENCY, así son
+    ceil(2 * faltantes / BATCH_GET_CONCURRENCY) round trips.
+    """
+    found, misses = cached_threads(tids)
+    requests = thread_read_requests(misses)
+    results = []
+    for i in range(0, len(requests), BATCH_GET_CONCURRENCY):
+        results.extend(_execute_concurrently(*requests[i:i + BATCH_GET_CONCURRENCY]))
+    apply_thread_reads(misses, results, found)
+    return found
+
+
+def get_threads_metadata(thread_ids: list):
+    """
+    get_thread_metadata para muchos hilos, en el orden pedido.
+    """
+    if not session:
+        init_cassandra()
+    parsed, tids = parse_thread_ids(thread_ids)
+    return format_thread_batch(thread_ids, parsed, fetch_threads(tids))
 
 
 def create_post(thread_id: str, user_id: str, content: str):
@@ -222,114 +1195,88 @@ def create_post(thread_id: str, user_id: str, content: str):
         init_cassandra()
     tid = uuid.UUID(thread_id)
     post_id = uuid.uuid1()  # TIMEUUID, respeta el modelo
-    now = datetime.now(timezone.utc)
+    now = utc_now()
 
-    meta_row = session.execute(
-        SimpleStatement(
-            """
-            SELECT course_id, created_at
-            FROM thread_metadata
-            WHERE thread_id = %s
-        """,
-            consistency_level=CL_READ,
-        ),
-        (tid,),
-    ).one()
+    meta_row = execute(statement("select_thread_course_key"), (tid,)).one()
     if not meta_row:
         raise LookupError("Thread not found")
+    thread_key = thread_key_of(meta_row)
 
-    # posts_by_thread
-    q_post_thread = SimpleStatement("""
-        INSERT INTO posts_by_thread (
-            thread_id, post_id, user_id, content, created_at
-        ) VALUES (%s, %s, %s, %s, %s)
-    """, consistency_level=CL_WRITE)
-
-    # posts_by_user
-    q_post_user = SimpleStatement("""
-        INSERT INTO posts_by_user (
-            user_id, created_at, thread_id, post_id, content
-        ) VALUES (%s, %s, %s, %s, %s)
-    """, consistency_level=CL_WRITE)
+    _execute_concurrently(*post_write_requests(tid, post_id, user_id, content, now, *thread_key))
+    thread_cache.record_post(str(tid), now.isoformat())
+    course_views.record_post(thread_key[0], str(tid), now.isoformat())
+    course_registry.record_post(thread_key[0], now.isoformat())
+    return format_new_post(thread_id, post_id, user_id, content, now)
 
-    # actualizar thread_metadata
-    q_update_meta = SimpleStatement("""
-        UPDATE thread_metadata
-        SET last_activity_at = %s
-        WHERE thread_id = %s
-    """, consistency_level=CL_WRITE)
 
-    q_update_thread_course = SimpleStatement("""
-        UPDATE threads_by_course
-        SET last_activity_at = %s
-        WHERE course_id = %s AND created_at = %s AND thread_id = %s
-    """, consistency_level=CL_WRITE)
-
-    session.execute(q_post_thread, (tid, post_id, user_id, content, now))
-    session.execute(q_post_user, (user_id, now, tid, post_id, content))
-    session.execute(q_update_meta, (now, tid))
-    session.execute(
-        q_update_thread_course,
-        (now, meta_row.course_id, meta_row.created_at, tid),
-    )
-    session.execute(SimpleStatement("""
-        UPDATE thread_counts SET post_count = post_count + 1 WHERE thread_id = %s
-    """, consistency_level=CL_WRITE), (tid,))
-
-    return {
-        "thread_id": thread_id,
-        "post_id": str(post_id),
-        "user_id": user_id,
-        "content": content,
-        "created_at": now.isoformat(),
-    }
+def _walk_buckets(select_name: str, key, buckets: list, limit: int, paging_state):
+    """
+    Lee los buckets en orden hasta juntar `limit` filas y corta ahí:
+    nunca toca más particiones de las necesarias para llenar la página.
+    """
+    rows = []
+    remaining = safe_limit(limit)
+    for i, bucket in enumerate(buckets):
+        rs = execute(
+            page_request(select_name, (key, bucket), remaining), paging_state=paging_state
+        )
+        paging_state = None
+        rows.extend(rs.current_rows)
+        remaining -= len(rs.current_rows)
+        if remaining <= 0 or rs.paging_state:
+            return rows, next_bucket_token(buckets, i, rs.paging_state, select_name)
+    return rows, None
 
 
-def list_posts_by_thread(thread_id: str, limit: int = 100):
+def list_posts_by_thread(thread_id: str, limit: int = 100, page_token: str | None = None):
+    """
+    Posts del hilo del más viejo al más nuevo (ORDER BY ASC en la query, sin re-sort).
+    """
     if not session:
         init_cassandra()
-    safe_limit = max(1, min(int(limit), 500))
-    q = SimpleStatement(
-        f"""
-        SELECT post_id, user_id, content, created_at
-        FROM posts_by_thread
-        WHERE thread_id = %s
-        LIMIT {safe_limit}
-    """,
-        consistency_level=CL_READ,
-    )
+    if bucketed_posts:
+        tid = uuid.UUID(thread_id)
+        start, paging_state = decode_bucket_token(page_token, "select_posts_by_thread_bucketed")
+        buckets = [r.bucket for r in execute(
+            statement("select_thread_post_buckets"), (tid, MIN_BUCKET if start is None else start)
+        )]
+        rows, token = _walk_buckets(
+            "select_posts_by_thread_bucketed", tid, buckets, limit, paging_state
+        )
+        return {"items": [format_thread_post(r) for r in rows], "next_page_token": token}
 
-    rows = list(session.execute(q, (uuid.UUID(thread_id),)))
-    rows.sort(key=lambda r: r.created_at or datetime.min.replace(tzinfo=timezone.utc))
-    return [
-        {
-            "post_id": str(r.post_id),
-            "user_id": r.user_id,
-            "content": r.content,
-            "created_at": r.created_at.isoformat(),
-        }
-        for r in rows
-    ]
+    rs = execute(
+        page_request("select_posts_by_thread", (uuid.UUID(thread_id),), limit),
+        paging_state=decode_page_token(page_token, "select_posts_by_thread"),
+    )
+    return format_page([format_thread_post(r) for r in rs.current_rows], rs.paging_state, "select_posts_by_thread")
 
 
-def list_posts_by_user(user_id: str, limit: int = 50):
+def list_posts_by_user(
+    user_id: str, limit: int = 50, page_token: str | None = None, include_thread: bool = False
+):
+    """
+    Posts del usuario del más nuevo al más viejo. Con include_thread cada post
+    trae la metadata de su hilo (una lectura por hilo distinto, no por post).
+    """
     if not session:
         init_cassandra()
-    safe_limit = max(1, min(int(limit), 500))
-    q = SimpleStatement(f"""
-        SELECT created_at, thread_id, post_id, content
-        FROM posts_by_user
-        WHERE user_id = %s
-        LIMIT {safe_limit}
-    """, consistency_level=CL_READ)
-
-    rows = session.execute(q, (user_id,))
-    return [
-        {
-            "thread_id": str(r.thread_id),
-            "post_id": str(r.post_id),
-            "content": r.content,
-            "created_at": r.created_at.isoformat(),
-        }
-        for r in rows
-    ]
+    if bucketed_posts:
+        start, paging_state = decode_bucket_token(page_token, "select_posts_by_user_bucketed")
+        buckets = [r.bucket for r in execute(
+            statement("select_user_post_buckets"), (user_id, MAX_BUCKET if start is None else start)
+        )]
+        rows, token = _walk_buckets(
+            "select_posts_by_user_bucketed", user_id, buckets, limit, paging_state
+        )
+        page = {"items": [format_user_post(r) for r in rows], "next_page_token": token}
+    else:
+        rs = execute(
+            page_request("select_posts_by_user", (user_id,), limit),
+            paging_state=decode_page_token(page_token, "select_posts_by_user"),
+        )
+        page = format_page([format_user_post(r) for r in rs.current_rows], rs.paging_state, "select_posts_by_user")
+    if include_thread:
+        _, tids = parse_thread_ids([item["thread_id"] for item in page["items"]])
+        attach_threads(page["items"], fetch_threads(tids))
+    return page
@@ -0,0 +1,306 @@
+"""
+Variante asyncio de database.cassandra para los routers `async def`.
+
+Usa la misma sesión y las mismas sentencias preparadas; la diferencia es que
+cada ResponseFuture del driver se envuelve en un asyncio.Future, así un worker
+de uvicorn puede tener cientos de queries en vuelo sin ocupar threads del pool.
+"""
+import asyncio
+import uuid
+
+from cassandra.cluster import ResultSet
+
+import config
+from database import cassandra as cassandra_db
+from database.cache import thread_cache
+from database.course_registry import course_registry
+from database.course_view import course_views, decode_view_token
+from database.cassandra import (
+    BATCH_GET_CONCURRENCY,
+    COURSE_REGISTRY,
+    MAX_BUCKET,
+    MIN_BUCKET,
+    activity_page_rows,
+    activity_slice_request,
+    activity_start_bucket,
+    apply_thread_reads,
+    attach_threads,
+    cached_threads,
+    decode_bucket_token,
+    decode_page_token,
+    ensure_course_view,
+    format_courses,
+    format_keyset_page,
+    format_new_post,
+    format_new_thread,
+    format_page,
+    format_thread,
+    format_thread_batch,
+    format_thread_post,
+    format_thread_summary,
+    format_user_post,
+    init_cassandra,
+    next_bucket_token,
+    page_request,
+    paging_error,
+    parse_thread_ids,
+    post_count_of,
+    post_write_requests,
+    safe_limit,
+    statement,
+    thread_key_of,
+    thread_read_requests,
+    thread_write_requests,
+    utc_now,
+)
+
+
+def _ensure_session():
+    if not cassandra_db.session:
+        init_cassandra()
+
+
+async def execute(stmt, params=None, paging_state=None) -> ResultSet:
+    """
+    session.execute_async adaptado a asyncio: los callbacks del driver corren en
+    su propio thread, por eso el resultado se entrega con call_soon_threadsafe.
+    """
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    _ensure_session()
+    response_future = cassandra_db.execute_async(stmt, params, paging_state=paging_state)
+
+    def on_success(rows):
+        if fut.done():
+            return
+        try:
+            fut.set_result(ResultSet(response_future, rows))
+        except Exception as exc:  # pragma: no cover - defensive
+            fut.set_exception(exc)
+
+    def on_error(exc):
+        if not fut.done():
+            fut.set_exception(paging_error(exc, paging_state))
+
+    response_future.add_callbacks(
+        lambda rows: loop.call_soon_threadsafe(on_success, rows),
+        lambda exc: loop.call_soon_threadsafe(on_error, exc),
+    )
+    return await fut
+
+
+async def execute_concurrently(requests):
+    return await asyncio.gather(*(execute(stmt, params) for stmt, params in requests))
+
+
+async def fetch_all(stmt, params=None) -> list:
+    """
+    Todas las filas de una lectura, pidiendo cada página con execute. Iterar el
+    ResultSet trae las páginas siguientes en forma sincrónica y bloquea el loop.
+    """
+    rows = []
+    paging_state = None
+    while True:
+        rs = await execute(stmt, params, paging_state=paging_state)
+        rows.extend(rs.current_rows)
+        paging_state = rs.paging_state
+        if not paging_state:
+            return rows
+
+
+async def create_thread(course_id: str, title: str, author_id: str):
+    thread_id = uuid.uuid4()
+    now = utc_now()
+
+    await execute_concurrently(thread_write_requests(thread_id, course_id, title, author_id, now))
+    thread = format_new_thread(thread_id, course_id, title, author_id, now)
+    await thread_cache.run(thread_cache.set, thread["thread_id"], thread)
+    course_views.record_thread(course_id, thread)
+    course_registry.record_thread(course_id, thread["created_at"])
+    return thread
+
+
+async def _activity_rows(course_id: str, limit: int, cursor=None):
+    bucket_rows = await fetch_all(
+        statement("select_course_activity_buckets"), (course_id, activity_start_bucket(cursor))
+    )
+    rows = []
+    for bucket in [r.bucket for r in bucket_rows]:
+        rs = await execute(activity_slice_request(course_id, bucket, cursor, limit + 1 - len(rows)))
+        rows.extend(rs.current_rows)
+        if len(rows) > limit:
+            break
+    return activity_page_rows(rows, limit)
+
+
+async def list_threads_by_activity(course_id: str, limit: int = 20, cursor=None):
+    rows, more, _ = await _activity_rows(course_id, safe_limit(limit), cursor)
+    counts: dict[uuid.UUID, int] = {}
+    if rows:
+        for c in await fetch_all(
+            statement("select_thread_counts_in"), ([r.thread_id for r in rows],)
+        ):
+            counts[c.thread_id] = post_count_of(c)
+    items = [format_thread_summary(r, counts.get(r.thread_id, 0)) for r in rows]
+    return format_keyset_page(items, more, "activity")
+
+
+async def list_threads_by_course(
+    course_id: str, limit: int = 20, page_token: str | None = None, sort: str = "created"
+):
+    limit = safe_limit(limit)
+    page = course_views.page(course_id, limit, page_token, sort)
+    if page is None and config.COURSE_VIEW_ENABLED and not course_views.loaded(course_id):
+        # una vez por curso y proceso (después la mantiene el worker): la carga va por la API sync
+        await asyncio.to_thread(ensure_course_view, course_id)
+        page = course_views.page(course_id, limit, page_token, sort)
+    if page is not None:
+        return page
+
+    cursor = decode_view_token(page_token)
+    if sort == "activity":
+        if page_token and cursor is None:
+            raise ValueError("Invalid page_token")
+        return await list_threads_by_activity(course_id, limit, cursor)
+    if cursor is not None:
+        rs = await execute(page_request("select_threads_by_course_before", (course_id, *cursor), limit))
+    else:
+        rs = await execute(
+            page_request("select_threads_by_course", (course_id,), limit),
+            paging_state=decode_page_token(page_token, "select_threads_by_course"),
+        )
+    rows = rs.current_rows
+    counts: dict[uuid.UUID, int] = {}
+    if rows:
+        for c in await fetch_all(
+            statement("select_thread_counts_in"), ([r.thread_id for r in rows],)
+        ):
+            counts[c.thread_id] = post_count_of(c)
+
+    items = [format_thread_summary(r, counts.get(r.thread_id, 0)) for r in rows]
+    if cursor is not None:
+        return format_keyset_page(items, rs.paging_state)
+    return format_page(items, rs.paging_state, "select_threads_by_course")
+
+
+async def list_courses(limit: int = 100, details: bool = False):
+    courses = course_registry.get()
+    if courses is None:
+        registry_rows, count_rows = await asyncio.gather(
+            fetch_all(statement("select_course_registry"), (COURSE_REGISTRY,)),
+            fetch_all(statement("select_course_thread_counts"), (COURSE_REGISTRY,)),
+        )
+        courses = format_courses(registry_rows, count_rows)
+        course_registry.set(courses)
+    courses = courses[:safe_limit(limit)]
+    return courses if details else [c["course_id"] for c in courses]
+
+
+async def get_thread_metadata(thread_id: str):
+    tid = uuid.UUID(thread_id)
+    cached = await thread_cache.run(thread_cache.get, str(tid))
+    if cached:
+        return dict(cached)
+
+    # metadata y counter son independientes: se piden a la vez
+    meta_rs, count_rs = await execute_concurrently([
+        (statement("select_thread_metadata"), (tid,)),
+        (statement("select_thread_count"), (tid,)),
+    ])
+    row = meta_rs.one()
+    if not row:
+        return None
+    thread = format_thread(row, post_count_of(count_rs.one()))
+    await thread_cache.run(thread_cache.set, str(tid), thread)
+    return thread
+
+
+async def fetch_threads(tids: list) -> dict:
+    found, misses = await thread_cache.run(cached_threads, tids)
+    requests = thread_read_requests(misses)
+    results = []
+    for i in range(0, len(requests), BATCH_GET_CONCURRENCY):
+        results.extend(await execute_concurrently(requests[i:i + BATCH_GET_CONCURRENCY]))
+    await thread_cache.run(apply_thread_reads, misses, results, found)
+    return found
+
+
+async def get_threads_metadata(thread_ids: list):
+    parsed, tids = parse_thread_ids(thread_ids)
+    return format_thread_batch(thread_ids, parsed, await fetch_threads(tids))
+
+
+async def create_post(thread_id: str, user_id: str, content: str):
+    tid = uuid.UUID(thread_id)
+    post_id = uuid.uuid1()  # TIMEUUID, respeta el modelo
+    now = utc_now()
+
+    meta_row = (await execute(statement("select_thread_course_key"), (tid,))).one()
+    if not meta_row:
+        raise LookupError("Thread not found")
+    thread_key = thread_key_of(meta_row)
+
+    await execute_concurrently(post_write_requests(tid, post_id, user_id, content, now, *thread_key))
+    await thread_cache.run(thread_cache.record_post, str(tid), now.isoformat())
+    # si el hilo no está en la vista lo busca en el cache
+    await thread_cache.run(course_views.record_post, thread_key[0], str(tid), now.isoformat())
+    course_registry.record_post(thread_key[0], now.isoformat())
+    return format_new_post(thread_id, post_id, user_id, content, now)
+
+
+async def _walk_buckets(select_name: str, key, buckets: list, limit: int, paging_state):
+    rows = []
+    remaining = safe_limit(limit)
+    for i, bucket in enumerate(buckets):
+        rs = await execute(
+            page_request(select_name, (key, bucket), remaining), paging_state=paging_state
+        )
+        paging_state = None
+        rows.extend(rs.current_rows)
+        remaining -= len(rs.current_rows)
+        if remaining <= 0 or rs.paging_state:
+            return rows, next_bucket_token(buckets, i, rs.paging_state, select_name)
+    return rows, None
+
+
+async def list_posts_by_thread(thread_id: str, limit: int = 100, page_token: str | None = None):
+    if cassandra_db.bucketed_posts:
+        tid = uuid.UUID(thread_id)
+        start, paging_state = decode_bucket_token(page_token, "select_posts_by_thread_bucketed")
+        bucket_rows = await fetch_all(
+            statement("select_thread_post_buckets"), (tid, MIN_BUCKET if start is None else start)
+        )
+        rows, token = await _walk_buckets(
+            "select_posts_by_thread_bucketed", tid, [r.bucket for r in bucket_rows], limit, paging_state
+        )
+        return {"items": [format_thread_post(r) for r in rows], "next_page_token": token}
+
+    rs = await execute(
+        page_request("select_posts_by_thread", (uuid.UUID(thread_id),), limit),
+        paging_state=decode_page_token(page_token, "select_posts_by_thread"),
+    )
+    return format_page([format_thread_post(r) for r in rs.current_rows], rs.paging_state, "select_posts_by_thread")
+
+
+async def list_posts_by_user(
+    user_id: str, limit: int = 50, page_token: str | None = None, include_thread: bool = False
+):
+    if cassandra_db.bucketed_posts:
+        start, paging_state = decode_bucket_token(page_token, "select_posts_by_user_bucketed")
+        bucket_rows = await fetch_all(
+            statement("select_user_post_buckets"), (user_id, MAX_BUCKET if start is None else start)
+        )
+        rows, token = await _walk_buckets(
+            "select_posts_by_user_bucketed", user_id, [r.bucket for r in bucket_rows], limit, paging_state
+        )
+        page = {"items": [format_user_post(r) for r in rows], "next_page_token": token}
+    else:
+        rs = await execute(
+            page_request("select_posts_by_user", (user_id,), limit),
+            paging_state=decode_page_token(page_token, "select_posts_by_user"),
+        )
+        page = format_page([format_user_post(r) for r in rs.current_rows], rs.paging_state, "select_posts_by_user")
+    if include_thread:
+        _, tids = parse_thread_ids([item["thread_id"] for item in page["items"]])
+        attach_threads(page["items"], await fetch_threads(tids))
+    return page
@@ -0,0 +1,95 @@
+"""
+Cache en memoria del registro de cursos (tablas courses + course_thread_counts).
+
+GET /api/courses antes hacía SELECT DISTINCT sobre threads_by_course, un scan de
+todo el anillo. Ahora el registro es una sola partición que mantiene
+create_thread, y acá se guarda la lista entera por COURSES_CACHE_TTL_SECONDS.
+Las escrituras de este proceso la actualizan en el momento; las de otros
+procesos se ven al vencer el TTL.
+
+create_post también actualiza last_activity_at del curso, pero como mucho una
+vez cada COURSES_ACTIVITY_WRITE_SECONDS por curso y proceso: todas esas
+escrituras caen en la misma partición.
+"""
+import threading
+import time
+
+import config
+
+
+class CourseRegistryCache:
+    def __init__(self, ttl_seconds: float, activity_write_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.activity_write_seconds = activity_write_seconds
+        # course_id -> {"course_id", "thread_count", "last_activity_at"}
+        self._courses: dict[str, dict] | None = None
+        self._loaded_at = 0.0
+        self._activity_written: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self):
+        """
+        Lista de cursos ordenada por course_id, o None si hay que leer Cassandra.
+        """
+        with self._lock:
+            if self._courses is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return [dict(self._courses[k]) for k in sorted(self._courses)]
+
+    def contains(self, course_id: str) -> bool | None:
+        """
+        Si el curso está en el registro cacheado; None si hay que leer Cassandra.
+        """
+        with self._lock:
+            if self._courses is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+                return None
+            return course_id in self._courses
+
+    def set(self, courses: list):
+        with self._lock:
+            self._courses = {c["course_id"]: dict(c) for c in courses}
+            self._loaded_at = time.monotonic()
+
+    def record_thread(self, course_id: str, created_at: str):
+        with self._lock:
+            if self._courses is None:
+                return
+            current = self._courses.get(course_id) or {"course_id": course_id, "thread_count": 0}
+            self._courses[course_id] = dict(
+                current, thread_count=current["thread_count"] + 1, last_activity_at=created_at
+            )
+            self._activity_written[course_id] = time.monotonic()
+
+    def record_post(self, course_id: str, created_at: str):
+        with self._lock:
+            if self._courses is not None and course_id in self._courses:
+                self._courses[course_id] = dict(self._courses[course_id], last_activity_at=created_at)
+
+    def activity_due(self, course_id: str) -> bool:
+        """
+        True si create_post tiene que escribir last_activity_at del curso (y
+        lo cuenta como escrito).
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._activity_written.get(course_id, float("-inf")) < self.activity_write_seconds:
+                return False
+            self._activity_written[course_id] = now
+            return True
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "courses": len(self._courses) if self._courses is not None else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+course_registry = CourseRegistryCache(config.COURSES_CACHE_TTL_SECONDS, config.COURSES_ACTIVITY_WRITE_SECONDS)
@@ -0,0 +1,303 @@
+"""
+Vista en memoria de los hilos de cada curso para GET /api/courses/{id}/threads.
+
+Sin esto cada request lee la partición de threads_by_course y hace un IN sobre
+N particiones de thread_counts. Acá se guarda por curso el top COURSE_VIEW_TOP_K
+por created_at y por last_activity_at con sus contadores: create_thread y
+create_post la actualizan al momento y un thread de fondo la reconcilia contra
+Cassandra cada COURSE_VIEW_RECONCILE_SECONDS (cubre lo que escriben otros procesos).
+
+La carga lee los top_k de threads_by_course (por created_at) y de
+threads_by_course_activity (por last_activity_at): O(top_k) filas por curso.
+Solo se cargan cursos que están en el registro (database/course_registry.py):
+un course_id inventado va directo a Cassandra sin ocupar una vista.
+
+Los page tokens de la vista son keyset ([valor de orden, thread_id] en base64) y
+los entienden también las queries de respaldo de Cassandra, que atienden las
+páginas que caen fuera de la ventana.
+"""
+import base64
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import config
+from database.cache import thread_cache
+
+SORTS = ("created", "activity")
+LOAD_LOCK_STRIPES = 64
+
+
+def _parse_time(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def sort_key(thread: dict, sort: str):
+    """
+    Mismo orden que el clustering de threads_by_course: (created_at, thread_id) DESC.
+    """
+    value = thread["last_activity_at"] if sort == "activity" else thread["created_at"]
+    return _parse_time(value or thread["created_at"]), uuid.UUID(thread["thread_id"])
+
+
+def encode_view_token(thread: dict, sort: str) -> str:
+    value, thread_id = sort_key(thread, sort)
+    raw = json.dumps([value.isoformat(), str(thread_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_view_token(page_token: str | None):
+    """
+    Token keyset -> (datetime, UUID). Devuelve None si no es de la vista (por
+    ejemplo un paging_state del driver, que sigue siendo válido).
+    """
+    if not page_token:
+        return None
+    try:
+        value, thread_id = json.loads(base64.urlsafe_b64decode(page_token.encode("ascii")))
+        return _parse_time(value), uuid.UUID(thread_id)
+    except Exception:
+        return None
+
+
+class CourseView:
+    def __init__(self, threads: list, complete: bool):
+        self.threads = {t["thread_id"]: dict(t) for t in threads}
+        # el curso entero entra en la vista: no hace falta ir a Cassandra para nada
+        self.complete = complete
+        self.loaded_at = time.monotonic()
+        self.last_used = self.loaded_at
+        self._ordered: dict[str, list] = {}
+
+    def ordered(self, sort: str) -> list:
+        if sort not in self._ordered:
+            self._ordered[sort] = sorted(self.threads.values(), key=lambda t: sort_key(t, sort), reverse=True)
+        return self._ordered[sort]
+
+    def window(self, sort: str, top_k: int) -> list:
+        """
+        Prefijo del orden que seguro no tiene huecos: los primeros top_k (o todo
+        si el curso está completo). Más allá solo hay hilos sueltos del otro orden.
+        """
+        ordered = self.ordered(sort)
+        return ordered if self.complete else ordered[:top_k]
+
+    def changed(self, top_k: int):
+        self._ordered.clear()
+        if len(self.threads) > 2 * top_k:
+            keep = {t["thread_id"] for sort in SORTS for t in self.ordered(sort)[:top_k]}
+            self.threads = {k: v for k, v in self.threads.items() if k in keep}
+            self.complete = False
+            self._ordered.clear()
+
+
+class CourseThreadViews:
+    def __init__(self, top_k: int, max_courses: int, reconcile_seconds: float, idle_seconds: float):
+        self.top_k = top_k
+        self.max_courses = max_courses
+        self.reconcile_seconds = reconcile_seconds
+        self.idle_seconds = idle_seconds
+        self._views: OrderedDict[str, CourseView] = OrderedDict()
+        self._dirty: set[str] = set()
+        # locks de carga repartidos por hash: los course_id vienen de la URL y un
+        # lock por curso crecería sin límite
+        self._load_locks = [threading.Lock() for _ in range(LOAD_LOCK_STRIPES)]
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stopping = False
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self.loads = 0
+        self.load_failures = 0
+        self.last_error = None
+
+    def _get(self, course_id: str):
+        view = self._views.get(course_id)
+        # sin worker (scripts) o con el worker trabado, una vista vieja no se usa
+        if view is not None and time.monotonic() - view.loaded_at > 3 * self.reconcile_seconds:
+            del self._views[course_id]
+            return None
+        if view is not None:
+            view.last_used = time.monotonic()
+            self._views.move_to_end(course_id)
+        return view
+
+    def loaded(self, course_id: str) -> bool:
+        with self._cond:
+            return self._get(course_id) is not None
+
+    def load_lock(self, course_id: str) -> threading.Lock:
+        """
+        Lock para que varios requests que no encuentran la vista no hagan la
+        misma carga a la vez (cursos distintos pueden compartirlo).
+        """
+        return self._load_locks[hash(course_id) % LOAD_LOCK_STRIPES]
+
+    def put(self, course_id: str, threads: list, complete: bool):
+        with self._cond:
+            previous = self._views.get(course_id)
+            view = CourseView(threads, complete)
+            if previous is not None:
+                view.last_used = previous.last_used
+            self._views[course_id] = view
+            self._views.move_to_end(course_id)
+            self._dirty.discard(course_id)
+            self.loads += 1
+            while len(self._views) > self.max_courses:
+                self._views.popitem(last=False)
+
+    def record_thread(self, course_id: str, thread: dict):
+        with self._cond:
+            view = self._views.get(course_id)
+            if view is None:
+                return
+            summary = {k: v for k, v in thread.items() if k != "course_id"}
+            view.threads[summary["thread_id"]] = summary
+            view.changed(self.top_k)
+
+    def record_post(self, course_id: str, thread_id: str, created_at: str):
+        """
+        Suma el post al hilo de la vista. Si el hilo no estaba (más viejo que la
+        ventana) se trae del cache de metadata; si tampoco está ahí, el curso
+        queda marcado para la próxima reconciliación.
+        """
+        with self._cond:
+            view = self._views.get(course_id)
+            if view is None:
+                return
+            current = view.threads.get(thread_id)
+            if current is not None:
+                view.threads[thread_id] = dict(
+                    current, post_count=current["post_count"] + 1, last_activity_at=created_at
+                )
+                view.changed(self.top_k)
+                return
+        cached = thread_cache.get(thread_id)
+        with self._cond:
+            view = self._views.get(course_id)
+            if view is None:
+                return
+            if cached is None:
+                self._dirty.add(course_id)
+                self._cond.notify()
+                return
+            view.threads[thread_id] = {k: v for k, v in cached.items() if k != "course_id"}
+            view.changed(self.top_k)
+
+    def page(self, course_id: str, limit: int, page_token: str | None, sort: str):
+        """
+        Página servida desde memoria, o None si hay que ir a Cassandra: el curso
+        no está cargado, el token es un paging_state del driver o la página sale
+        de la ventana.
+        """
+        if not config.COURSE_VIEW_ENABLED:
+            return None
+        cursor = decode_view_token(page_token)
+        if page_token and cursor is None:
+            return None
+        with self._cond:
+            view = self._get(course_id)
+            if view is None:
+                self.misses += 1
+                return None
+            window = view.window(sort, self.top_k)
+            start = 0
+            if cursor is not None:
+                while start < len(window) and sort_key(window[start], sort) >= cursor:
+                    start += 1
+            end = start + limit
+            if end > len(window) and not view.complete:
+                self.fallbacks += 1
+                return None
+            self.hits += 1
+            items = [dict(t) for t in window[start:end]]
+            more = end < len(window) or not view.complete
+            next_page_token = encode_view_token(items[-1], sort) if items and more else None
+            return {"items": items, "next_page_token": next_page_token}
+
+    def courses_to_reconcile(self) -> list:
+        now = time.monotonic()
+        with self._cond:
+            for course_id in [c for c, v in self._views.items() if now - v.last_used > self.idle_seconds]:
+                del self._views[course_id]
+            due = [c for c, v in self._views.items() if now - v.loaded_at >= self.reconcile_seconds]
+            return sorted(self._dirty.union(due))
+
+    def _run(self):
+        # import tardío: database.cassandra importa este módulo
+        from database.cassandra import load_course_view
+
+        while True:
+            with self._cond:
+                if not self._stopping and not self._dirty:
+                    self._cond.wait(min(self.reconcile_seconds, 5.0))
+                if self._stopping:
+                    return
+            for course_id in self.courses_to_reconcile():
+                try:
+                    load_course_view(course_id, repair=True)
+                except Exception as exc:
+                    with self._cond:
+                        self.load_failures += 1
+                        self.last_error = repr(exc)
+                    print(f"[CASSANDRA] course view reconcile failed for {course_id}: {exc!r}")
+            # escrituras seguidas de cursos sucios no disparan más de una pasada por segundo
+            time.sleep(1.0)
+
+    def start(self):
+        with self._cond:
+            if self._worker is not None:
+                return
+            self._stopping = False
+            self._worker = threading.Thread(target=self._run, name="course-views", daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._cond:
+            worker, self._stopping = self._worker, True
+            self._cond.notify_all()
+        if worker is not None:
+            worker.join(timeout)
+        with self._cond:
+            self._worker = None
+
+    def stats(self):
+        with self._cond:
+            total = self.hits + self.misses + self.fallbacks
+            return {
+                "enabled": config.COURSE_VIEW_ENABLED,
+                "courses": len(self._views),
+                "top_k": self.top_k,
+                "hits": self.hits,
+                "misses": self.misses,
+                # páginas fuera de la ventana que fueron a Cassandra
+                "fallbacks": self.fallbacks,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "loads": self.loads,
+                "load_failures": self.load_failures,
+                "dirty": len(self._dirty),
+                "last_error": self.last_error,
+            }
+
+
+course_views = CourseThreadViews(
+    config.COURSE_VIEW_TOP_K,
+    config.COURSE_VIEW_MAX_COURSES,
+    config.COURSE_VIEW_RECONCILE_SECONDS,
+    config.COURSE_VIEW_IDLE_SECONDS,
+)
+
+
+def start():
+    if config.COURSE_VIEW_ENABLED:
+        course_views.start()
+
+
+def stop():
+    course_views.stop()
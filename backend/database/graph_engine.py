@@ -0,0 +1,510 @@
+"""
+Motor de recomendaciones en memoria.
+
+Carga el subgrafo que usan recomendar() y los pattern_* (HAS_DIFFICULTY, EVALUATES,
+PERFORMED, SIMILAR_TO, MAKES_ERROR, TAGGED_AS, INTERESTED_IN) en arrays estilo CSR:
+cada label se indexa con enteros y cada tipo de relación guarda indptr/indices/weights
+en numpy. Las consultas recorren esos arrays en el proceso, sin ida y vuelta a Neo4j.
+
+Devuelve lo mismo que las versiones Cypher de database/neo4j.py, incluida la semántica
+de null (WHERE con null descarta la fila, ORDER BY DESC pone los null primero). Entre
+filas empatadas el orden puede diferir, igual que entre dos corridas del mismo Cypher.
+
+El snapshot se recarga entero después de una escritura que toca lo que carga
+(SNAPSHOT_WRITES, vía neo4j.write_listeners), pasados GRAPH_ENGINE_MIN_REFRESH_SECONDS
+para juntar ráfagas; el resto de las escrituras (materialize, logs de RECOMMENDED,
+upserts de usuarios) no lo invalidan. Con GRAPH_ENGINE_REFRESH_SECONDS > 0 además se
+recarga con ese período aunque no haya escrituras locales, para ver lo que escriben
+otros procesos. Mientras carga se sigue respondiendo con el snapshot anterior.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+
+import config
+from database import neo4j
+
+
+class NodeIndex:
+    """
+    id de negocio <-> posición entera para un label.
+    """
+
+    def __init__(self):
+        self.ids: list[str] = []
+        self.pos: dict[str, int] = {}
+
+    def add(self, node_id: str) -> int:
+        i = self.pos.get(node_id)
+        if i is None:
+            i = self.pos[node_id] = len(self.ids)
+            self.ids.append(node_id)
+        return i
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class Adjacency:
+    """
+    CSR: los vecinos de src son indices[indptr[src]:indptr[src + 1]] y sus pesos
+    weights[...] (NaN donde la propiedad es null).
+    """
+
+    def __init__(self, n_src: int, src, dst, weights):
+        src = np.asarray(src, dtype=np.int64)
+        order = np.argsort(src, kind="stable")
+        self.indices = np.asarray(dst, dtype=np.int32)[order]
+        self.weights = np.asarray(weights, dtype=np.float64)[order]
+        self.indptr = np.zeros(n_src + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n_src), out=self.indptr[1:])
+
+    def neighbors(self, i: int):
+        if i >= len(self.indptr) - 1:
+            return self.indices[:0], self.weights[:0]
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return self.indices[lo:hi], self.weights[lo:hi]
+
+    def reverse(self, n_dst: int) -> "Adjacency":
+        src = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        return Adjacency(n_dst, self.indices, src, self.weights)
+
+    def __len__(self):
+        return len(self.indices)
+
+
+# nombre -> (label origen, label destino, query); src/dst son los ids de negocio
+EDGE_QUERIES = {
+    "difficulty": ("User", "Skill", """
+        MATCH (a:User)-[r:HAS_DIFFICULTY]->(b:Skill)
+        RETURN a.user_id AS src, b.skill_id AS dst, r.error_score AS weight
+    """),
+    "evaluates": ("Exercise", "Skill", """
+        MATCH (a:Exercise)-[:EVALUATES]->(b:Skill)
+        RETURN a.exercise_id AS src, b.skill_id AS dst, null AS weight
+    """),
+    "performed": ("User", "Exercise", """
+        MATCH (a:User)-[r:PERFORMED]->(b:Exercise)
+        RETURN a.user_id AS src, b.exercise_id AS dst, r.correct_ratio AS weight
+    """),
+    "similar": ("User", "User", """
+        MATCH (a:User)-[r:SIMILAR_TO]->(b:User)
+        RETURN a.user_id AS src, b.user_id AS dst, r.similarity_score AS weight
+    """),
+    "errors": ("User", "ErrorType", """
+        MATCH (a:User)-[r:MAKES_ERROR]->(b:ErrorType)
+        RETURN a.user_id AS src, b.error_id AS dst, r.frequency AS weight
+    """),
+    "tagged_error": ("Exercise", "ErrorType", """
+        MATCH (a:Exercise)-[:TAGGED_AS]->(b:ErrorType)
+        RETURN a.exercise_id AS src, b.error_id AS dst, null AS weight
+    """),
+    "tagged_interest": ("Exercise", "Interest", """
+        MATCH (a:Exercise)-[:TAGGED_AS]->(b:Interest)
+        RETURN a.exercise_id AS src, b.interest_id AS dst, null AS weight
+    """),
+    "interested": ("User", "Interest", """
+        MATCH (a:User)-[r:INTERESTED_IN]->(b:Interest)
+        RETURN a.user_id AS src, b.interest_id AS dst, r.weight AS weight
+    """),
+}
+
+EXERCISE_QUERY = "MATCH (e:Exercise) RETURN e.exercise_id AS exercise_id, e.difficulty AS difficulty"
+
+# Escrituras de database/neo4j.py que cambian algo de EDGE_QUERIES / EXERCISE_QUERY
+SNAPSHOT_WRITES = frozenset({
+    neo4j.UPSERT_EXERCISE_QUERY,
+    neo4j.PERFORMANCE_QUERY,
+    neo4j.DIFFICULTY_QUERY,
+    neo4j.USER_ERROR_QUERY,
+    neo4j.TAG_QUERY,
+    neo4j.USER_INTEREST_QUERY,
+    neo4j.SIMILARITY_QUERY,
+})
+
+
+def _weight(value) -> float:
+    return float(value) if value is not None else math.nan
+
+
+def _value(weight):
+    weight = float(weight)
+    return None if math.isnan(weight) else weight
+
+
+def _desc(value):
+    # ORDER BY ... DESC de Cypher: null primero
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return (0, 0)
+    return (1, -value)
+
+
+def _asc(value):
+    # ORDER BY ... ASC de Cypher: null al final
+    if value is None:
+        return (1, 0)
+    return (0, value)
+
+
+def _avg(total: float, count: int):
+    return total / count if count else None
+
+
+class Snapshot:
+    def __init__(self):
+        self.nodes = {label: NodeIndex() for label in ("User", "Skill", "Exercise", "ErrorType", "Interest")}
+        self.exercise_difficulty: list = []
+        self.loaded_at = None
+        self.load_seconds = 0.0
+
+    @property
+    def users(self):
+        return self.nodes["User"]
+
+    @property
+    def exercises(self):
+        return self.nodes["Exercise"]
+
+    def load(self, session):
+        started = time.monotonic()
+        difficulty = {}
+        for row in session.run(EXERCISE_QUERY):
+            if row["exercise_id"] is not None:
+                self.exercises.add(row["exercise_id"])
+                difficulty[row["exercise_id"]] = row["difficulty"]
+
+        edges = {}
+        for name, (src_label, dst_label, query) in EDGE_QUERIES.items():
+            src_index, dst_index = self.nodes[src_label], self.nodes[dst_label]
+            src, dst, weights = [], [], []
+            for row in session.run(query):
+                if row["src"] is None or row["dst"] is None:
+                    continue
+                src.append(src_index.add(row["src"]))
+                dst.append(dst_index.add(row["dst"]))
+                weights.append(_weight(row["weight"]))
+            edges[name] = (src_label, dst_label, src, dst, weights)
+
+        # los índices quedan completos recién acá, así que el CSR se arma al final
+        for name, (src_label, _dst_label, src, dst, weights) in edges.items():
+            setattr(self, name, Adjacency(len(self.nodes[src_label]), src, dst, weights))
+        self.evaluated_by = self.evaluates.reverse(len(self.nodes["Skill"]))
+        self.performed_by = self.performed.reverse(len(self.exercises))
+        self.tagged_by_error = self.tagged_error.reverse(len(self.nodes["ErrorType"]))
+        self.tagged_by_interest = self.tagged_interest.reverse(len(self.nodes["Interest"]))
+        self.exercise_difficulty = [difficulty.get(e) for e in self.exercises.ids]
+
+        self.loaded_at = time.time()
+        self.load_seconds = time.monotonic() - started
+        return self
+
+    def stats(self):
+        return {
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 3),
+            "nodes": {label: len(index) for label, index in self.nodes.items()},
+            "edges": {name: len(getattr(self, name)) for name in EDGE_QUERIES},
+        }
+
+    # --------- Recorridos (mismos MATCH que las versiones Cypher) ----------
+    def difficulty_rows(self, u: int, threshold: float, strict: bool):
+        """
+        (u)-[d:HAS_DIFFICULTY]->(s)<-[:EVALUATES]-(e), ordenado por d.error_score DESC, e.difficulty.
+        """
+        rows = []
+        skills, scores = self.difficulty.neighbors(u)
+        keep = scores > threshold if strict else scores >= threshold
+        for s, score in zip(skills[keep], scores[keep]):
+            for e in self.evaluated_by.neighbors(s)[0]:
+                rows.append((int(e), int(s), float(score)))
+        rows.sort(key=lambda r: (_desc(r[2]), _asc(self.exercise_difficulty[r[0]])))
+        return rows
+
+    def similar_user_groups(self, u: int, sim_threshold: float, perf_threshold: float, strict: bool, by_skill: bool):
+        """
+        avg(p.correct_ratio) agrupado por (e, [s,] sim.similarity_score), como el RETURN con avg() del Cypher.
+        """
+        exercise_skills: dict[int, list[int]] = {}
+        for s in self.difficulty.neighbors(u)[0]:
+            for e in self.evaluated_by.neighbors(s)[0]:
+                exercise_skills.setdefault(int(e), []).append(int(s))
+
+        groups: dict[tuple, list] = {}
+        neighbors, sims = self.similar.neighbors(u)
+        keep = sims > sim_threshold if strict else sims >= sim_threshold
+        for v, sim in zip(neighbors[keep], sims[keep]):
+            exercises, ratios = self.performed.neighbors(v)
+            ok = ratios > perf_threshold if strict else ratios >= perf_threshold
+            for e, ratio in zip(exercises[ok], ratios[ok]):
+                for s in exercise_skills.get(int(e), ()):
+                    key = (int(e), s, float(sim)) if by_skill else (int(e), float(sim))
+                    acc = groups.setdefault(key, [0.0, 0])
+                    acc[0] += float(ratio)
+                    acc[1] += 1
+        rows = [(key, _avg(total, count)) for key, (total, count) in groups.items()]
+        rows.sort(key=lambda r: (_desc(r[1]), _desc(r[0][-1])))
+        return rows
+
+    def error_rows(self, u: int, threshold: float, strict: bool, with_interests: bool):
+        """
+        (u)-[me:MAKES_ERROR]->(et)<-[:TAGGED_AS]-(e) y, opcional, los intereses de u con los que está etiquetado e.
+        """
+        interest_weight = {}
+        if with_interests:
+            interests, weights = self.interested.neighbors(u)
+            interest_weight = {int(t): float(w) for t, w in zip(interests, weights)}
+
+        rows = []
+        error_types, freqs = self.errors.neighbors(u)
+        keep = freqs > threshold if strict else freqs >= threshold
+        for et, freq in zip(error_types[keep], freqs[keep]):
+            for e in self.tagged_by_error.neighbors(et)[0]:
+                if not with_interests:
+                    rows.append((int(e), int(et), float(freq), None))
+                    continue
+                matches = [interest_weight[int(t)] for t in self.tagged_interest.neighbors(e)[0] if int(t) in interest_weight]
+                for weight in matches or [math.nan]:
+                    rows.append((int(e), int(et), float(freq), weight))
+        rows.sort(key=lambda r: (_desc(r[2]), _desc(r[3])))
+        return rows
+
+    def interest_rows(self, u: int, weight_threshold: float, min_error_score: float):
+        """
+        (u)-[i:INTERESTED_IN]->(t)<-[:TAGGED_AS]-(e) + OPTIONAL MATCH de las dificultades de u que evalúa e.
+        """
+        skills, scores = self.difficulty.neighbors(u)
+        user_difficulty = {int(s): float(score) for s, score in zip(skills, scores)}
+
+        rows = []
+        interests, weights = self.interested.neighbors(u)
+        keep = weights >= weight_threshold
+        for t, weight in zip(interests[keep], weights[keep]):
+            for e in self.tagged_by_interest.neighbors(t)[0]:
+                matches = [user_difficulty[int(s)] for s in self.evaluates.neighbors(e)[0] if int(s) in user_difficulty]
+                for score in matches or [None]:
+                    # coalesce(d.error_score, 0): sin arista o con score null cuenta como 0
+                    effective = 0.0 if score is None or math.isnan(score) else score
+                    if effective >= min_error_score:
+                        rows.append((int(e), int(t), float(weight), score))
+        rows.sort(key=lambda r: (_desc(r[2]), _desc(r[3])))
+        return rows
+
+    def multi_hop_groups(self, u: int, performance_threshold: float):
+        """
+        DISTINCT (other, s) que rindieron bien en ejercicios de las skills de u, y
+        avg(p2.correct_ratio) de todo lo que hizo cada other.
+        """
+        pairs: dict[tuple, None] = {}
+        for s in self.difficulty.neighbors(u)[0]:
+            for e in self.evaluated_by.neighbors(s)[0]:
+                others, ratios = self.performed_by.neighbors(e)
+                for other in others[ratios >= performance_threshold]:
+                    pairs[(int(other), int(s))] = None
+
+        groups: dict[tuple, list] = {}
+        for other, s in pairs:
+            exercises, ratios = self.performed.neighbors(other)
+            for rec, ratio in zip(exercises, ratios):
+                acc = groups.setdefault((int(rec), other, s), [0.0, 0])
+                # avg() ignora los null
+                if not math.isnan(ratio):
+                    acc[0] += float(ratio)
+                    acc[1] += 1
+        rows = [(key, _avg(total, count)) for key, (total, count) in groups.items()]
+        rows.sort(key=lambda r: _desc(r[1]))
+        return rows
+
+
+_snapshot: Snapshot | None = None
+_stale = threading.Event()
+_stopping = threading.Event()
+_worker = None
+
+
+def load() -> Snapshot:
+    global _snapshot
+    neo4j._ensure_driver()
+    with neo4j.driver.session() as s:
+        snapshot = Snapshot().load(s)
+    _snapshot = snapshot
+    stats = snapshot.stats()
+    print(f"[GRAPH] Snapshot loaded in {stats['load_seconds']}s: {sum(stats['edges'].values())} edges")
+    return snapshot
+
+
+def is_loaded() -> bool:
+    return _snapshot is not None
+
+
+def stats():
+    return {
+        "enabled": config.GRAPH_ENGINE_ENABLED,
+        "stale": _stale.is_set(),
+        "snapshot": _snapshot.stats() if _snapshot else None,
+    }
+
+
+def _on_write(query: str, rows: list):
+    if query in SNAPSHOT_WRITES:
+        _stale.set()
+
+
+def _run():
+    while not _stopping.is_set():
+        # despierta por una escritura relevante (o por stop); por período solo
+        # si GRAPH_ENGINE_REFRESH_SECONDS > 0
+        _stale.wait(config.GRAPH_ENGINE_REFRESH_SECONDS or None)
+        if _stopping.wait(config.GRAPH_ENGINE_MIN_REFRESH_SECONDS):
+            return
+        _stale.clear()
+        try:
+            load()
+        except Exception as exc:
+            print(f"[GRAPH] refresh failed, keeping previous snapshot: {exc!r}")
+
+
+def start():
+    global _worker
+    if not config.GRAPH_ENGINE_ENABLED or _worker is not None:
+        return
+    _stopping.clear()
+    load()
+    if _on_write not in neo4j.write_listeners:
+        neo4j.write_listeners.append(_on_write)
+    _worker = threading.Thread(target=_run, name="graph-engine", daemon=True)
+    _worker.start()
+
+
+def stop(timeout: float = 5.0):
+    global _worker
+    _stopping.set()
+    _stale.set()
+    if _worker is not None:
+        _worker.join(timeout)
+    _worker = None
+
+
+def _user(user_id: str):
+    if _snapshot is None:
+        raise RuntimeError("graph engine snapshot not loaded")
+    return _snapshot, _snapshot.users.pos.get(user_id)
+
+
+# --------- Misma interfaz que database/neo4j.py ----------
+def recomendar(user_id, limit=10, timeout=None):
+    snap, u = _user(user_id)
+    result = {"by_difficulty": [], "by_similar_users": [], "by_errors_and_interests": [], "incomplete": []}
+    if u is None:
+        return result
+    exercise_ids = snap.exercises.ids
+    result["by_difficulty"] = [
+        {
+            "exercise_id": exercise_ids[e],
+            "difficulty": snap.exercise_difficulty[e],
+            "error_score": score,
+        }
+        for e, _s, score in snap.difficulty_rows(u, 0.6, strict=True)[:limit]
+    ]
+    result["by_similar_users"] = [
+        {"exercise_id": exercise_ids[e], "similarity": sim, "performance": performance}
+        for (e, sim), performance in snap.similar_user_groups(u, 0.6, 0.7, strict=True, by_skill=False)[:limit]
+    ]
+    result["by_errors_and_interests"] = [
+        {"exercise_id": exercise_ids[e], "error_weight": freq, "interest_weight": _value(weight)}
+        for e, _et, freq, weight in snap.error_rows(u, 0.6, strict=True, with_interests=True)[:limit]
+    ]
+    return result
+
+
+def pattern_by_difficulty(user_id: str, threshold: float = 0.6, limit: int = 20):
+    snap, u = _user(user_id)
+    if u is None:
+        return []
+    limit = max(1, min(limit, 200))
+    return [
+        {
+            "exercise_id": snap.exercises.ids[e],
+            "skill_id": snap.nodes["Skill"].ids[s],
+            "error_score": score,
+            "exercise_difficulty": snap.exercise_difficulty[e],
+        }
+        for e, s, score in snap.difficulty_rows(u, threshold, strict=False)[:limit]
+    ]
+
+
+def pattern_by_similar_users(
+    user_id: str,
+    similarity_threshold: float = 0.8,
+    performance_threshold: float = 0.8,
+    limit: int = 20,
+):
+    snap, u = _user(user_id)
+    if u is None:
+        return []
+    limit = max(1, min(limit, 200))
+    groups = snap.similar_user_groups(u, similarity_threshold, performance_threshold, strict=False, by_skill=True)
+    return [
+        {
+            "exercise_id": snap.exercises.ids[e],
+            "skill_id": snap.nodes["Skill"].ids[s],
+            "similarity": sim,
+            "performance": performance,
+        }
+        for (e, s, sim), performance in groups[:limit]
+    ]
+
+
+def pattern_by_errors(user_id: str, frequency_threshold: float = 0.7, limit: int = 20):
+    snap, u = _user(user_id)
+    if u is None:
+        return []
+    limit = max(1, min(limit, 200))
+    return [
+        {
+            "exercise_id": snap.exercises.ids[e],
+            "error_id": snap.nodes["ErrorType"].ids[et],
+            "frequency": freq,
+        }
+        for e, et, freq, _weight in snap.error_rows(u, frequency_threshold, strict=False, with_interests=False)[:limit]
+    ]
+
+
+def pattern_by_interests(
+    user_id: str,
+    weight_threshold: float = 0.0,
+    min_error_score: float = 0.0,
+    limit: int = 20,
+):
+    snap, u = _user(user_id)
+    if u is None:
+        return []
+    limit = max(1, min(limit, 200))
+    return [
+        {
+            "exercise_id": snap.exercises.ids[e],
+            "interest_id": snap.nodes["Interest"].ids[t],
+            "interest_weight": weight,
+            "error_score": _value(score) if score is not None else None,
+        }
+        for e, t, weight, score in snap.interest_rows(u, weight_threshold, min_error_score)[:limit]
+    ]
+
+
+def pattern_multi_hop(
+    user_id: str, performance_threshold: float = 0.75, limit: int = 20
+):
+    snap, u = _user(user_id)
+    if u is None:
+        return []
+    limit = max(1, min(limit, 200))
+    return [
+        {
+            "exercise_id": snap.exercises.ids[rec],
+            "source_user": snap.users.ids[other],
+            "related_skill": snap.nodes["Skill"].ids[s],
+            "avg_correct_ratio": avg,
+        }
+        for (rec, other, s), avg in snap.multi_hop_groups(u, performance_threshold)[:limit]
+    ]
@@ -0,0 +1,288 @@
+"""
+Recomendaciones precalculadas por usuario.
+
+Guarda recomendar y el top-N de cada pattern_* (con sus umbrales por defecto)
+como JSON en la propiedad `materialized_recommendations` del nodo User, así
+leerlas es un solo lookup por user_id: GET /recommend/{user_id} y los
+/recommend/patterns/* con umbrales por defecto salen de acá (lookup) y solo
+recorren el grafo si el usuario todavía no tiene entrada. Las escrituras que tocan a un usuario (dificultades, errores,
+intereses, similitudes, PERFORMED) lo marcan como sucio y un thread de fondo lo
+recalcula. Además cada entrada vence a los MATERIALIZE_MAX_AGE_SECONDS, que cubre
+los cambios indirectos (ejercicios nuevos, tags, EVALUATES).
+
+Un PERFORMED también ensucia a los usuarios similares al que lo hizo, pero solo a
+los MATERIALIZE_MAX_NEIGHBORS más parecidos, y no se expande nada mientras haya más
+de MATERIALIZE_MAX_PENDING pendientes: con un flujo de escrituras mayor a lo que
+el worker recalcula, los vecinos quedan para el vencimiento por edad en vez de
+acumularse. Un lote que falla vuelve a la cola y el worker espera antes de seguir.
+
+Los requests nunca recalculan: una entrada vencida se devuelve igual (stale) y el
+usuario se encola para el worker.
+"""
+import inspect
+import json
+import threading
+import time
+from typing import Iterable
+
+import config
+from database import neo4j, neo4j_async
+from database.neo4j import (
+    pattern_by_difficulty,
+    pattern_by_errors,
+    pattern_by_interests,
+    pattern_by_similar_users,
+    pattern_multi_hop,
+    read_rows,
+    recomendar,
+    write_rows,
+)
+
+STRATEGIES = {
+    "pattern_by_difficulty": pattern_by_difficulty,
+    "pattern_by_similar_users": pattern_by_similar_users,
+    "pattern_by_errors": pattern_by_errors,
+    "pattern_by_interests": pattern_by_interests,
+    "pattern_multi_hop": pattern_multi_hop,
+}
+
+# Umbrales con los que se materializa cada estrategia (los defaults de la función)
+STRATEGY_DEFAULTS = {
+    name: {
+        param: p.default
+        for param, p in inspect.signature(fn).parameters.items()
+        if param not in ("user_id", "limit")
+    }
+    for name, fn in STRATEGIES.items()
+}
+
+# Escritura -> campo de la fila con el usuario afectado
+DIRTY_KEYS = {
+    neo4j.PERFORMANCE_QUERY: "user_id",
+    neo4j.DIFFICULTY_QUERY: "user_id",
+    neo4j.USER_ERROR_QUERY: "user_id",
+    neo4j.USER_INTEREST_QUERY: "user_id",
+    neo4j.SIMILARITY_QUERY: "user1",
+}
+
+STORE_QUERY = """
+    UNWIND $rows AS row
+    MATCH (u:User {user_id: row.user_id})
+    SET u.materialized_recommendations = row.payload,
+        u.materialized_at = datetime()
+"""
+neo4j.QUERY_NAMES[STORE_QUERY] = "materialize_store"
+
+LOOKUP_QUERY = """
+    MATCH (u:User {user_id: $user_id})
+    RETURN u.materialized_recommendations AS payload,
+           toString(u.materialized_at) AS materialized_at,
+           u.materialized_at > datetime() - duration({seconds: $max_age}) AS fresh
+"""
+neo4j.QUERY_NAMES[LOOKUP_QUERY] = "materialize_lookup"
+
+_dirty: set[str] = set()
+# usuarios con PERFORMED nuevo: también hay que recalcular a quienes son similares a ellos
+_expand: set[str] = set()
+_cond = threading.Condition()
+_worker = None
+_stopping = False
+_stats = {"refreshed": 0, "failures": 0, "expansions_skipped": 0, "last_error": None}
+
+# espera después de un lote fallido (se duplica hasta el máximo mientras siga fallando)
+RETRY_BACKOFF_SECONDS = 1.0
+RETRY_BACKOFF_MAX_SECONDS = 60.0
+
+
+def compute(user_id: str):
+    result = {
+        name: fn(user_id, limit=config.MATERIALIZE_TOP_N)
+        for name, fn in STRATEGIES.items()
+    }
+    # con su "incomplete", igual que la respuesta en vivo
+    result["recomendar"] = recomendar(user_id)
+    return result
+
+
+def refresh_users(user_ids: Iterable[str]) -> int:
+    rows = [
+        {"user_id": user_id, "payload": json.dumps(compute(user_id))}
+        for user_id in user_ids
+    ]
+    return write_rows(STORE_QUERY, rows)
+
+
+def mark_dirty(user_ids: Iterable[str], expand_similar: bool = False):
+    with _cond:
+        ids = {u for u in user_ids if u}
+        _dirty.update(ids)
+        if expand_similar:
+            if len(_dirty) + len(_expand) > config.MATERIALIZE_MAX_PENDING:
+                _stats["expansions_skipped"] += len(ids)
+            else:
+                _expand.update(ids)
+        _cond.notify()
+
+
+def mark_all_dirty() -> int:
+    user_ids = [row["user_id"] for row in read_rows("MATCH (u:User) RETURN u.user_id AS user_id")]
+    mark_dirty(user_ids)
+    return len(user_ids)
+
+
+def pending() -> int:
+    with _cond:
+        return len(_dirty) + len(_expand)
+
+
+def stats():
+    with _cond:
+        return {
+            "enabled": config.MATERIALIZE_ENABLED,
+            "running": _worker is not None,
+            "pending": len(_dirty),
+            "pending_expansions": len(_expand),
+            "max_pending": config.MATERIALIZE_MAX_PENDING,
+            **_stats,
+        }
+
+
+def _on_write(query: str, rows: list):
+    key = DIRTY_KEYS.get(query)
+    if key is None:
+        return
+    mark_dirty((row.get(key) for row in rows), expand_similar=query == neo4j.PERFORMANCE_QUERY)
+
+
+def _similar_to(user_ids: list) -> list:
+    """
+    Para cada usuario, los MATERIALIZE_MAX_NEIGHBORS que más se le parecen.
+    """
+    rows = read_rows("""
+        UNWIND $user_ids AS target
+        MATCH (u:User)-[s:SIMILAR_TO]->(v:User {user_id: target})
+        WITH target, u, s
+        ORDER BY s.similarity_score DESC
+        WITH target, collect(u.user_id)[..$max_neighbors] AS neighbors
+        UNWIND neighbors AS user_id
+        RETURN DISTINCT user_id
+    """, user_ids=user_ids, max_neighbors=config.MATERIALIZE_MAX_NEIGHBORS)
+    return [row["user_id"] for row in rows]
+
+
+def _take_batch():
+    with _cond:
+        while not _stopping and not _dirty and not _expand:
+            _cond.wait()
+        expand = list(_expand)
+        _expand.clear()
+        batch = [_dirty.pop() for _ in range(min(len(_dirty), config.MATERIALIZE_BATCH_SIZE))]
+        return batch, expand
+
+
+def _run():
+    backoff = RETRY_BACKOFF_SECONDS
+    while not _stopping:
+        batch, expand = _take_batch()
+        try:
+            if expand:
+                mark_dirty(_similar_to(expand))
+                expand = []
+            if batch:
+                refresh_users(batch)
+            backoff = RETRY_BACKOFF_SECONDS
+            with _cond:
+                _stats["refreshed"] += len(batch)
+        except Exception as exc:
+            print(f"[MATERIALIZE] refresh failed for {len(batch)} users, requeued: {exc!r}")
+            with _cond:
+                _stats["failures"] += 1
+                _stats["last_error"] = repr(exc)
+                _dirty.update(batch)
+                _expand.update(expand)
+                # Neo4j caído: no girar en vacío reintentando el mismo lote (mark_dirty
+                # despierta la condición, por eso se espera hasta el deadline)
+                deadline = time.monotonic() + backoff
+                while not _stopping and time.monotonic() < deadline:
+                    _cond.wait(deadline - time.monotonic())
+            backoff = min(backoff * 2, RETRY_BACKOFF_MAX_SECONDS)
+
+
+def start_worker():
+    global _worker, _stopping
+    if not config.MATERIALIZE_ENABLED or _worker is not None:
+        return
+    _stopping = False
+    if _on_write not in neo4j.write_listeners:
+        neo4j.write_listeners.append(_on_write)
+    _worker = threading.Thread(target=_run, name="materialize", daemon=True)
+    _worker.start()
+
+
+def stop_worker(timeout: float = 5.0):
+    global _worker, _stopping
+    with _cond:
+        _stopping = True
+        _cond.notify_all()
+    if _worker is not None:
+        _worker.join(timeout)
+    _worker = None
+
+
+def _queue_refresh(user_id: str):
+    # sin worker nadie vaciaría la cola
+    if _worker is not None:
+        mark_dirty([user_id])
+
+
+def _entry(user_id: str, rows: list):
+    """
+    Fila de LOOKUP_QUERY -> entrada materializada, o None si el usuario no
+    existe o todavía no tiene. Lo vencido o incompleto se encola para el worker.
+    """
+    if not rows:
+        return None
+    row = rows[0]
+    if not row["payload"]:
+        _queue_refresh(user_id)
+        return None
+    strategies = json.loads(row["payload"])
+    stale = (
+        not row["fresh"]
+        or not (STRATEGIES.keys() | {"recomendar"}) <= strategies.keys()
+        or bool(strategies["recomendar"]["incomplete"])
+    )
+    if stale:
+        _queue_refresh(user_id)
+    return {
+        "user_id": user_id,
+        "materialized_at": row["materialized_at"],
+        "stale": stale,
+        "strategies": strategies,
+    }
+
+
+def get_recommendations(user_id: str):
+    """
+    Lookup por clave, sin recalcular en el request.
+    """
+    return _entry(user_id, read_rows(LOOKUP_QUERY, user_id=user_id, max_age=config.MATERIALIZE_MAX_AGE_SECONDS))
+
+
+async def lookup(user_id: str, name: str, limit: int | None = None, thresholds: dict | None = None):
+    """
+    Resultado materializado de una estrategia (recomendar o pattern_*), o None
+    si hay que recorrer el grafo: umbrales distintos a los materializados,
+    limit mayor a MATERIALIZE_TOP_N o el usuario sin entrada.
+    """
+    defaults = STRATEGY_DEFAULTS.get(name, {})
+    if any(defaults.get(k) != v for k, v in (thresholds or {}).items()):
+        return None
+    if limit is not None and limit > config.MATERIALIZE_TOP_N:
+        return None
+    rows = await neo4j_async.read_rows(LOOKUP_QUERY, user_id=user_id, max_age=config.MATERIALIZE_MAX_AGE_SECONDS)
+    entry = _entry(user_id, rows)
+    if entry is None or name not in entry["strategies"]:
+        return None
+    result = entry["strategies"][name]
+    return result[:neo4j.pattern_limit(limit)] if limit is not None else result
@@ -1,27 +1,63 @@
-from typing import Iterable, Optional
+import base64
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Iterable, Optional
 
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, unit_of_work
 
 import config
+import metrics
 
 driver = None
 
+# Índices de rango sobre propiedades de relaciones: claves de orden de los list_*
+# y filtros de las queries de recomendación (d.error_score >= ..., etc.)
+RELATIONSHIP_INDEXES = [
+    ("PERFORMED", "performed_at"),
+    ("PERFORMED", "correct_ratio"),
+    ("HAS_DIFFICULTY", "error_score"),
+    ("MAKES_ERROR", "frequency"),
+    ("INTERESTED_IN", "weight"),
+    ("SIMILAR_TO", "similarity_score"),
+    ("RECOMMENDED", "timestamp"),
+]
+
+# Texto de query -> nombre para las métricas. Las constantes *_QUERY se registran
+# al final del módulo y los listados armados al vuelo al construirse (pocas variantes).
+QUERY_NAMES: dict[str, str] = {}
+
+# Callbacks (query, rows) que se llaman después de cada escritura confirmada;
+# los usa database.materialize para marcar usuarios a recalcular.
+write_listeners: list[Callable[[str, list], None]] = []
+
 
 def _ensure_driver():
     if driver is None:
         init_neo4j()
 
 
+def driver_options():
+    """
+    Opciones comunes al driver sync y al async (database/neo4j_async.py).
+    Con NEO4J_URI=neo4j://... el driver hace routing y execute_read va a followers.
+    """
+    return {
+        "auth": (config.NEO4J_USER, config.NEO4J_PASSWORD),
+        "max_connection_pool_size": config.NEO4J_MAX_POOL_SIZE,
+        "connection_acquisition_timeout": config.NEO4J_ACQUISITION_TIMEOUT,
+    }
+
+
 def init_neo4j():
     global driver
     if driver:
         return driver
 
     print(f"[NEO4J] Connecting to {config.NEO4J_URI}")
-    driver = GraphDatabase.driver(
-        config.NEO4J_URI,
-        auth=(config.NEO4J_USER, config.NEO4J_PASSWORD)
-    )
+    driver = GraphDatabase.driver(config.NEO4J_URI, **driver_options())
     with driver.session() as s:
         constraints = [
             ("User", "user_id"),
@@ -33,242 +69,555 @@ def init_neo4j():
         ]
         for label, field in constraints:
             s.run(f"CREATE CONSTRAINT IF NOT EXISTS FOR (n:{label}) REQUIRE n.{field} IS UNIQUE")
+        for rel_type, field in RELATIONSHIP_INDEXES:
+            s.run(
+                f"CREATE INDEX {rel_type.lower()}_{field} IF NOT EXISTS "
+                f"FOR ()-[r:{rel_type}]-() ON (r.{field})"
+            )
 
     print("[NEO4J] Ready.")
     return driver
 
 
-def registrar_progreso(user_id, course_id, level):
+# --------- Escritores ----------
+# Cada escritor es un UNWIND sobre $rows: la versión de a uno manda una sola
+# fila y la versión *_batch manda la lista entera en chunks de NEO4J_BATCH_SIZE.
+PROGRESS_QUERY = """
+    UNWIND $rows AS row
+    MERGE (u:User {user_id: row.user_id})
+    MERGE (c:Course {course_id: row.course_id})
+    MERGE (u)-[r:COMPLETED]->(c)
+    SET r.level = row.level, r.created_at = datetime()
+"""
+
+UPSERT_USER_QUERY = """
+    UNWIND $rows AS row
+    MERGE (u:User {user_id: row.user_id})
+    SET u.primary_language = coalesce(row.primary_language, u.primary_language),
+        u.current_level = coalesce(row.current_level, u.current_level),
+        u.streak = coalesce(row.streak, u.streak),
+        u.created_at = coalesce(u.created_at, datetime())
+"""
+
+UPSERT_EXERCISE_QUERY = """
+    UNWIND $rows AS row
+    MERGE (e:Exercise {exercise_id: row.exercise_id})
+    SET e.type = coalesce(row.type, e.type),
+        e.difficulty = coalesce(row.difficulty, e.difficulty),
+        e.language = coalesce(row.language, e.language),
+        e.created_at = coalesce(e.created_at, datetime())
+"""
+
+UPSERT_SKILL_QUERY = """
+    UNWIND $rows AS row
+    MERGE (s:Skill {skill_id: row.skill_id})
+    SET s.name = coalesce(row.name, s.name),
+        s.category = coalesce(row.category, s.category),
+        s.level = coalesce(row.level, s.level)
+"""
+
+UPSERT_INTEREST_QUERY = """
+    UNWIND $rows AS row
+    MERGE (i:Interest {interest_id: row.interest_id})
+    SET i.name = coalesce(row.name, i.name),
+        i.category = coalesce(row.category, i.category)
+"""
+
+UPSERT_ERROR_TYPE_QUERY = """
+    UNWIND $rows AS row
+    MERGE (e:ErrorType {error_id: row.error_id})
+    SET e.description = coalesce(row.description, e.description),
+        e.category = coalesce(row.category, e.category)
+"""
+
+# row.increment lo manda database/write_buffer.py al juntar varios eventos en una
+# fila: intentos sin valor explícito que hay que sumar (sin él, cada fila suma 1).
+PERFORMANCE_QUERY = """
+    UNWIND $rows AS row
+    MERGE (u:User {user_id: row.user_id})
+    MERGE (e:Exercise {exercise_id: row.exercise_id})
+    MERGE (u)-[p:PERFORMED]->(e)
+    SET p.correct_ratio = row.correct_ratio,
+        p.attempts = CASE
+            WHEN row.attempts IS NULL THEN coalesce(p.attempts, 0) + coalesce(row.increment, 1)
+            ELSE row.attempts + coalesce(row.increment, 0)
+        END,
+        p.performed_at = datetime()
+"""
+
+DIFFICULTY_QUERY = """
+    UNWIND $rows AS row
+    MERGE (u:User {user_id: row.user_id})
+    MERGE (s:Skill {skill_id: row.skill_id})
+    MERGE (u)-[d:HAS_DIFFICULTY]->(s)
+    SET d.error_score = row.error_score,
+        d.updated_at = datetime()
+"""
+
+USER_ERROR_QUERY = """
+    UNWIND $rows AS row
+    MERGE (u:User {user_id: row.user_id})
+    MERGE (e:ErrorType {error_id: row.error_id})
+    MERGE (u)-[m:MAKES_ERROR]->(e)
+    SET m.frequency = row.frequency,
+        m.updated_at = datetime()
+"""
+
+TAG_QUERY = """
+    UNWIND $rows AS row
+    MERGE (e:Exercise {exercise_id: row.exercise_id})
+    MERGE (i:Interest {interest_id: row.interest_id})
+    MERGE (e)-[:TAGGED_AS]->(i)
+"""
+
+USER_INTEREST_QUERY = """
+    UNWIND $rows AS row
+    MERGE (u:User {user_id: row.user_id})
+    MERGE (i:Interest {interest_id: row.interest_id})
+    MERGE (u)-[r:INTERESTED_IN]->(i)
+    SET r.weight = row.weight,
+        r.updated_at = datetime()
+"""
+
+SIMILARITY_QUERY = """
+    UNWIND $rows AS pair
+    MERGE (u1:User {user_id: pair.user1})
+    MERGE (u2:User {user_id: pair.user2})
+    MERGE (u1)-[sim:SIMILAR_TO]->(u2)
+    SET sim.similarity_score = pair.score,
+        sim.metric = pair.metric,
+        sim.updated_at = datetime()
+"""
+
+RECOMMENDATION_LOG_QUERY = """
+    UNWIND $rows AS row
+    MATCH (u:User {user_id: row.user_id})
+    MATCH (e:Exercise {exercise_id: row.exercise_id})
+    MERGE (u)-[r:RECOMMENDED]->(e)
+    SET r.timestamp = datetime(),
+        r.strategy = row.strategy,
+        r.accepted = row.accepted
+"""
+
+
+def write_rows(query: str, rows: Iterable[dict], chunk_size: Optional[int] = None) -> int:
+    """
+    Corre `query` (un UNWIND $rows) en chunks dentro de una única transacción de
+    escritura. execute_write reintenta la transacción ante errores transitorios.
+    """
     _ensure_driver()
-    with driver.session() as s:
-        s.run("""
-            MERGE (u:User {user_id: $user_id})
-            MERGE (c:Course {course_id: $course_id})
-            MERGE (u)-[r:COMPLETED]->(c)
-            SET r.level = $level, r.created_at = datetime()
-        """, user_id=user_id, course_id=course_id, level=level)
+    payload = [dict(row) for row in rows]
+    size = max(1, chunk_size or config.NEO4J_BATCH_SIZE)
+    name = query_name(query)
+
+    def work(tx):
+        for i in range(0, len(payload), size):
+            chunk = payload[i:i + size]
+            with metrics.timed_query("neo4j", name, "write") as timer:
+                timer.rows = len(chunk)
+                tx.run(query, rows=chunk).consume()
+
+    if payload:
+        with driver.session() as s:
+            s.execute_write(work)
+        for listener in write_listeners:
+            listener(query, payload)
+    return len(payload)
+
+
+def registrar_progreso(user_id, course_id, level):
+    write_rows(PROGRESS_QUERY, [{"user_id": user_id, "course_id": course_id, "level": level}])
+
+
+def registrar_progreso_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return write_rows(PROGRESS_QUERY, rows, chunk_size)
 
 
 def upsert_user(user_id: str, primary_language: Optional[str], current_level: Optional[int], streak: Optional[int]):
-    _ensure_driver()
-    with driver.session() as s:
-        s.run("""
-            MERGE (u:User {user_id: $user_id})
-            SET u.primary_language = coalesce($primary_language, u.primary_language),
-                u.current_level = coalesce($current_level, u.current_level),
-                u.streak = coalesce($streak, u.streak),
-                u.created_at = coalesce(u.created_at, datetime())
-        """, user_id=user_id, primary_language=primary_language, current_level=current_level, streak=streak)
+    write_rows(UPSERT_USER_QUERY, [{
+        "user_id": user_id,
+        "primary_language": primary_language,
+        "current_level": current_level,
+        "streak": streak,
+    }])
+
+
+def upsert_users_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return write_rows(UPSERT_USER_QUERY, rows, chunk_size)
 
 
 def upsert_exercise(exercise_id: str, type_: Optional[str], difficulty: Optional[int], language: Optional[str]):
-    _ensure_driver()
-    with driver.session() as s:
-        s.run("""
-            MERGE (e:Exercise {exercise_id: $exercise_id})
-            SET e.type = coalesce($type_, e.type),
-                e.difficulty = coalesce($difficulty, e.difficulty),
-                e.language = coalesce($language, e.language),
-                e.created_at = coalesce(e.created_at, datetime())
-        """, exercise_id=exercise_id, type_=type_, difficulty=difficulty, language=language)
+    write_rows(UPSERT_EXERCISE_QUERY, [{
+        "exercise_id": exercise_id,
+        "type": type_,
+        "difficulty": difficulty,
+        "language": language,
+    }])
+
+
+def upsert_exercises_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return write_rows(UPSERT_EXERCISE_QUERY, rows, chunk_size)
 
 
 def upsert_skill(skill_id: str, name: Optional[str], category: Optional[str], level: Optional[int]):
-    _ensure_driver()
-    with driver.session() as s:
-        s.run("""
-            MERGE (s:Skill {skill_id: $skill_id})
-            SET s.name = coalesce($name, s.name),
-                s.category = coalesce($category, s.category),
-                s.level = coalesce($level, s.level)
-        """, skill_id=skill_id, name=name, category=category, level=level)
+    write_rows(UPSERT_SKILL_QUERY, [{
+        "skill_id": skill_id,
+        "name": name,
+        "category": category,
+        "level": level,
+    }])
+
+
+def upsert_skills_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return write_rows(UPSERT_SKILL_QUERY, rows, chunk_size)
 
 
 def upsert_interest(interest_id: str, name: Optional[str], category: Optional[str]):
-    _ensure_driver()
-    with driver.session() as s:
-        s.run("""
-            MERGE (i:Interest {interest_id: $interest_id})
-            SET i.name = coalesce($name, i.name),
-                i.category = coalesce($category, i.category)
-        """, interest_id=interest_id, name=name, category=category)
+    write_rows(UPSERT_INTEREST_QUERY, [{"interest_id": interest_id, "name": name, "category": category}])
+
+
+def upsert_interests_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return write_rows(UPSERT_INTEREST_QUERY, rows, chunk_size)
 
 
 def upsert_error_type(error_id: str, description: Optional[str], category: Optional[str]):
-    _ensure_driver()
-    with driver.session() as s:
-        s.run("""
-            MERGE (e:ErrorType {error_id: $error_id})
-            SET e.description = coalesce($description, e.description),
-                e.category = coalesce($category, e.category)
-        """, error_id=error_id, description=description, category=category)
+    write_rows(UPSERT_ERROR_TYPE_QUERY, [{"error_id": error_id, "description": description, "category": category}])
+
+
+def upsert_error_types_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return write_rows(UPSERT_ERROR_TYPE_QUERY, rows, chunk_size)
 
 
 def register_performance(user_id: str, exercise_id: str, correct_ratio: float, attempts: Optional[int] = None):
     """
     Registra la relacion PERFORMED sumando intentos y dejando timestamp.
     """
-    _ensure_driver()
-    with driver.session() as s:
-        s.run("""
-            MERGE (u:User {user_id: $user_id})
-            MERGE (e:Exercise {exercise_id: $exercise_id})
-            MERGE (u)-[p:PERFORMED]->(e)
-            SET p.correct_ratio = $correct_ratio,
-                p.attempts = coalesce($attempts, coalesce(p.attempts, 0) + 1),
-                p.performed_at = datetime()
-        """, user_id=user_id, exercise_id=exercise_id, correct_ratio=correct_ratio, attempts=attempts)
+    write_rows(PERFORMANCE_QUERY, [{
+        "user_id": user_id,
+        "exercise_id": exercise_id,
+        "correct_ratio": correct_ratio,
+        "attempts": attempts,
+    }])
+
+
+def register_performance_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    """
+    Misma semántica que register_performance; filas repetidas del mismo par
+    (user, exercise) se aplican en orden dentro del UNWIND.
+    """
+    return write_rows(PERFORMANCE_QUERY, rows, chunk_size)
 
 
 def set_difficulty(user_id: str, skill_id: str, error_score: float):
-    _ensure_driver()
-    with driver.session() as s:
-        s.run("""
-            MERGE (u:User {user_id: $user_id})
-            MERGE (s:Skill {skill_id: $skill_id})
-            MERGE (u)-[d:HAS_DIFFICULTY]->(s)
-            SET d.error_score = $error_score,
-                d.updated_at = datetime()
-        """, user_id=user_id, skill_id=skill_id, error_score=error_score)
+    write_rows(DIFFICULTY_QUERY, [{"user_id": user_id, "skill_id": skill_id, "error_score": error_score}])
+
+
+def set_difficulty_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return write_rows(DIFFICULTY_QUERY, rows, chunk_size)
 
 
 def set_user_error(user_id: str, error_id: str, frequency: float):
-    _ensure_driver()
-    with driver.session() as s:
-        s.run("""
-            MERGE (u:User {user_id: $user_id})
-            MERGE (e:ErrorType {error_id: $error_id})
-            MERGE (u)-[m:MAKES_ERROR]->(e)
-            SET m.frequency = $frequency,
-                m.updated_at = datetime()
-        """, user_id=user_id, error_id=error_id, frequency=frequency)
+    write_rows(USER_ERROR_QUERY, [{"user_id": user_id, "error_id": error_id, "frequency": frequency}])
+
+
+def set_user_error_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return write_rows(USER_ERROR_QUERY, rows, chunk_size)
 
 
 def tag_exercise_with_interest(exercise_id: str, interest_id: str):
-    _ensure_driver()
-    with driver.session() as s:
-        s.run("""
-            MERGE (e:Exercise {exercise_id: $exercise_id})
-            MERGE (i:Interest {interest_id: $interest_id})
-            MERGE (e)-[:TAGGED_AS]->(i)
-        """, exercise_id=exercise_id, interest_id=interest_id)
+    write_rows(TAG_QUERY, [{"exercise_id": exercise_id, "interest_id": interest_id}])
+
+
+def tag_exercise_with_interest_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return write_rows(TAG_QUERY, rows, chunk_size)
 
 
 def set_user_interest(user_id: str, interest_id: str, weight: float):
-    _ensure_driver()
-    with driver.session() as s:
-        s.run("""
-            MERGE (u:User {user_id: $user_id})
-            MERGE (i:Interest {interest_id: $interest_id})
-            MERGE (u)-[r:INTERESTED_IN]->(i)
-            SET r.weight = $weight,
-                r.updated_at = datetime()
-        """, user_id=user_id, interest_id=interest_id, weight=weight)
+    write_rows(USER_INTEREST_QUERY, [{"user_id": user_id, "interest_id": interest_id, "weight": weight}])
+
 
+def set_user_interest_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return write_rows(USER_INTEREST_QUERY, rows, chunk_size)
 
-def set_similarity_pairs(pairs: Iterable[dict]):
+
+def set_similarity_pairs(pairs: Iterable[dict], chunk_size: Optional[int] = None):
     """
     Recibe pares [{user1, user2, score, metric}]
     """
-    _ensure_driver()
-    payload = [dict(pair) for pair in pairs]
-    with driver.session() as s:
-        s.run("""
-            UNWIND $pairs AS pair
-            MERGE (u1:User {user_id: pair.user1})
-            MERGE (u2:User {user_id: pair.user2})
-            MERGE (u1)-[sim:SIMILAR_TO]->(u2)
-            SET sim.similarity_score = pair.score,
-                sim.metric = pair.metric,
-                sim.updated_at = datetime()
-        """, pairs=payload)
+    return write_rows(SIMILARITY_QUERY, pairs, chunk_size)
 
 
 def log_recommendation(user_id: str, exercise_id: str, strategy: str, accepted: Optional[bool] = None):
+    write_rows(RECOMMENDATION_LOG_QUERY, [{
+        "user_id": user_id,
+        "exercise_id": exercise_id,
+        "strategy": strategy,
+        "accepted": accepted,
+    }])
+
+
+def log_recommendation_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return write_rows(RECOMMENDATION_LOG_QUERY, rows, chunk_size)
+
+
+def query_name(query: str) -> str:
+    return QUERY_NAMES.get(query, "adhoc")
+
+
+def _read_work(query: str, params: dict, timeout: Optional[float]):
+    name = query_name(query)
+
+    @unit_of_work(timeout=timeout)
+    def work(tx):
+        with metrics.timed_query("neo4j", name, "read") as timer:
+            rows = [dict(row) for row in tx.run(query, params)]
+            timer.rows = len(rows)
+        return rows
+
+    return work
+
+
+def read_rows(query: str, timeout: Optional[float] = None, **params):
+    """
+    Lectura en su propia sesión (para poder correr en paralelo desde el pool).
+    execute_read reintenta ante errores transitorios y, con neo4j://, va a un
+    follower del cluster; el timeout viaja a Neo4j para que el servidor corte la transacción.
+    """
     _ensure_driver()
     with driver.session() as s:
-        s.run("""
-            MATCH (u:User {user_id: $user_id})
-            MATCH (e:Exercise {exercise_id: $exercise_id})
-            MERGE (u)-[r:RECOMMENDED]->(e)
-            SET r.timestamp = datetime(),
-                r.strategy = $strategy,
-                r.accepted = $accepted
-        """, user_id=user_id, exercise_id=exercise_id, strategy=strategy, accepted=accepted)
+        return s.execute_read(_read_work(query, params, timeout))
+
+
+def _float_or_none(value):
+    return float(value) if value is not None else None
+
+
+# --------- Lecturas de recomendación ----------
+# Queries y formateo de filas compartidos con database/neo4j_async.py.
+RECOMMEND_BY_DIFFICULTY_QUERY = """
+    MATCH (u:User {user_id: $user_id})-[d:HAS_DIFFICULTY]->(s:Skill)<-[:EVALUATES]-(e:Exercise)
+    WHERE d.error_score > 0.6
+    RETURN e.exercise_id AS exercise_id,
+           e.difficulty AS difficulty,
+           d.error_score AS error_score
+    ORDER BY d.error_score DESC, e.difficulty
+    LIMIT $limit
+"""
+
+RECOMMEND_BY_SIMILAR_USERS_QUERY = """
+    MATCH (u:User {user_id: $user_id})-[:HAS_DIFFICULTY]->(s:Skill)
+    MATCH (u)-[sim:SIMILAR_TO]->(v:User)
+    WHERE sim.similarity_score > 0.6
+    MATCH (v)-[p:PERFORMED]->(e:Exercise)-[:EVALUATES]->(s)
+    WHERE p.correct_ratio > 0.7
+    RETURN e.exercise_id AS exercise_id,
+           sim.similarity_score AS similarity,
+           avg(p.correct_ratio) AS performance
+    ORDER BY performance DESC, similarity DESC
+    LIMIT $limit
+"""
+
+RECOMMEND_BY_ERRORS_AND_INTERESTS_QUERY = """
+    MATCH (u:User {user_id: $user_id})-[me:MAKES_ERROR]->(et:ErrorType)
+    WHERE me.frequency > 0.6
+    MATCH (et)<-[:TAGGED_AS]-(e:Exercise)
+    OPTIONAL MATCH (u)-[in:INTERESTED_IN]->(t:Interest)<-[:TAGGED_AS]-(e)
+    RETURN e.exercise_id AS exercise_id,
+           me.frequency AS error_weight,
+           in.weight AS interest_weight
+    ORDER BY error_weight DESC, interest_weight DESC
+    LIMIT $limit
+"""
+
+
+def format_by_difficulty(row):
+    return {
+        "exercise_id": row["exercise_id"],
+        "difficulty": row["difficulty"],
+        "error_score": _float_or_none(row["error_score"]),
+    }
 
 
-def recomendar(user_id, limit=10):
+def format_by_similar_users(row):
+    return {
+        "exercise_id": row["exercise_id"],
+        "similarity": _float_or_none(row["similarity"]),
+        "performance": _float_or_none(row["performance"]),
+    }
+
+
+def format_by_errors_and_interests(row):
+    return {
+        "exercise_id": row["exercise_id"],
+        "error_weight": _float_or_none(row["error_weight"]),
+        "interest_weight": _float_or_none(row["interest_weight"]),
+    }
+
+
+# estrategia -> (query, formateo de fila)
+RECOMMEND_QUERIES = {
+    "by_difficulty": (RECOMMEND_BY_DIFFICULTY_QUERY, format_by_difficulty),
+    "by_similar_users": (RECOMMEND_BY_SIMILAR_USERS_QUERY, format_by_similar_users),
+    "by_errors_and_interests": (RECOMMEND_BY_ERRORS_AND_INTERESTS_QUERY, format_by_errors_and_interests),
+}
+
+
+def _strategy(name: str):
+    query, format_row = RECOMMEND_QUERIES[name]
+
+    def run(user_id, limit, timeout=None):
+        return [format_row(row) for row in read_rows(query, timeout, user_id=user_id, limit=limit)]
+
+    return run
+
+
+RECOMMEND_STRATEGIES = {name: _strategy(name) for name in RECOMMEND_QUERIES}
+
+_strategy_pool = ThreadPoolExecutor(
+    max_workers=config.NEO4J_STRATEGY_WORKERS, thread_name_prefix="recomendar"
+)
+
+
+def recomendar(user_id, limit=10, timeout: Optional[float] = None):
     """
     Devuelve recomendaciones en tres estrategias: dificultad, usuarios similares y errores+intereses.
+    Las tres corren en paralelo (cada una en su sesión), así la latencia es la de
+    la más lenta. Si alguna falla o pasa el timeout se devuelve vacía y queda
+    listada en "incomplete"; las demás se devuelven igual.
     """
     _ensure_driver()
-    with driver.session() as s:
-        # Basada en dificultades declaradas
-        difficulty_res = s.run("""
-            MATCH (u:User {user_id: $user_id})-[d:HAS_DIFFICULTY]->(s:Skill)<-[:EVALUATES]-(e:Exercise)
-            WHERE d.error_score > 0.6
-            RETURN e.exercise_id AS exercise_id,
-                   e.difficulty AS difficulty,
-                   d.error_score AS error_score
-            ORDER BY d.error_score DESC, e.difficulty
-            LIMIT $limit
-        """, user_id=user_id, limit=limit)
-        by_difficulty = [
-            {
-                "exercise_id": row["exercise_id"],
-                "difficulty": row["difficulty"],
-                "error_score": float(row["error_score"]) if row["error_score"] is not None else None,
-            }
-            for row in difficulty_res
-        ]
+    timeout = timeout or config.NEO4J_STRATEGY_TIMEOUT
+    futures = {
+        name: _strategy_pool.submit(fn, user_id, limit, timeout)
+        for name, fn in RECOMMEND_STRATEGIES.items()
+    }
+    deadline = time.monotonic() + timeout
+    result = {}
+    incomplete = []
+    for name, future in futures.items():
+        try:
+            result[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except Exception as exc:
+            future.cancel()
+            print(f"[NEO4J] recomendar: strategy {name} failed for {user_id}: {exc!r}")
+            result[name] = []
+            incomplete.append(name)
+    result["incomplete"] = incomplete
+    return result
+
+
+PATTERN_BY_DIFFICULTY_QUERY = """
+    MATCH (u:User {user_id: $user_id})-[d:HAS_DIFFICULTY]->(s:Skill)<-[:EVALUATES]-(e:Exercise)
+    WHERE d.error_score >= $threshold
+    RETURN e.exercise_id AS exercise_id,
+           s.skill_id AS skill_id,
+           d.error_score AS error_score,
+           e.difficulty AS exercise_difficulty
+    ORDER BY d.error_score DESC, e.difficulty
+    LIMIT $limit
+"""
+
+PATTERN_BY_SIMILAR_USERS_QUERY = """
+    MATCH (u:User {user_id: $user_id})-[:HAS_DIFFICULTY]->(s:Skill)
+    MATCH (u)-[sim:SIMILAR_TO]->(v:User)
+    WHERE sim.similarity_score >= $similarity_threshold
+    MATCH (v)-[p:PERFORMED]->(e:Exercise)-[:EVALUATES]->(s)
+    WHERE p.correct_ratio >= $performance_threshold
+    RETURN e.exercise_id AS exercise_id,
+           s.skill_id AS skill_id,
+           sim.similarity_score AS similarity,
+           avg(p.correct_ratio) AS performance
+    ORDER BY performance DESC, similarity DESC
+    LIMIT $limit
+"""
+
+PATTERN_BY_ERRORS_QUERY = """
+    MATCH (u:User {user_id: $user_id})-[err:MAKES_ERROR]->(et:ErrorType)
+    WHERE err.frequency >= $frequency_threshold
+    MATCH (et)<-[:TAGGED_AS]-(e:Exercise)
+    RETURN e.exercise_id AS exercise_id,
+           et.error_id AS error_id,
+           err.frequency AS frequency
+    ORDER BY frequency DESC
+    LIMIT $limit
+"""
+
+PATTERN_BY_INTERESTS_QUERY = """
+    MATCH (u:User {user_id: $user_id})-[i:INTERESTED_IN]->(t:Interest)
+    WHERE i.weight >= $weight_threshold
+    MATCH (e:Exercise)-[:TAGGED_AS]->(t)
+    OPTIONAL MATCH (u)-[d:HAS_DIFFICULTY]->(s:Skill)<-[:EVALUATES]-(e)
+    WITH e, t, i, d
+    WHERE coalesce(d.error_score, 0) >= $min_error_score
+    RETURN e.exercise_id AS exercise_id,
+           t.interest_id AS interest_id,
+           i.weight AS interest_weight,
+           d.error_score AS error_score
+    ORDER BY interest_weight DESC, error_score DESC
+    LIMIT $limit
+"""
+
+PATTERN_MULTI_HOP_QUERY = """
+    MATCH (u:User {user_id: $user_id})-[:HAS_DIFFICULTY]->(s:Skill)
+    MATCH (e:Exercise)-[:EVALUATES]->(s)
+    MATCH (other:User)-[p1:PERFORMED]->(e)
+    WHERE p1.correct_ratio >= $performance_threshold
+    WITH DISTINCT other, s
+    MATCH (other)-[p2:PERFORMED]->(rec:Exercise)
+    RETURN DISTINCT rec.exercise_id AS exercise_id,
+                    other.user_id AS source_user,
+                    s.skill_id AS related_skill,
+                    avg(p2.correct_ratio) AS avg_correct_ratio
+    ORDER BY avg_correct_ratio DESC
+    LIMIT $limit
+"""
+
+
+def pattern_limit(limit: int) -> int:
+    return max(1, min(limit, 200))
+
+
+def format_pattern_by_difficulty(row):
+    return {
+        "exercise_id": row["exercise_id"],
+        "skill_id": row["skill_id"],
+        "error_score": _float_or_none(row["error_score"]),
+        "exercise_difficulty": row["exercise_difficulty"],
+    }
 
-        # Basada en usuarios similares
-        similar_res = s.run("""
-            MATCH (u:User {user_id: $user_id})-[:HAS_DIFFICULTY]->(s:Skill)
-            MATCH (u)-[sim:SIMILAR_TO]->(v:User)
-            WHERE sim.similarity_score > 0.6
-            MATCH (v)-[p:PERFORMED]->(e:Exercise)-[:EVALUATES]->(s)
-            WHERE p.correct_ratio > 0.7
-            RETURN e.exercise_id AS exercise_id,
-                   sim.similarity_score AS similarity,
-                   avg(p.correct_ratio) AS performance
-            ORDER BY performance DESC, similarity DESC
-            LIMIT $limit
-        """, user_id=user_id, limit=limit)
-        by_similar = [
-            {
-                "exercise_id": row["exercise_id"],
-                "similarity": float(row["similarity"]) if row["similarity"] is not None else None,
-                "performance": float(row["performance"]) if row["performance"] is not None else None,
-            }
-            for row in similar_res
-        ]
 
-        # Basada en errores recurrentes + intereses
-        error_interest_res = s.run("""
-            MATCH (u:User {user_id: $user_id})-[me:MAKES_ERROR]->(et:ErrorType)
-            WHERE me.frequency > 0.6
-            MATCH (et)<-[:TAGGED_AS]-(e:Exercise)
-            OPTIONAL MATCH (u)-[in:INTERESTED_IN]->(t:Interest)<-[:TAGGED_AS]-(e)
-            RETURN e.exercise_id AS exercise_id,
-                   me.frequency AS error_weight,
-                   in.weight AS interest_weight
-            ORDER BY error_weight DESC, interest_weight DESC
-            LIMIT $limit
-        """, user_id=user_id, limit=limit)
-        by_errors_interests = [
-            {
-                "exercise_id": row["exercise_id"],
-                "error_weight": float(row["error_weight"]) if row["error_weight"] is not None else None,
-                "interest_weight": float(row["interest_weight"]) if row["interest_weight"] is not None else None,
-            }
-            for row in error_interest_res
-        ]
+def format_pattern_by_similar_users(row):
+    return {
+        "exercise_id": row["exercise_id"],
+        "skill_id": row["skill_id"],
+        "similarity": _float_or_none(row["similarity"]),
+        "performance": _float_or_none(row["performance"]),
+    }
+
 
+def format_pattern_by_errors(row):
     return {
-        "by_difficulty": by_difficulty,
-        "by_similar_users": by_similar,
-        "by_errors_and_interests": by_errors_interests,
+        "exercise_id": row["exercise_id"],
+        "error_id": row["error_id"],
+        "frequency": _float_or_none(row["frequency"]),
+    }
+
+
+def format_pattern_by_interests(row):
+    return {
+        "exercise_id": row["exercise_id"],
+        "interest_id": row["interest_id"],
+        "interest_weight": _float_or_none(row["interest_weight"]),
+        "error_score": _float_or_none(row["error_score"]),
+    }
+
+
+def format_pattern_multi_hop(row):
+    return {
+        "exercise_id": row["exercise_id"],
+        "source_user": row["source_user"],
+        "related_skill": row["related_skill"],
+        "avg_correct_ratio": _float_or_none(row["avg_correct_ratio"]),
     }
 
 
@@ -276,35 +625,13 @@ def pattern_by_difficulty(user_id: str, threshold: float = 0.6, limit: int = 20)
     """
     Acceso: usuario -> dificultades -> ejercicios que evalúan esas skills.
     """
-    _ensure_driver()
-    limit = max(1, min(limit, 200))
-    with driver.session() as s:
-        result = s.run(
-            """
-            MATCH (u:User {user_id: $user_id})-[d:HAS_DIFFICULTY]->(s:Skill)<-[:EVALUATES]-(e:Exercise)
-            WHERE d.error_score >= $threshold
-            RETURN e.exercise_id AS exercise_id,
-                   s.skill_id AS skill_id,
-                   d.error_score AS error_score,
-                   e.difficulty AS exercise_difficulty
-            ORDER BY d.error_score DESC, e.difficulty
-            LIMIT $limit
-        """,
-            user_id=user_id,
-            threshold=threshold,
-            limit=limit,
-        )
-        return [
-            {
-                "exercise_id": row["exercise_id"],
-                "skill_id": row["skill_id"],
-                "error_score": float(row["error_score"])
-                if row["error_score"] is not None
-                else None,
-                "exercise_difficulty": row["exercise_difficulty"],
-            }
-            for row in result
-        ]
+    rows = read_rows(
+        PATTERN_BY_DIFFICULTY_QUERY,
+        user_id=user_id,
+        threshold=threshold,
+        limit=pattern_limit(limit),
+    )
+    return [format_pattern_by_difficulty(row) for row in rows]
 
 
 def pattern_by_similar_users(
@@ -316,75 +643,27 @@ def pattern_by_similar_users(
     """
     Acceso colaborativo: usuarios similares -> ejercicios con buen rendimiento.
     """
-    _ensure_driver()
-    limit = max(1, min(limit, 200))
-    with driver.session() as s:
-        result = s.run(
-            """
-            MATCH (u:User {user_id: $user_id})-[:HAS_DIFFICULTY]->(s:Skill)
-            MATCH (u)-[sim:SIMILAR_TO]->(v:User)
-            WHERE sim.similarity_score >= $similarity_threshold
-            MATCH (v)-[p:PERFORMED]->(e:Exercise)-[:EVALUATES]->(s)
-            WHERE p.correct_ratio >= $performance_threshold
-            RETURN e.exercise_id AS exercise_id,
-                   s.skill_id AS skill_id,
-                   sim.similarity_score AS similarity,
-                   avg(p.correct_ratio) AS performance
-            ORDER BY performance DESC, similarity DESC
-            LIMIT $limit
-        """,
-            user_id=user_id,
-            similarity_threshold=similarity_threshold,
-            performance_threshold=performance_threshold,
-            limit=limit,
-        )
-        return [
-            {
-                "exercise_id": row["exercise_id"],
-                "skill_id": row["skill_id"],
-                "similarity": float(row["similarity"])
-                if row["similarity"] is not None
-                else None,
-                "performance": float(row["performance"])
-                if row["performance"] is not None
-                else None,
-            }
-            for row in result
-        ]
+    rows = read_rows(
+        PATTERN_BY_SIMILAR_USERS_QUERY,
+        user_id=user_id,
+        similarity_threshold=similarity_threshold,
+        performance_threshold=performance_threshold,
+        limit=pattern_limit(limit),
+    )
+    return [format_pattern_by_similar_users(row) for row in rows]
 
 
 def pattern_by_errors(user_id: str, frequency_threshold: float = 0.7, limit: int = 20):
     """
     Errores recurrentes -> ejercicios etiquetados con ese error.
     """
-    _ensure_driver()
-    limit = max(1, min(limit, 200))
-    with driver.session() as s:
-        result = s.run(
-            """
-            MATCH (u:User {user_id: $user_id})-[err:MAKES_ERROR]->(et:ErrorType)
-            WHERE err.frequency >= $frequency_threshold
-            MATCH (et)<-[:TAGGED_AS]-(e:Exercise)
-            RETURN e.exercise_id AS exercise_id,
-                   et.error_id AS error_id,
-                   err.frequency AS frequency
-            ORDER BY frequency DESC
-            LIMIT $limit
-        """,
-            user_id=user_id,
-            frequency_threshold=frequency_threshold,
-            limit=limit,
-        )
-        return [
-            {
-                "exercise_id": row["exercise_id"],
-                "error_id": row["error_id"],
-                "frequency": float(row["frequency"])
-                if row["frequency"] is not None
-                else None,
-            }
-            for row in result
-        ]
+    rows = read_rows(
+        PATTERN_BY_ERRORS_QUERY,
+        user_id=user_id,
+        frequency_threshold=frequency_threshold,
+        limit=pattern_limit(limit),
+    )
+    return [format_pattern_by_errors(row) for row in rows]
 
 
 def pattern_by_interests(
@@ -396,42 +675,14 @@ def pattern_by_interests(
     """
     Intereses del usuario + skills con dificultad (opcional).
     """
-    _ensure_driver()
-    limit = max(1, min(limit, 200))
-    with driver.session() as s:
-        result = s.run(
-            """
-            MATCH (u:User {user_id: $user_id})-[i:INTERESTED_IN]->(t:Interest)
-            WHERE i.weight >= $weight_threshold
-            MATCH (e:Exercise)-[:TAGGED_AS]->(t)
-            OPTIONAL MATCH (u)-[d:HAS_DIFFICULTY]->(s:Skill)<-[:EVALUATES]-(e)
-            WITH e, t, i, d
-            WHERE coalesce(d.error_score, 0) >= $min_error_score
-            RETURN e.exercise_id AS exercise_id,
-                   t.interest_id AS interest_id,
-                   i.weight AS interest_weight,
-                   d.error_score AS error_score
-            ORDER BY interest_weight DESC, error_score DESC
-            LIMIT $limit
-        """,
-            user_id=user_id,
-            weight_threshold=weight_threshold,
-            min_error_score=min_error_score,
-            limit=limit,
-        )
-        return [
-            {
-                "exercise_id": row["exercise_id"],
-                "interest_id": row["interest_id"],
-                "interest_weight": float(row["interest_weight"])
-                if row["interest_weight"] is not None
-                else None,
-                "error_score": float(row["error_score"])
-                if row["error_score"] is not None
-                else None,
-            }
-            for row in result
-        ]
+    rows = read_rows(
+        PATTERN_BY_INTERESTS_QUERY,
+        user_id=user_id,
+        weight_threshold=weight_threshold,
+        min_error_score=min_error_score,
+        limit=pattern_limit(limit),
+    )
+    return [format_pattern_by_interests(row) for row in rows]
 
 
 def pattern_multi_hop(
@@ -440,177 +691,285 @@ def pattern_multi_hop(
     """
     Multi-salto: dificultades -> ejercicios -> otros usuarios -> nuevos ejercicios.
     """
-    _ensure_driver()
-    limit = max(1, min(limit, 200))
-    with driver.session() as s:
-        result = s.run(
-            """
-            MATCH (u:User {user_id: $user_id})-[:HAS_DIFFICULTY]->(s:Skill)
-            MATCH (e:Exercise)-[:EVALUATES]->(s)
-            MATCH (other:User)-[p1:PERFORMED]->(e)
-            WHERE p1.correct_ratio >= $performance_threshold
-            WITH DISTINCT other, s
-            MATCH (other)-[p2:PERFORMED]->(rec:Exercise)
-            RETURN DISTINCT rec.exercise_id AS exercise_id,
-                            other.user_id AS source_user,
-                            s.skill_id AS related_skill,
-                            avg(p2.correct_ratio) AS avg_correct_ratio
-            ORDER BY avg_correct_ratio DESC
-            LIMIT $limit
-        """,
-            user_id=user_id,
-            performance_threshold=performance_threshold,
-            limit=limit,
-        )
-        return [
-            {
-                "exercise_id": row["exercise_id"],
-                "source_user": row["source_user"],
-                "related_skill": row["related_skill"],
-                "avg_correct_ratio": float(row["avg_correct_ratio"])
-                if row["avg_correct_ratio"] is not None
-                else None,
-            }
-            for row in result
-        ]
+    rows = read_rows(
+        PATTERN_MULTI_HOP_QUERY,
+        user_id=user_id,
+        performance_threshold=performance_threshold,
+        limit=pattern_limit(limit),
+    )
+    return [format_pattern_multi_hop(row) for row in rows]
 
 
 # --------- Getters para exponer datos de tablas/relaciones ----------
+# recurso -> (label, clave); la clave tiene índice por el constraint de init_neo4j
+NODE_EXPORTS = {
+    "users": ("User", "user_id"),
+    "exercises": ("Exercise", "exercise_id"),
+    "skills": ("Skill", "skill_id"),
+    "interests": ("Interest", "interest_id"),
+    "error-types": ("ErrorType", "error_id"),
+}
+
+
+def node_list_query(resource: str) -> str:
+    label, key = NODE_EXPORTS[resource]
+    query = f"MATCH (n:{label}) RETURN properties(n) AS node ORDER BY n.{key}"
+    QUERY_NAMES.setdefault(query, f"list_{resource}")
+    return query
+
+
+def format_node(row):
+    # las recomendaciones materializadas no son datos del usuario
+    return {k: v for k, v in row["node"].items() if not k.startswith("materialized_")}
+
+
+def list_nodes(resource: str):
+    return [format_node(row) for row in read_rows(node_list_query(resource))]
+
+
 def list_users():
-    _ensure_driver()
-    with driver.session() as s:
-        result = s.run("MATCH (u:User) RETURN u ORDER BY u.user_id")
-        return [dict(r["u"]) for r in result]
+    return list_nodes("users")
 
 
 def list_exercises():
-    _ensure_driver()
-    with driver.session() as s:
-        result = s.run("MATCH (e:Exercise) RETURN e ORDER BY e.exercise_id")
-        return [dict(r["e"]) for r in result]
+    return list_nodes("exercises")
 
 
 def list_skills():
-    _ensure_driver()
-    with driver.session() as s:
-        result = s.run("MATCH (s:Skill) RETURN s ORDER BY s.skill_id")
-        return [dict(r["s"]) for r in result]
+    return list_nodes("skills")
 
 
 def list_interests():
-    _ensure_driver()
-    with driver.session() as s:
-        result = s.run("MATCH (i:Interest) RETURN i ORDER BY i.interest_id")
-        return [dict(r["i"]) for r in result]
+    return list_nodes("interests")
 
 
 def list_error_types():
-    _ensure_driver()
-    with driver.session() as s:
-        result = s.run("MATCH (e:ErrorType) RETURN e ORDER BY e.error_id")
-        return [dict(r["e"]) for r in result]
+    return list_nodes("error-types")
 
 
-def list_performed(limit=200):
-    _ensure_driver()
-    with driver.session() as s:
-        result = s.run("""
-            MATCH (u:User)-[p:PERFORMED]->(e:Exercise)
-            RETURN u.user_id AS user_id,
-                   e.exercise_id AS exercise_id,
-                   p.correct_ratio AS correct_ratio,
-                   p.attempts AS attempts,
-                   p.performed_at AS performed_at
-            ORDER BY performed_at DESC
-            LIMIT $limit
-        """, limit=limit)
-        return [dict(r) for r in result]
-
-
-def list_difficulties(limit=200):
-    _ensure_driver()
-    with driver.session() as s:
-        result = s.run("""
-            MATCH (u:User)-[d:HAS_DIFFICULTY]->(s:Skill)
-            RETURN u.user_id AS user_id,
-                   s.skill_id AS skill_id,
-                   d.error_score AS error_score,
-                   d.updated_at AS updated_at
-            ORDER BY d.error_score DESC
-            LIMIT $limit
-        """, limit=limit)
-        return [dict(r) for r in result]
-
-
-def list_user_errors(limit=200):
-    _ensure_driver()
-    with driver.session() as s:
-        result = s.run("""
-            MATCH (u:User)-[m:MAKES_ERROR]->(e:ErrorType)
-            RETURN u.user_id AS user_id,
-                   e.error_id AS error_id,
-                   m.frequency AS frequency,
-                   m.updated_at AS updated_at
-            ORDER BY m.frequency DESC
-            LIMIT $limit
-        """, limit=limit)
-        return [dict(r) for r in result]
-
-
-def list_user_interests(limit=200):
+# --------- Export en streaming de nodos ----------
+
+_PROPERTY_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def iter_nodes(resource: str, after: Optional[str] = None, fields: Optional[list] = None, limit: Optional[int] = None):
+    """
+    Versión en streaming de los list_* de nodos: ordena por la clave (keyset,
+    `n.key > $after`) y devuelve un generador; el driver trae los registros de a
+    fetch_size a medida que se consume, así nunca se arma la lista entera.
+    fields proyecta solo esas propiedades (la clave va siempre). Valida todo antes
+    de devolver el generador para que el error salga antes de empezar a responder.
+    """
+    if resource not in NODE_EXPORTS:
+        raise KeyError(resource)
+    label, key = NODE_EXPORTS[resource]
+    if fields:
+        bad = [f for f in fields if not _PROPERTY_NAME.match(f)]
+        if bad:
+            raise ValueError(f"invalid field names: {bad}")
+        columns = [key] + [f for f in fields if f != key]
+        projection = "n {" + ", ".join(f".{f}" for f in columns) + "}"
+    else:
+        projection = "properties(n)"
+    where = f"WHERE n.{key} > $after" if after is not None else ""
+    limit_clause = "LIMIT $limit" if limit else ""
+    query = f"""
+        MATCH (n:{label})
+        {where}
+        RETURN {projection} AS row
+        ORDER BY n.{key}
+        {limit_clause}
+    """
+    # las recomendaciones materializadas no son datos del usuario (igual que list_users)
+    hide_materialized = label == "User" and not fields
     _ensure_driver()
-    with driver.session() as s:
-        result = s.run("""
-            MATCH (u:User)-[r:INTERESTED_IN]->(i:Interest)
-            RETURN u.user_id AS user_id,
-                   i.interest_id AS interest_id,
-                   r.weight AS weight,
-                   r.updated_at AS updated_at
-            ORDER BY r.weight DESC
-            LIMIT $limit
-        """, limit=limit)
-        return [dict(r) for r in result]
+
+    def generate():
+        # el tiempo medido incluye lo que tarda el consumidor en pedir cada fila
+        with metrics.timed_query("neo4j", f"export_{resource}", "read") as timer, driver.session() as s:
+            for record in s.run(query, after=after, limit=limit):
+                node = record["row"]
+                if hide_materialized:
+                    node = {k: v for k, v in node.items() if not k.startswith("materialized_")}
+                timer.rows += 1
+                yield node
+
+    return generate()
+
+
+# --------- Listados de relaciones con cursor ----------
+# Orden: propiedad DESC y, para desempatar, (u.user_id, clave del otro nodo) ASC.
+# El page token es ese trío en base64; la página siguiente arranca justo después.
+def encode_list_token(sort_value, user_id, other_id) -> str:
+    if hasattr(sort_value, "iso_format"):
+        sort_value = sort_value.iso_format()
+    raw = json.dumps([sort_value, user_id, other_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _check_temporal(value) -> str:
+    """
+    El valor va a datetime() de Cypher: se valida acá para que uno mal formado
+    sea un 400 y no un error de Neo4j. iso_format trae nanosegundos, que
+    fromisoformat no acepta en todas las versiones: se recorta a microsegundos.
+    """
+    if not isinstance(value, str):
+        raise ValueError("invalid page token")
+    datetime.fromisoformat(re.sub(r"(\.\d{6})\d+", r"\1", value).replace("Z", "+00:00"))
+    return value
+
+
+def decode_list_token(page_token: Optional[str], listing: Optional[str] = None):
+    """
+    Token -> [valor de orden, user_id, id del otro nodo]. Con listing también
+    valida el tipo del valor de orden (fecha ISO o número). Mal formado levanta ValueError.
+    """
+    if not page_token:
+        return None
+    try:
+        cursor = json.loads(base64.b64decode(page_token.encode("ascii"), altchars=b"-_", validate=True))
+    except Exception as exc:
+        raise ValueError("invalid page token") from exc
+    if not isinstance(cursor, list) or len(cursor) != 3 or not all(isinstance(v, str) for v in cursor[1:]):
+        raise ValueError("invalid page token")
+    if listing is not None:
+        if RELATIONSHIP_LISTINGS[listing][4]:
+            _check_temporal(cursor[0])
+        elif isinstance(cursor[0], bool) or not isinstance(cursor[0], (int, float)):
+            raise ValueError("invalid page token")
+    return cursor
+
+
+# listado -> (tipo, label del otro nodo, su clave, propiedad de orden, es temporal, columnas)
+RELATIONSHIP_LISTINGS = {
+    "performed": ("PERFORMED", "Exercise", "exercise_id", "performed_at", True, """
+               u.user_id AS user_id,
+               o.exercise_id AS exercise_id,
+               r.correct_ratio AS correct_ratio,
+               r.attempts AS attempts,
+               r.performed_at AS performed_at"""),
+    "difficulties": ("HAS_DIFFICULTY", "Skill", "skill_id", "error_score", False, """
+               u.user_id AS user_id,
+               o.skill_id AS skill_id,
+               r.error_score AS error_score,
+               r.updated_at AS updated_at"""),
+    "user-errors": ("MAKES_ERROR", "ErrorType", "error_id", "frequency", False, """
+               u.user_id AS user_id,
+               o.error_id AS error_id,
+               r.frequency AS frequency,
+               r.updated_at AS updated_at"""),
+    "user-interests": ("INTERESTED_IN", "Interest", "interest_id", "weight", False, """
+               u.user_id AS user_id,
+               o.interest_id AS interest_id,
+               r.weight AS weight,
+               r.updated_at AS updated_at"""),
+    "similarities": ("SIMILAR_TO", "User", "user_id", "similarity_score", False, """
+               u.user_id AS user_id,
+               o.user_id AS similar_to,
+               r.similarity_score AS similarity_score,
+               r.metric AS metric,
+               r.updated_at AS updated_at"""),
+    "recommended": ("RECOMMENDED", "Exercise", "exercise_id", "timestamp", True, """
+               u.user_id AS user_id,
+               o.exercise_id AS exercise_id,
+               r.strategy AS strategy,
+               r.accepted AS accepted,
+               r.timestamp AS timestamp"""),
+}
+
+
+def relationship_list_query(
+    listing: str,
+    limit: int,
+    page_token: Optional[str] = None,
+    user_id: Optional[str] = None,
+    other_id: Optional[str] = None,
+):
+    """
+    Con user_id / other_id el MATCH arranca del nodo por su índice único en vez de
+    recorrer todas las relaciones del tipo; sin filtros el orden lo resuelve el
+    índice de RELATIONSHIP_INDEXES. Las relaciones sin la propiedad de orden
+    no se listan (los escritores siempre la setean). Pide limit + 1 filas para
+    saber si hay página siguiente.
+    """
+    rel_type, other_label, other_key, sort, temporal, returns = RELATIONSHIP_LISTINGS[listing]
+    cursor = decode_list_token(page_token, listing)
+    user_filter = " {user_id: $user_id}" if user_id else ""
+    other_filter = f" {{{other_key}: $other_id}}" if other_id else ""
+    conditions = [f"r.{sort} IS NOT NULL"]
+    params = {"user_id": user_id, "other_id": other_id, "limit": limit + 1}
+    if cursor:
+        after = "datetime($after_sort)" if temporal else "$after_sort"
+        conditions.append(
+            f"(r.{sort} < {after} OR (r.{sort} = {after} AND "
+            f"(u.user_id > $after_user OR (u.user_id = $after_user AND o.{other_key} > $after_other))))"
+        )
+        params.update(after_sort=cursor[0], after_user=cursor[1], after_other=cursor[2])
+    query = f"""
+        MATCH (u:User{user_filter})-[r:{rel_type}]->(o:{other_label}{other_filter})
+        WHERE {" AND ".join(conditions)}
+        RETURN {returns.strip()},
+               r.{sort} AS _sort, u.user_id AS _user, o.{other_key} AS _other
+        ORDER BY r.{sort} DESC, u.user_id, o.{other_key}
+        LIMIT $limit
+    """
+    QUERY_NAMES.setdefault(query, f"list_{listing}")
+    return query, params
+
+
+def relationship_page(rows: list, limit: int):
+    next_page_token = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_page_token = encode_list_token(last["_sort"], last["_user"], last["_other"])
+    items = [{k: v for k, v in row.items() if not k.startswith("_")} for row in rows]
+    return {"items": items, "next_page_token": next_page_token}
+
+
+def list_relationships(listing: str, limit=200, page_token=None, user_id=None, other_id=None):
+    query, params = relationship_list_query(listing, limit, page_token, user_id, other_id)
+    return relationship_page(read_rows(query, **params), limit)
+
+
+def list_performed(limit=200, page_token=None, user_id=None, exercise_id=None):
+    return list_relationships("performed", limit, page_token, user_id, exercise_id)
+
+
+def list_difficulties(limit=200, page_token=None, user_id=None, skill_id=None):
+    return list_relationships("difficulties", limit, page_token, user_id, skill_id)
+
+
+def list_user_errors(limit=200, page_token=None, user_id=None, error_id=None):
+    return list_relationships("user-errors", limit, page_token, user_id, error_id)
+
+
+def list_user_interests(limit=200, page_token=None, user_id=None, interest_id=None):
+    return list_relationships("user-interests", limit, page_token, user_id, interest_id)
+
+
+LIST_TAGS_QUERY = """
+    MATCH (e:Exercise)-[:TAGGED_AS]->(i:Interest)
+    RETURN e.exercise_id AS exercise_id,
+           i.interest_id AS interest_id
+    LIMIT $limit
+"""
 
 
 def list_tags(limit=200):
-    _ensure_driver()
-    with driver.session() as s:
-        result = s.run("""
-            MATCH (e:Exercise)-[:TAGGED_AS]->(i:Interest)
-            RETURN e.exercise_id AS exercise_id,
-                   i.interest_id AS interest_id
-            LIMIT $limit
-        """, limit=limit)
-        return [dict(r) for r in result]
+    return read_rows(LIST_TAGS_QUERY, limit=limit)
 
 
-def list_similarities(limit=200):
-    _ensure_driver()
-    with driver.session() as s:
-        result = s.run("""
-            MATCH (u1:User)-[s:SIMILAR_TO]->(u2:User)
-            RETURN u1.user_id AS user_id,
-                   u2.user_id AS similar_to,
-                   s.similarity_score AS similarity_score,
-                   s.metric AS metric,
-                   s.updated_at AS updated_at
-            ORDER BY similarity_score DESC
-            LIMIT $limit
-        """, limit=limit)
-        return [dict(r) for r in result]
-
-
-def list_recommendations(limit=200):
-    _ensure_driver()
-    with driver.session() as s:
-        result = s.run("""
-            MATCH (u:User)-[r:RECOMMENDED]->(e:Exercise)
-            RETURN u.user_id AS user_id,
-                   e.exercise_id AS exercise_id,
-                   r.strategy AS strategy,
-                   r.accepted AS accepted,
-                   r.timestamp AS timestamp
-            ORDER BY r.timestamp DESC
-            LIMIT $limit
-        """, limit=limit)
-        return [dict(r) for r in result]
+def list_similarities(limit=200, page_token=None, user_id=None, similar_to=None):
+    return list_relationships("similarities", limit, page_token, user_id, similar_to)
+
+
+def list_recommendations(limit=200, page_token=None, user_id=None, exercise_id=None):
+    return list_relationships("recommended", limit, page_token, user_id, exercise_id)
+
+
+QUERY_NAMES.update({
+    value: name[:-len("_QUERY")].lower()
+    for name, value in list(globals().items())
+    if name.endswith("_QUERY") and isinstance(value, str)
+})
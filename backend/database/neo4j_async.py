@@ -0,0 +1,388 @@
+"""
+Variante asyncio de database.neo4j para los routers `async def`.
+
+Usa AsyncGraphDatabase con las mismas queries y el mismo formateo de filas que
+el módulo sync; todo pasa por transacciones administradas (execute_read /
+execute_write), que reintentan ante errores transitorios como un cambio de líder.
+Con NEO4J_URI=neo4j://... las lecturas van a los followers del cluster.
+"""
+import asyncio
+from typing import Iterable, Optional
+
+from neo4j import AsyncGraphDatabase, unit_of_work
+
+import config
+import metrics
+from database import neo4j as neo4j_db
+from database.neo4j import (
+    DIFFICULTY_QUERY,
+    LIST_TAGS_QUERY,
+    PATTERN_BY_DIFFICULTY_QUERY,
+    PATTERN_BY_ERRORS_QUERY,
+    PATTERN_BY_INTERESTS_QUERY,
+    PATTERN_BY_SIMILAR_USERS_QUERY,
+    PATTERN_MULTI_HOP_QUERY,
+    PERFORMANCE_QUERY,
+    PROGRESS_QUERY,
+    RECOMMEND_QUERIES,
+    RECOMMENDATION_LOG_QUERY,
+    SIMILARITY_QUERY,
+    TAG_QUERY,
+    UPSERT_ERROR_TYPE_QUERY,
+    UPSERT_EXERCISE_QUERY,
+    UPSERT_INTEREST_QUERY,
+    UPSERT_SKILL_QUERY,
+    UPSERT_USER_QUERY,
+    USER_ERROR_QUERY,
+    USER_INTEREST_QUERY,
+    driver_options,
+    format_node,
+    format_pattern_by_difficulty,
+    format_pattern_by_errors,
+    format_pattern_by_interests,
+    format_pattern_by_similar_users,
+    format_pattern_multi_hop,
+    node_list_query,
+    pattern_limit,
+    query_name,
+    relationship_list_query,
+    relationship_page,
+)
+
+driver = None
+
+
+def _ensure_driver():
+    """
+    Crear el driver no abre conexiones; las constraints e índices los crea init_neo4j.
+    """
+    global driver
+    if driver is None:
+        driver = AsyncGraphDatabase.driver(config.NEO4J_URI, **driver_options())
+    return driver
+
+
+async def close():
+    global driver
+    if driver is not None:
+        await driver.close()
+        driver = None
+
+
+async def read_rows(query: str, timeout: Optional[float] = None, **params):
+    name = query_name(query)
+
+    @unit_of_work(timeout=timeout)
+    async def work(tx):
+        with metrics.timed_query("neo4j", name, "read") as timer:
+            result = await tx.run(query, params)
+            rows = [dict(row) async for row in result]
+            timer.rows = len(rows)
+        return rows
+
+    async with _ensure_driver().session() as s:
+        return await s.execute_read(work)
+
+
+async def write_rows(query: str, rows: Iterable[dict], chunk_size: Optional[int] = None) -> int:
+    """
+    Igual que neo4j.write_rows: todos los chunks en una transacción de escritura
+    y después los write_listeners (materialize, graph_engine).
+    """
+    payload = [dict(row) for row in rows]
+    size = max(1, chunk_size or config.NEO4J_BATCH_SIZE)
+    name = query_name(query)
+
+    async def work(tx):
+        for i in range(0, len(payload), size):
+            chunk = payload[i:i + size]
+            with metrics.timed_query("neo4j", name, "write") as timer:
+                timer.rows = len(chunk)
+                result = await tx.run(query, rows=chunk)
+                await result.consume()
+
+    if payload:
+        async with _ensure_driver().session() as s:
+            await s.execute_write(work)
+        for listener in neo4j_db.write_listeners:
+            listener(query, payload)
+    return len(payload)
+
+
+# --------- Escritores ----------
+async def registrar_progreso(user_id, course_id, level):
+    await write_rows(PROGRESS_QUERY, [{"user_id": user_id, "course_id": course_id, "level": level}])
+
+
+async def registrar_progreso_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return await write_rows(PROGRESS_QUERY, rows, chunk_size)
+
+
+async def upsert_user(user_id: str, primary_language: Optional[str], current_level: Optional[int], streak: Optional[int]):
+    await write_rows(UPSERT_USER_QUERY, [{
+        "user_id": user_id,
+        "primary_language": primary_language,
+        "current_level": current_level,
+        "streak": streak,
+    }])
+
+
+async def upsert_users_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return await write_rows(UPSERT_USER_QUERY, rows, chunk_size)
+
+
+async def upsert_exercise(exercise_id: str, type_: Optional[str], difficulty: Optional[int], language: Optional[str]):
+    await write_rows(UPSERT_EXERCISE_QUERY, [{
+        "exercise_id": exercise_id,
+        "type": type_,
+        "difficulty": difficulty,
+        "language": language,
+    }])
+
+
+async def upsert_exercises_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return await write_rows(UPSERT_EXERCISE_QUERY, rows, chunk_size)
+
+
+async def upsert_skill(skill_id: str, name: Optional[str], category: Optional[str], level: Optional[int]):
+    await write_rows(UPSERT_SKILL_QUERY, [{
+        "skill_id": skill_id,
+        "name": name,
+        "category": category,
+        "level": level,
+    }])
+
+
+async def upsert_skills_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return await write_rows(UPSERT_SKILL_QUERY, rows, chunk_size)
+
+
+async def upsert_interest(interest_id: str, name: Optional[str], category: Optional[str]):
+    await write_rows(UPSERT_INTEREST_QUERY, [{"interest_id": interest_id, "name": name, "category": category}])
+
+
+async def upsert_interests_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return await write_rows(UPSERT_INTEREST_QUERY, rows, chunk_size)
+
+
+async def upsert_error_type(error_id: str, description: Optional[str], category: Optional[str]):
+    await write_rows(UPSERT_ERROR_TYPE_QUERY, [{"error_id": error_id, "description": description, "category": category}])
+
+
+async def upsert_error_types_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return await write_rows(UPSERT_ERROR_TYPE_QUERY, rows, chunk_size)
+
+
+async def register_performance(user_id: str, exercise_id: str, correct_ratio: float, attempts: Optional[int] = None):
+    await write_rows(PERFORMANCE_QUERY, [{
+        "user_id": user_id,
+        "exercise_id": exercise_id,
+        "correct_ratio": correct_ratio,
+        "attempts": attempts,
+    }])
+
+
+async def register_performance_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return await write_rows(PERFORMANCE_QUERY, rows, chunk_size)
+
+
+async def set_difficulty(user_id: str, skill_id: str, error_score: float):
+    await write_rows(DIFFICULTY_QUERY, [{"user_id": user_id, "skill_id": skill_id, "error_score": error_score}])
+
+
+async def set_difficulty_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return await write_rows(DIFFICULTY_QUERY, rows, chunk_size)
+
+
+async def set_user_error(user_id: str, error_id: str, frequency: float):
+    await write_rows(USER_ERROR_QUERY, [{"user_id": user_id, "error_id": error_id, "frequency": frequency}])
+
+
+async def set_user_error_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return await write_rows(USER_ERROR_QUERY, rows, chunk_size)
+
+
+async def tag_exercise_with_interest(exercise_id: str, interest_id: str):
+    await write_rows(TAG_QUERY, [{"exercise_id": exercise_id, "interest_id": interest_id}])
+
+
+async def tag_exercise_with_interest_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return await write_rows(TAG_QUERY, rows, chunk_size)
+
+
+async def set_user_interest(user_id: str, interest_id: str, weight: float):
+    await write_rows(USER_INTEREST_QUERY, [{"user_id": user_id, "interest_id": interest_id, "weight": weight}])
+
+
+async def set_user_interest_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return await write_rows(USER_INTEREST_QUERY, rows, chunk_size)
+
+
+async def set_similarity_pairs(pairs: Iterable[dict], chunk_size: Optional[int] = None):
+    return await write_rows(SIMILARITY_QUERY, pairs, chunk_size)
+
+
+async def log_recommendation(user_id: str, exercise_id: str, strategy: str, accepted: Optional[bool] = None):
+    await write_rows(RECOMMENDATION_LOG_QUERY, [{
+        "user_id": user_id,
+        "exercise_id": exercise_id,
+        "strategy": strategy,
+        "accepted": accepted,
+    }])
+
+
+async def log_recommendation_batch(rows: Iterable[dict], chunk_size: Optional[int] = None):
+    return await write_rows(RECOMMENDATION_LOG_QUERY, rows, chunk_size)
+
+
+# --------- Recomendaciones ----------
+async def _run_strategy(name: str, user_id, limit, timeout):
+    query, format_row = RECOMMEND_QUERIES[name]
+    rows = await read_rows(query, timeout, user_id=user_id, limit=limit)
+    return [format_row(row) for row in rows]
+
+
+async def recomendar(user_id, limit=10, timeout: Optional[float] = None):
+    """
+    Las tres estrategias con asyncio.gather, cada una en su sesión; misma
+    semántica de timeout e "incomplete" que neo4j.recomendar.
+    """
+    timeout = timeout or config.NEO4J_STRATEGY_TIMEOUT
+    names = list(RECOMMEND_QUERIES)
+    outcomes = await asyncio.gather(
+        *(asyncio.wait_for(_run_strategy(name, user_id, limit, timeout), timeout) for name in names),
+        return_exceptions=True,
+    )
+    result = {}
+    incomplete = []
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, BaseException):
+            print(f"[NEO4J] recomendar: strategy {name} failed for {user_id}: {outcome!r}")
+            result[name] = []
+            incomplete.append(name)
+        else:
+            result[name] = outcome
+    result["incomplete"] = incomplete
+    return result
+
+
+async def pattern_by_difficulty(user_id: str, threshold: float = 0.6, limit: int = 20):
+    rows = await read_rows(
+        PATTERN_BY_DIFFICULTY_QUERY,
+        user_id=user_id,
+        threshold=threshold,
+        limit=pattern_limit(limit),
+    )
+    return [format_pattern_by_difficulty(row) for row in rows]
+
+
+async def pattern_by_similar_users(
+    user_id: str,
+    similarity_threshold: float = 0.8,
+    performance_threshold: float = 0.8,
+    limit: int = 20,
+):
+    rows = await read_rows(
+        PATTERN_BY_SIMILAR_USERS_QUERY,
+        user_id=user_id,
+        similarity_threshold=similarity_threshold,
+        performance_threshold=performance_threshold,
+        limit=pattern_limit(limit),
+    )
+    return [format_pattern_by_similar_users(row) for row in rows]
+
+
+async def pattern_by_errors(user_id: str, frequency_threshold: float = 0.7, limit: int = 20):
+    rows = await read_rows(
+        PATTERN_BY_ERRORS_QUERY,
+        user_id=user_id,
+        frequency_threshold=frequency_threshold,
+        limit=pattern_limit(limit),
+    )
+    return [format_pattern_by_errors(row) for row in rows]
+
+
+async def pattern_by_interests(
+    user_id: str,
+    weight_threshold: float = 0.0,
+    min_error_score: float = 0.0,
+    limit: int = 20,
+):
+    rows = await read_rows(
+        PATTERN_BY_INTERESTS_QUERY,
+        user_id=user_id,
+        weight_threshold=weight_threshold,
+        min_error_score=min_error_score,
+        limit=pattern_limit(limit),
+    )
+    return [format_pattern_by_interests(row) for row in rows]
+
+
+async def pattern_multi_hop(
+    user_id: str, performance_threshold: float = 0.75, limit: int = 20
+):
+    rows = await read_rows(
+        PATTERN_MULTI_HOP_QUERY,
+        user_id=user_id,
+        performance_threshold=performance_threshold,
+        limit=pattern_limit(limit),
+    )
+    return [format_pattern_multi_hop(row) for row in rows]
+
+
+# --------- Getters ----------
+async def list_nodes(resource: str):
+    return [format_node(row) for row in await read_rows(node_list_query(resource))]
+
+
+async def list_relationships(listing: str, limit=200, page_token=None, user_id=None, other_id=None):
+    query, params = relationship_list_query(listing, limit, page_token, user_id, other_id)
+    return relationship_page(await read_rows(query, **params), limit)
+
+
+async def list_tags(limit=200):
+    return await read_rows(LIST_TAGS_QUERY, limit=limit)
+
+
+async def list_users():
+    return await list_nodes("users")
+
+
+async def list_exercises():
+    return await list_nodes("exercises")
+
+
+async def list_skills():
+    return await list_nodes("skills")
+
+
+async def list_interests():
+    return await list_nodes("interests")
+
+
+async def list_error_types():
+    return await list_nodes("error-types")
+
+
+async def list_performed(limit=200, page_token=None, user_id=None, exercise_id=None):
+    return await list_relationships("performed", limit, page_token, user_id, exercise_id)
+
+
+async def list_difficulties(limit=200, page_token=None, user_id=None, skill_id=None):
+    return await list_relationships("difficulties", limit, page_token, user_id, skill_id)
+
+
+async def list_user_errors(limit=200, page_token=None, user_id=None, error_id=None):
+    return await list_relationships("user-errors", limit, page_token, user_id, error_id)
+
+
+async def list_user_interests(limit=200, page_token=None, user_id=None, interest_id=None):
+    return await list_relationships("user-interests", limit, page_token, user_id, interest_id)
+
+
+async def list_similarities(limit=200, page_token=None, user_id=None, similar_to=None):
+    return await list_relationships("similarities", limit, page_token, user_id, similar_to)
+
+
+async def list_recommendations(limit=200, page_token=None, user_id=None, exercise_id=None):
+    return await list_relationships("recommended", limit, page_token, user_id, exercise_id)
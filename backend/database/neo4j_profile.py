@@ -0,0 +1,124 @@
+"""
+Diagnóstico de planes para las lecturas de recomendación.
+
+Corre cada pattern_* (y las estrategias de recomendar) con PROFILE para un
+usuario de muestra y resume lo que hizo el planner: db hits y filas totales,
+planner/runtime elegidos y qué operadores usaron índices. Sirve para comprobar
+que los índices de RELATIONSHIP_INDEXES se usan después de init_neo4j.
+
+PROFILE ejecuta la query de verdad: es para diagnóstico, no para el camino caliente.
+"""
+from typing import Optional
+
+from database import neo4j
+from database.neo4j import _ensure_driver, read_rows
+
+# nombre -> (query, parámetros por defecto de la función pública)
+PROFILED_QUERIES = {
+    "pattern_by_difficulty": (neo4j.PATTERN_BY_DIFFICULTY_QUERY, {"threshold": 0.6}),
+    "pattern_by_similar_users": (
+        neo4j.PATTERN_BY_SIMILAR_USERS_QUERY,
+        {"similarity_threshold": 0.8, "performance_threshold": 0.8},
+    ),
+    "pattern_by_errors": (neo4j.PATTERN_BY_ERRORS_QUERY, {"frequency_threshold": 0.7}),
+    "pattern_by_interests": (
+        neo4j.PATTERN_BY_INTERESTS_QUERY,
+        {"weight_threshold": 0.0, "min_error_score": 0.0},
+    ),
+    "pattern_multi_hop": (neo4j.PATTERN_MULTI_HOP_QUERY, {"performance_threshold": 0.75}),
+    **{
+        f"recomendar.{name}": (query, {})
+        for name, (query, _) in neo4j.RECOMMEND_QUERIES.items()
+    },
+}
+
+SAMPLE_USER_QUERY = """
+    MATCH (u:User)-[:HAS_DIFFICULTY]->()
+    RETURN u.user_id AS user_id
+    LIMIT 1
+"""
+
+INDEXES_QUERY = """
+    SHOW INDEXES
+    YIELD name, type, entityType, labelsOrTypes, properties, state
+    WHERE entityType = 'RELATIONSHIP'
+    RETURN name, type, labelsOrTypes, properties, state
+"""
+
+
+def sample_user_id() -> Optional[str]:
+    rows = read_rows(SAMPLE_USER_QUERY)
+    return rows[0]["user_id"] if rows else None
+
+
+def _operators(plan: dict, depth: int = 0):
+    """
+    Recorre el árbol de PROFILE (dicts con operatorType, args, children) en preorden.
+    """
+    args = plan.get("args") or {}
+    yield {
+        "operator": plan.get("operatorType"),
+        "depth": depth,
+        "details": args.get("Details"),
+        "rows": plan.get("rows", args.get("Rows", 0)),
+        "db_hits": plan.get("dbHits", args.get("DbHits", 0)),
+        "estimated_rows": args.get("EstimatedRows"),
+    }
+    for child in plan.get("children") or []:
+        yield from _operators(child, depth + 1)
+
+
+def summarize_profile(profile: dict) -> dict:
+    operators = list(_operators(profile))
+    args = profile.get("args") or {}
+    return {
+        "db_hits": sum(op["db_hits"] or 0 for op in operators),
+        "rows": operators[0]["rows"],
+        "planner": args.get("planner"),
+        "runtime": args.get("runtime"),
+        "index_operators": [
+            op for op in operators if op["operator"] and "Index" in op["operator"]
+        ],
+        "operators": operators,
+    }
+
+
+def _profile_work(query: str, params: dict):
+    def work(tx):
+        return tx.run("PROFILE " + query, params).consume()
+
+    return work
+
+
+def profile_query(query: str, **params) -> dict:
+    _ensure_driver()
+    with neo4j.driver.session() as s:
+        summary = s.execute_read(_profile_work(query, params))
+    if not summary.profile:
+        return {"error": "server returned no profile"}
+    result = summarize_profile(summary.profile)
+    result["time_ms"] = (summary.result_available_after or 0) + (summary.result_consumed_after or 0)
+    return result
+
+
+def relationship_indexes():
+    return read_rows(INDEXES_QUERY)
+
+
+def profile_patterns(user_id: Optional[str] = None, limit: int = 20) -> dict:
+    """
+    PROFILE de cada query de recomendación con sus umbrales por defecto. Si no se
+    pasa user_id se toma uno con HAS_DIFFICULTY para que los planes no salgan vacíos.
+    Una query que falla queda con "error" y no corta el resto.
+    """
+    user_id = user_id or sample_user_id()
+    if user_id is None:
+        return {"user_id": None, "indexes": relationship_indexes(), "queries": {}}
+    queries = {}
+    for name, (query, params) in PROFILED_QUERIES.items():
+        try:
+            queries[name] = profile_query(query, user_id=user_id, limit=limit, **params)
+        except Exception as exc:
+            print(f"[NEO4J] profile {name} failed for {user_id}: {exc!r}")
+            queries[name] = {"error": repr(exc)}
+    return {"user_id": user_id, "indexes": relationship_indexes(), "queries": queries}
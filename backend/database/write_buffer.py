@@ -0,0 +1,190 @@
+"""
+Buffer de escritura (write-behind) para register_performance.
+
+Durante una lección el mismo (User)-[:PERFORMED]->(Exercise) recibe decenas de
+eventos en pocos segundos. Acá se juntan por (user_id, exercise_id) durante
+PERFORMANCE_BUFFER_WINDOW_SECONDS: se suman los intentos, queda el último
+correct_ratio y un thread de fondo escribe todo con un UNWIND por chunk.
+
+Lo pendiente se pierde si el proceso muere sin pasar por stop() (el shutdown de
+main.py lo llama); stats() expone cuántos eventos están en esa situación.
+"""
+import threading
+import time
+
+import config
+from database.neo4j import PERFORMANCE_QUERY, write_rows
+
+
+def _merge(older: dict, newer: dict) -> dict:
+    """
+    Combina dos filas del mismo par aplicando `newer` después de `older`: un
+    attempts explícito pisa lo anterior, si no se acumulan los incrementos.
+    """
+    if newer["attempts"] is not None:
+        attempts, increment = newer["attempts"], newer["increment"]
+    else:
+        attempts, increment = older["attempts"], older["increment"] + newer["increment"]
+    return dict(
+        newer,
+        attempts=attempts,
+        increment=increment,
+        events=older["events"] + newer["events"],
+        first_seen=min(older["first_seen"], newer["first_seen"]),
+    )
+
+
+class PerformanceBuffer:
+    def __init__(self, window_seconds: float, max_keys: int):
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._pending: dict[tuple, dict] = {}
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stopping = False
+        self.events_received = 0
+        self.events_coalesced = 0
+        self.rows_written = 0
+        self.events_written = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.rejected = 0
+        self.last_flush_at = None
+        self.last_flush_seconds = 0.0
+        self.last_error = None
+
+    def add(self, user_id: str, exercise_id: str, correct_ratio: float, attempts=None) -> bool:
+        """
+        Encola un evento. Devuelve False si el buffer está lleno (o parado) y el
+        llamador tiene que escribir directo.
+        """
+        key = (user_id, exercise_id)
+        row = {
+            "user_id": user_id,
+            "exercise_id": exercise_id,
+            "correct_ratio": correct_ratio,
+            "attempts": attempts,
+            "increment": 0 if attempts is not None else 1,
+            "events": 1,
+            "first_seen": time.monotonic(),
+        }
+        with self._cond:
+            if self._stopping or self._worker is None:
+                return False
+            current = self._pending.get(key)
+            if current is None and len(self._pending) >= self.max_keys:
+                self.rejected += 1
+                self._cond.notify()
+                return False
+            self.events_received += 1
+            if current is None:
+                self._pending[key] = row
+            else:
+                self._pending[key] = _merge(current, row)
+                self.events_coalesced += 1
+            return True
+
+    def flush(self) -> int:
+        """
+        Escribe lo pendiente en una transacción (chunks de NEO4J_BATCH_SIZE). Si
+        falla, las filas vuelven al buffer antes que los eventos que llegaron
+        mientras tanto, así no se pierde el orden por par.
+        """
+        with self._cond:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        started = time.monotonic()
+        rows = [
+            {k: row[k] for k in ("user_id", "exercise_id", "correct_ratio", "attempts", "increment")}
+            for row in batch.values()
+        ]
+        try:
+            write_rows(PERFORMANCE_QUERY, rows)
+        except Exception as exc:
+            with self._cond:
+                for key, row in batch.items():
+                    newer = self._pending.get(key)
+                    self._pending[key] = row if newer is None else _merge(row, newer)
+                self.flush_failures += 1
+                self.last_error = repr(exc)
+            print(f"[NEO4J] performance buffer flush failed ({len(rows)} rows): {exc!r}")
+            return 0
+        with self._cond:
+            self.flushes += 1
+            self.rows_written += len(rows)
+            self.events_written += sum(row["events"] for row in batch.values())
+            self.last_flush_at = time.time()
+            self.last_flush_seconds = time.monotonic() - started
+        return len(rows)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(self.window_seconds)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def start(self):
+        with self._cond:
+            if self._worker is not None:
+                return
+            self._stopping = False
+            self._worker = threading.Thread(target=self._run, name="performance-buffer", daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout: float = 10.0):
+        """
+        Para el thread haciendo un último flush; lo que no se pudo escribir queda en stats().
+        """
+        with self._cond:
+            worker, self._stopping = self._worker, True
+            self._cond.notify_all()
+        if worker is not None:
+            worker.join(timeout)
+        with self._cond:
+            self._worker = None
+        if self._pending:
+            self.flush()
+
+    def stats(self):
+        with self._cond:
+            pending_events = sum(row["events"] for row in self._pending.values())
+            oldest = min((row["first_seen"] for row in self._pending.values()), default=None)
+            return {
+                "enabled": self._worker is not None,
+                "window_seconds": self.window_seconds,
+                "max_keys": self.max_keys,
+                "pending_keys": len(self._pending),
+                # eventos aceptados que todavía no están en Neo4j
+                "pending_events": pending_events,
+                "oldest_pending_seconds": time.monotonic() - oldest if oldest is not None else 0.0,
+                "events_received": self.events_received,
+                "events_coalesced": self.events_coalesced,
+                "events_written": self.events_written,
+                "rows_written": self.rows_written,
+                "coalescing_ratio": self.events_written / self.rows_written if self.rows_written else 0.0,
+                "flushes": self.flushes,
+                "flush_failures": self.flush_failures,
+                "rejected": self.rejected,
+                "last_flush_at": self.last_flush_at,
+                "last_flush_seconds": round(self.last_flush_seconds, 4),
+                "last_error": self.last_error,
+            }
+
+
+performance_buffer = PerformanceBuffer(
+    config.PERFORMANCE_BUFFER_WINDOW_SECONDS, config.PERFORMANCE_BUFFER_MAX_KEYS
+)
+
+
+def start():
+    if config.PERFORMANCE_BUFFER_ENABLED:
+        performance_buffer.start()
+
+
+def stop():
+    performance_buffer.stop()
@@ -1,10 +1,14 @@
 import os
+import time
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+import metrics
+
 from database.cassandra import init_cassandra
 from database.neo4j import init_neo4j
+from database import course_view, graph_engine, materialize, neo4j_async, write_buffer
 
 from routers.threads import router as threads_router
 from routers.posts import router as posts_router
@@ -22,12 +26,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Page-Token"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    token = metrics.start_request()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # el template de la ruta (no el path) para no abrir una serie por id
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.finish_request(token, request.method, route, status, time.perf_counter() - started)
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.on_event("startup")
 def startup():
     init_cassandra()
     init_neo4j()
+    materialize.start_worker()
+    graph_engine.start()
+    write_buffer.start()
+    course_view.start()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    # primero el flush del buffer: sus escrituras todavía marcan usuarios en materialize
+    write_buffer.stop()
+    materialize.stop_worker()
+    graph_engine.stop()
+    course_view.stop()
+
+
+@app.on_event("shutdown")
+async def shutdown_async_driver():
+    await neo4j_async.close()
 
 app.include_router(threads_router)
 app.include_router(posts_router)
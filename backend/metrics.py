@@ -0,0 +1,184 @@
+"""
+Métricas en formato de texto de Prometheus, sin dependencias extra.
+
+- http_request_duration_seconds: latencia por ruta (middleware de main.py).
+- db_query_duration_seconds / db_query_rows_total / db_query_errors_total: por
+  query con nombre, los registran los wrappers de database/cassandra.py y
+  database/neo4j*.py. El label consistency es el consistency level en Cassandra
+  y el modo de acceso (read/write) en Neo4j.
+- http_request_db_seconds: tiempo de base de datos que acumuló cada request por
+  backend. Comparado con http_request_duration_seconds dice si una ruta lenta
+  es Cassandra, Neo4j o Python (serialización, formateo). Las queries en
+  paralelo suman su tiempo completo, así que puede superar al total.
+
+Todo se expone en GET /metrics. Con METRICS_ENABLED=false los wrappers no registran nada.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_: str, labels: tuple):
+        self.name = name
+        self.help = help_
+        self.label_names = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_: str, labels: tuple, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_
+        self.label_names = labels
+        self.buckets = buckets
+        # labels -> [conteo por bucket (no acumulado), suma, cantidad]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    bucket_labels = _labels(self.label_names, labels, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total!r}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status")
+)
+http_request_db = Histogram(
+    "http_request_db_seconds", "Database time spent by one request, by backend.", ("route", "backend")
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "Database call latency by query name.", ("backend", "query", "consistency")
+)
+db_query_rows = Counter("db_query_rows_total", "Rows returned (reads) or sent (writes).", ("backend", "query"))
+db_query_errors = Counter("db_query_errors_total", "Failed database calls.", ("backend", "query", "error"))
+
+REGISTRY = [http_request_duration, http_request_db, db_query_duration, db_query_rows, db_query_errors]
+
+# backend -> segundos de base de datos del request en curso (None fuera de un request)
+_request_db_time: contextvars.ContextVar = contextvars.ContextVar("request_db_time", default=None)
+
+
+def request_db_time():
+    """
+    Acumulador del request actual. Los callbacks del driver de Cassandra corren
+    en otro thread, por eso se captura al lanzar la query y se pasa a record_query.
+    """
+    return _request_db_time.get()
+
+
+def record_query(
+    backend: str,
+    query: str,
+    seconds: float,
+    rows: int = 0,
+    error: BaseException | None = None,
+    consistency: str = "",
+    db_time: dict | None = None,
+):
+    if not config.METRICS_ENABLED:
+        return
+    db_query_duration.observe(seconds, backend, query, consistency)
+    if rows:
+        db_query_rows.inc(rows, backend, query)
+    if error is not None:
+        db_query_errors.inc(1, backend, query, type(error).__name__)
+    if db_time is not None:
+        db_time[backend] = db_time.get(backend, 0.0) + seconds
+
+
+class QueryTimer:
+    rows = 0
+
+
+@contextmanager
+def timed_query(backend: str, query: str, consistency: str = ""):
+    """
+    Mide el bloque como una llamada a la base; el llamador asigna timer.rows.
+    Un generador cerrado o una tarea cancelada no se registran.
+    """
+    db_time = request_db_time()
+    timer = QueryTimer()
+    started = time.perf_counter()
+    try:
+        yield timer
+    except Exception as exc:
+        record_query(backend, query, time.perf_counter() - started, timer.rows, exc, consistency, db_time)
+        raise
+    record_query(backend, query, time.perf_counter() - started, timer.rows, None, consistency, db_time)
+
+
+def start_request():
+    return _request_db_time.set({})
+
+
+def finish_request(token, method: str, route: str, status: int, seconds: float):
+    db_time = _request_db_time.get() or {}
+    _request_db_time.reset(token)
+    if not config.METRICS_ENABLED:
+        return
+    http_request_duration.observe(seconds, method, route, str(status))
+    for backend, spent in db_time.items():
+        http_request_db.observe(spent, route, backend)
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
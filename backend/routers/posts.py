@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import uuid
-from database.cassandra import create_post as cassandra_create_post
+from database.cassandra_async import create_post as cassandra_create_post
 
 router = APIRouter(prefix="/posts")
 
@@ -12,7 +12,7 @@ class PostCreate(BaseModel):
 
 
 @router.post("/{thread_id}")
-def create_post(thread_id: str, data: PostCreate):
+async def create_post(thread_id: str, data: PostCreate):
     # Validate UUID format early to return a clean 400
     try:
         uuid.UUID(thread_id)
@@ -20,7 +20,7 @@ def create_post(thread_id: str, data: PostCreate):
         raise HTTPException(400, "Invalid thread_id")
 
     try:
-        return cassandra_create_post(thread_id, data.user_id, data.content)
+        return await cassandra_create_post(thread_id, data.user_id, data.content)
     except LookupError:
         raise HTTPException(404, "Thread not found")
     except ValueError as exc:
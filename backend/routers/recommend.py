@@ -1,18 +1,25 @@
+import asyncio
+import csv
+import io
+import json
 from typing import List, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from database.neo4j import (
+import config
+from database import graph_engine, materialize, neo4j_async, neo4j_profile
+from database import neo4j as neo4j_db
+from database.neo4j import decode_list_token, iter_nodes
+from database.write_buffer import performance_buffer
+from database.neo4j_async import (
     log_recommendation,
-    recomendar as recommend_graph,
+    log_recommendation_batch,
     register_performance,
+    register_performance_batch,
     registrar_progreso,
-    pattern_by_difficulty,
-    pattern_by_errors,
-    pattern_by_interests,
-    pattern_by_similar_users,
-    pattern_multi_hop,
+    registrar_progreso_batch,
     list_users,
     list_exercises,
     list_skills,
@@ -26,20 +33,101 @@ from database.neo4j import (
     list_similarities,
     list_recommendations,
     set_difficulty,
+    set_difficulty_batch,
     set_similarity_pairs,
     set_user_error,
+    set_user_error_batch,
     set_user_interest,
+    set_user_interest_batch,
     tag_exercise_with_interest,
+    tag_exercise_with_interest_batch,
     upsert_error_type,
+    upsert_error_types_batch,
     upsert_exercise,
+    upsert_exercises_batch,
     upsert_interest,
+    upsert_interests_batch,
     upsert_skill,
+    upsert_skills_batch,
     upsert_user,
+    upsert_users_batch,
 )
 
 router = APIRouter(prefix="/recommend", tags=["recommend"])
 router_api = APIRouter(prefix="/api/recommend", tags=["recommend"])
 
+# ?engine=materialized (database/materialize.py), ?engine=cypher (Neo4j) o
+# ?engine=memory (database/graph_engine.py); cypher y memory recorren el grafo en cada request
+ENGINE_QUERY = Query(config.RECOMMEND_ENGINE, pattern="^(materialized|cypher|memory)$")
+
+
+async def _recommend(engine: str, name: str, user_id: str, limit: Optional[int] = None, **thresholds):
+    """
+    engine=materialized lee lo precalculado (un lookup por user_id) y va a Neo4j
+    solo si no sirve: umbrales o limit distintos a los materializados, o el
+    usuario sin entrada todavía. engine=memory responde en el proceso
+    (graph_engine) en un thread del pool: el recorrido es CPU y no puede
+    bloquear el event loop; cypher va a Neo4j con el driver async.
+    Los umbrales van como kwargs en el orden de la función.
+    """
+    if engine == "materialized":
+        if config.MATERIALIZE_ENABLED:
+            served = await materialize.lookup(user_id, name, limit, thresholds)
+            if served is not None:
+                return served
+        engine = "cypher"
+    args = (user_id, *thresholds.values()) + (() if limit is None else (limit,))
+    if engine == "memory":
+        if not graph_engine.is_loaded():
+            raise HTTPException(status_code=503, detail="In-memory engine not loaded (GRAPH_ENGINE_ENABLED=false)")
+        return await asyncio.to_thread(getattr(graph_engine, name), *args)
+    return await getattr(neo4j_async, name)(*args)
+
+
+# Igual que los listados de Cassandra: el body sigue siendo una lista y el
+# cursor de la página siguiente viaja en este header.
+NEXT_PAGE_HEADER = "X-Next-Page-Token"
+
+
+def _check_page_token(page_token: Optional[str], listing: str):
+    """
+    Forma y tipos del cursor del listado (fecha ISO o número); mal formado es un
+    400 antes de llegar a Cypher.
+    """
+    try:
+        decode_list_token(page_token, listing)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid page_token")
+
+
+def _paged(response: Response, page: dict):
+    if page["next_page_token"]:
+        response.headers[NEXT_PAGE_HEADER] = page["next_page_token"]
+    return page["items"]
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        # default=str cubre los DateTime de Neo4j
+        yield json.dumps(row, default=str) + "\n"
+
+
+def _csv_lines(rows, columns: Optional[list]):
+    """
+    Sin columnas explícitas se toman las del primer nodo; propiedades que
+    aparezcan recién en nodos posteriores no se exportan (usar fields=).
+    """
+    buffer = io.StringIO()
+    writer = None
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=columns or list(row), extrasaction="ignore")
+            writer.writeheader()
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
 
 class Progress(BaseModel):
     user_id: str
@@ -125,370 +213,724 @@ class RecommendationLog(BaseModel):
 
 
 @router.post("/progress")
-def progress(data: Progress):
-    registrar_progreso(data.user_id, data.course_id, data.level)
+async def progress(data: Progress):
+    await registrar_progreso(data.user_id, data.course_id, data.level)
     return {"status": "ok"}
 
 
 @router.post("/users", status_code=201)
-def add_user(payload: UserPayload):
-    upsert_user(
+async def add_user(payload: UserPayload):
+    await upsert_user(
         payload.user_id, payload.primary_language, payload.current_level, payload.streak
     )
     return {"status": "created", "user_id": payload.user_id}
 
 
 @router.post("/exercises", status_code=201)
-def add_exercise(payload: ExercisePayload):
-    upsert_exercise(
+async def add_exercise(payload: ExercisePayload):
+    await upsert_exercise(
         payload.exercise_id, payload.type, payload.difficulty, payload.language
     )
     return {"status": "created", "exercise_id": payload.exercise_id}
 
 
 @router.post("/skills", status_code=201)
-def add_skill(payload: SkillPayload):
-    upsert_skill(payload.skill_id, payload.name, payload.category, payload.level)
+async def add_skill(payload: SkillPayload):
+    await upsert_skill(payload.skill_id, payload.name, payload.category, payload.level)
     return {"status": "created", "skill_id": payload.skill_id}
 
 
 @router.post("/interests", status_code=201)
-def add_interest(payload: InterestPayload):
-    upsert_interest(payload.interest_id, payload.name, payload.category)
+async def add_interest(payload: InterestPayload):
+    await upsert_interest(payload.interest_id, payload.name, payload.category)
     return {"status": "created", "interest_id": payload.interest_id}
 
 
 @router.post("/error-types", status_code=201)
-def add_error_type(payload: ErrorTypePayload):
-    upsert_error_type(payload.error_id, payload.description, payload.category)
+async def add_error_type(payload: ErrorTypePayload):
+    await upsert_error_type(payload.error_id, payload.description, payload.category)
     return {"status": "created", "error_id": payload.error_id}
 
 
 @router.post("/performed", status_code=201)
-def add_performance(payload: PerformancePayload):
-    register_performance(
+async def add_performance(payload: PerformancePayload, response: Response):
+    # con el buffer activo se junta con los otros eventos del par y se escribe en el próximo flush
+    if performance_buffer.add(
+        payload.user_id, payload.exercise_id, payload.correct_ratio, payload.attempts
+    ):
+        response.status_code = 202
+        return {"status": "queued"}
+    await register_performance(
         payload.user_id, payload.exercise_id, payload.correct_ratio, payload.attempts
     )
     return {"status": "created"}
 
 
+@router.get("/performed/buffer")
+def performance_buffer_stats():
+    return performance_buffer.stats()
+
+
 @router.post("/difficulties", status_code=201)
-def add_difficulty(payload: DifficultyPayload):
-    set_difficulty(payload.user_id, payload.skill_id, payload.error_score)
+async def add_difficulty(payload: DifficultyPayload):
+    await set_difficulty(payload.user_id, payload.skill_id, payload.error_score)
     return {"status": "created"}
 
 
 @router.post("/errors", status_code=201)
-def add_error(payload: UserErrorPayload):
-    set_user_error(payload.user_id, payload.error_id, payload.frequency)
+async def add_error(payload: UserErrorPayload):
+    await set_user_error(payload.user_id, payload.error_id, payload.frequency)
     return {"status": "created"}
 
 
 @router.post("/interested-in", status_code=201)
-def add_interest_link(payload: InterestLinkPayload):
-    set_user_interest(payload.user_id, payload.interest_id, payload.weight)
+async def add_interest_link(payload: InterestLinkPayload):
+    await set_user_interest(payload.user_id, payload.interest_id, payload.weight)
     return {"status": "created"}
 
 
 @router.post("/tags", status_code=201)
-def add_tag(payload: ExerciseTagPayload):
-    tag_exercise_with_interest(payload.exercise_id, payload.interest_id)
+async def add_tag(payload: ExerciseTagPayload):
+    await tag_exercise_with_interest(payload.exercise_id, payload.interest_id)
     return {"status": "created"}
 
 
 @router.post("/similarities", status_code=201)
-def add_similarities(pairs: List[SimilarPair]):
-    set_similarity_pairs([p.dict() for p in pairs])
+async def add_similarities(pairs: List[SimilarPair]):
+    await set_similarity_pairs([p.dict() for p in pairs])
     return {"status": "created", "count": len(pairs)}
 
 
 @router.post("/log", status_code=201)
-def log_recommendation_edge(payload: RecommendationLog):
-    log_recommendation(
+async def log_recommendation_edge(payload: RecommendationLog):
+    await log_recommendation(
         payload.user_id, payload.exercise_id, payload.strategy, payload.accepted
     )
     return {"status": "created"}
 
 
+# escrituras en lote: un UNWIND por chunk, todo en una transacción
+@router.post("/progress/batch", status_code=201)
+async def progress_batch(items: List[Progress]):
+    return {"status": "ok", "count": await registrar_progreso_batch([i.dict() for i in items])}
+
+
+@router.post("/users/batch", status_code=201)
+async def add_users_batch(items: List[UserPayload]):
+    return {"status": "created", "count": await upsert_users_batch([i.dict() for i in items])}
+
+
+@router.post("/exercises/batch", status_code=201)
+async def add_exercises_batch(items: List[ExercisePayload]):
+    return {"status": "created", "count": await upsert_exercises_batch([i.dict() for i in items])}
+
+
+@router.post("/skills/batch", status_code=201)
+async def add_skills_batch(items: List[SkillPayload]):
+    return {"status": "created", "count": await upsert_skills_batch([i.dict() for i in items])}
+
+
+@router.post("/interests/batch", status_code=201)
+async def add_interests_batch(items: List[InterestPayload]):
+    return {"status": "created", "count": await upsert_interests_batch([i.dict() for i in items])}
+
+
+@router.post("/error-types/batch", status_code=201)
+async def add_error_types_batch(items: List[ErrorTypePayload]):
+    return {"status": "created", "count": await upsert_error_types_batch([i.dict() for i in items])}
+
+
+@router.post("/performed/batch", status_code=201)
+async def add_performances_batch(items: List[PerformancePayload]):
+    return {"status": "created", "count": await register_performance_batch([i.dict() for i in items])}
+
+
+@router.post("/difficulties/batch", status_code=201)
+async def add_difficulties_batch(items: List[DifficultyPayload]):
+    return {"status": "created", "count": await set_difficulty_batch([i.dict() for i in items])}
+
+
+@router.post("/errors/batch", status_code=201)
+async def add_errors_batch(items: List[UserErrorPayload]):
+    return {"status": "created", "count": await set_user_error_batch([i.dict() for i in items])}
+
+
+@router.post("/interested-in/batch", status_code=201)
+async def add_interest_links_batch(items: List[InterestLinkPayload]):
+    return {"status": "created", "count": await set_user_interest_batch([i.dict() for i in items])}
+
+
+@router.post("/tags/batch", status_code=201)
+async def add_tags_batch(items: List[ExerciseTagPayload]):
+    return {"status": "created", "count": await tag_exercise_with_interest_batch([i.dict() for i in items])}
+
+
+@router.post("/log/batch", status_code=201)
+async def log_recommendation_edges_batch(items: List[RecommendationLog]):
+    return {"status": "created", "count": await log_recommendation_batch([i.dict() for i in items])}
+
+
+# recomendaciones precalculadas (database.materialize)
+@router.get("/materialized/status")
+def materialized_status():
+    """
+    Cola del worker (pendientes, expansiones salteadas, fallas).
+    """
+    return materialize.stats()
+
+
+@router.get("/materialized/{user_id}")
+def materialized_recommendations(user_id: str):
+    """
+    Entrada completa del usuario; stale=true si venció (ya quedó encolado).
+    """
+    entry = materialize.get_recommendations(user_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="No materialized recommendations for user")
+    return entry
+
+
+@router.post("/materialized/refresh", status_code=202)
+def refresh_materialized(user_ids: Optional[List[str]] = None):
+    """
+    Encola usuarios para recalcular; sin body encola a todos.
+    """
+    if user_ids:
+        materialize.mark_dirty(user_ids)
+        count = len(user_ids)
+    else:
+        count = materialize.mark_all_dirty()
+    return {"status": "queued", "count": count, "pending": materialize.pending()}
+
+
+@router.get("/engine/status")
+def engine_status():
+    return graph_engine.stats()
+
+
+@router.get("/diagnostics/profile")
+def profile_recommendation_queries(user_id: Optional[str] = None, limit: int = Query(20, ge=1, le=200)):
+    """
+    PROFILE de las queries de recomendación: db hits, filas, planner e índices usados.
+    Ejecuta cada query, no llamarlo en loop.
+    """
+    return neo4j_profile.profile_patterns(user_id, limit)
+
+
 @router.get("/{user_id}")
-def recommend_user(user_id: str):
-    return recommend_graph(user_id)
+async def recommend_user(user_id: str, engine: str = ENGINE_QUERY):
+    return await _recommend(engine, "recomendar", user_id)
 
 
 # getters para datos base y relaciones
 @router.get("/patterns/by-difficulty")
-def pattern_difficulty(user_id: str, threshold: float = 0.6, limit: int = 20):
-    return pattern_by_difficulty(user_id, threshold, limit)
+async def pattern_difficulty(
+    user_id: str, threshold: float = 0.6, limit: int = 20, engine: str = ENGINE_QUERY
+):
+    return await _recommend(engine, "pattern_by_difficulty", user_id, limit, threshold=threshold)
 
 
 @router.get("/patterns/by-similar-users")
-def pattern_similar_users(
+async def pattern_similar_users(
     user_id: str,
     similarity_threshold: float = 0.8,
     performance_threshold: float = 0.8,
     limit: int = 20,
+    engine: str = ENGINE_QUERY,
 ):
-    return pattern_by_similar_users(
-        user_id, similarity_threshold, performance_threshold, limit
+    return await _recommend(
+        engine, "pattern_by_similar_users", user_id, limit,
+        similarity_threshold=similarity_threshold, performance_threshold=performance_threshold,
     )
 
 
 @router.get("/patterns/by-errors")
-def pattern_errors(
-    user_id: str, frequency_threshold: float = 0.7, limit: int = 20
+async def pattern_errors(
+    user_id: str, frequency_threshold: float = 0.7, limit: int = 20, engine: str = ENGINE_QUERY
 ):
-    return pattern_by_errors(user_id, frequency_threshold, limit)
+    return await _recommend(engine, "pattern_by_errors", user_id, limit, frequency_threshold=frequency_threshold)
 
 
 @router.get("/patterns/by-interests")
-def pattern_interests(
+async def pattern_interests(
     user_id: str,
     weight_threshold: float = 0.0,
     min_error_score: float = 0.0,
     limit: int = 20,
+    engine: str = ENGINE_QUERY,
 ):
-    return pattern_by_interests(
-        user_id, weight_threshold, min_error_score, limit
+    return await _recommend(
+        engine, "pattern_by_interests", user_id, limit,
+        weight_threshold=weight_threshold, min_error_score=min_error_score,
     )
 
 
 @router.get("/patterns/multi-hop")
-def pattern_multi_hop_endpoint(
-    user_id: str, performance_threshold: float = 0.75, limit: int = 20
+async def pattern_multi_hop_endpoint(
+    user_id: str, performance_threshold: float = 0.75, limit: int = 20, engine: str = ENGINE_QUERY
 ):
-    return pattern_multi_hop(user_id, performance_threshold, limit)
+    return await _recommend(
+        engine, "pattern_multi_hop", user_id, limit, performance_threshold=performance_threshold
+    )
 
 
 @router.get("/data/users")
-def get_users():
-    return list_users()
+async def get_users():
+    return await list_users()
 
 
 @router.get("/data/exercises")
-def get_exercises():
-    return list_exercises()
+async def get_exercises():
+    return await list_exercises()
 
 
 @router.get("/data/skills")
-def get_skills():
-    return list_skills()
+async def get_skills():
+    return await list_skills()
 
 
 @router.get("/data/interests")
-def get_interests():
-    return list_interests()
+async def get_interests():
+    return await list_interests()
 
 
 @router.get("/data/error-types")
-def get_error_types():
-    return list_error_types()
+async def get_error_types():
+    return await list_error_types()
+
+
+@router.get("/data/{resource}/export")
+def export_nodes(
+    resource: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+):
+    """
+    Export en streaming (NDJSON o CSV) de users, exercises, skills, interests o
+    error-types. Para la página siguiente mandar after=<clave de la última fila>.
+    """
+    columns = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        rows = iter_nodes(resource, after=after, fields=columns, limit=limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown resource {resource}")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if format == "csv":
+        key = neo4j_db.NODE_EXPORTS[resource][1]
+        header = [key] + [c for c in columns if c != key] if columns else None
+        return StreamingResponse(_csv_lines(rows, header), media_type="text/csv")
+    return StreamingResponse(_ndjson_lines(rows), media_type="application/x-ndjson")
 
 
 @router.get("/data/performed")
-def get_performed(limit: int = 200):
-    return list_performed(limit=limit)
+async def get_performed(
+    response: Response,
+    limit: int = Query(200, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    user_id: Optional[str] = None,
+    exercise_id: Optional[str] = None,
+):
+    _check_page_token(page_token, "performed")
+    page = await list_performed(
+        limit=limit, page_token=page_token, user_id=user_id, exercise_id=exercise_id
+    )
+    return _paged(response, page)
 
 
 @router.get("/data/difficulties")
-def get_difficulties(limit: int = 200):
-    return list_difficulties(limit=limit)
+async def get_difficulties(
+    response: Response,
+    limit: int = Query(200, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    user_id: Optional[str] = None,
+    skill_id: Optional[str] = None,
+):
+    _check_page_token(page_token, "difficulties")
+    page = await list_difficulties(
+        limit=limit, page_token=page_token, user_id=user_id, skill_id=skill_id
+    )
+    return _paged(response, page)
 
 
 @router.get("/data/user-errors")
-def get_user_errors(limit: int = 200):
-    return list_user_errors(limit=limit)
+async def get_user_errors(
+    response: Response,
+    limit: int = Query(200, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    user_id: Optional[str] = None,
+    error_id: Optional[str] = None,
+):
+    _check_page_token(page_token, "user-errors")
+    page = await list_user_errors(
+        limit=limit, page_token=page_token, user_id=user_id, error_id=error_id
+    )
+    return _paged(response, page)
 
 
 @router.get("/data/user-interests")
-def get_user_interests(limit: int = 200):
-    return list_user_interests(limit=limit)
+async def get_user_interests(
+    response: Response,
+    limit: int = Query(200, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    user_id: Optional[str] = None,
+    interest_id: Optional[str] = None,
+):
+    _check_page_token(page_token, "user-interests")
+    page = await list_user_interests(
+        limit=limit, page_token=page_token, user_id=user_id, interest_id=interest_id
+    )
+    return _paged(response, page)
 
 
 @router.get("/data/tags")
-def get_tags(limit: int = 200):
-    return list_tags(limit=limit)
+async def get_tags(limit: int = 200):
+    return await list_tags(limit=limit)
 
 
 @router.get("/data/similarities")
-def get_similarities(limit: int = 200):
-    return list_similarities(limit=limit)
+async def get_similarities(
+    response: Response,
+    limit: int = Query(200, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    user_id: Optional[str] = None,
+    similar_to: Optional[str] = None,
+):
+    _check_page_token(page_token, "similarities")
+    page = await list_similarities(
+        limit=limit, page_token=page_token, user_id=user_id, similar_to=similar_to
+    )
+    return _paged(response, page)
 
 
 @router.get("/data/recommended")
-def get_recommended(limit: int = 200):
-    return list_recommendations(limit=limit)
+async def get_recommended(
+    response: Response,
+    limit: int = Query(200, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    user_id: Optional[str] = None,
+    exercise_id: Optional[str] = None,
+):
+    _check_page_token(page_token, "recommended")
+    page = await list_recommendations(
+        limit=limit, page_token=page_token, user_id=user_id, exercise_id=exercise_id
+    )
+    return _paged(response, page)
 
 
 # aliases under /api/recommend for clients that keep /api prefix
 @router_api.post("/progress")
-def progress_api(data: Progress):
-    return progress(data)
+async def progress_api(data: Progress):
+    return await progress(data)
 
 
 @router_api.post("/users")
-def add_user_api(payload: UserPayload):
-    return add_user(payload)
+async def add_user_api(payload: UserPayload):
+    return await add_user(payload)
 
 
 @router_api.post("/exercises")
-def add_exercise_api(payload: ExercisePayload):
-    return add_exercise(payload)
+async def add_exercise_api(payload: ExercisePayload):
+    return await add_exercise(payload)
 
 
 @router_api.post("/skills")
-def add_skill_api(payload: SkillPayload):
-    return add_skill(payload)
+async def add_skill_api(payload: SkillPayload):
+    return await add_skill(payload)
 
 
 @router_api.post("/interests")
-def add_interest_api(payload: InterestPayload):
-    return add_interest(payload)
+async def add_interest_api(payload: InterestPayload):
+    return await add_interest(payload)
 
 
 @router_api.post("/error-types")
-def add_error_type_api(payload: ErrorTypePayload):
-    return add_error_type(payload)
+async def add_error_type_api(payload: ErrorTypePayload):
+    return await add_error_type(payload)
 
 
 @router_api.post("/performed")
-def add_performance_api(payload: PerformancePayload):
-    return add_performance(payload)
+async def add_performance_api(payload: PerformancePayload, response: Response):
+    return await add_performance(payload, response)
+
+
+@router_api.get("/performed/buffer")
+def performance_buffer_stats_api():
+    return performance_buffer_stats()
 
 
 @router_api.post("/difficulties")
-def add_difficulty_api(payload: DifficultyPayload):
-    return add_difficulty(payload)
+async def add_difficulty_api(payload: DifficultyPayload):
+    return await add_difficulty(payload)
 
 
 @router_api.post("/errors")
-def add_error_api(payload: UserErrorPayload):
-    return add_error(payload)
+async def add_error_api(payload: UserErrorPayload):
+    return await add_error(payload)
 
 
 @router_api.post("/interested-in")
-def add_interest_link_api(payload: InterestLinkPayload):
-    return add_interest_link(payload)
+async def add_interest_link_api(payload: InterestLinkPayload):
+    return await add_interest_link(payload)
 
 
 @router_api.post("/tags")
-def add_tag_api(payload: ExerciseTagPayload):
-    return add_tag(payload)
+async def add_tag_api(payload: ExerciseTagPayload):
+    return await add_tag(payload)
 
 
 @router_api.post("/similarities")
-def add_similarities_api(pairs: List[SimilarPair]):
-    return add_similarities(pairs)
+async def add_similarities_api(pairs: List[SimilarPair]):
+    return await add_similarities(pairs)
 
 
 @router_api.post("/log")
-def log_recommendation_edge_api(payload: RecommendationLog):
-    return log_recommendation_edge(payload)
+async def log_recommendation_edge_api(payload: RecommendationLog):
+    return await log_recommendation_edge(payload)
+
+
+@router_api.post("/progress/batch", status_code=201)
+async def progress_batch_api(items: List[Progress]):
+    return await progress_batch(items)
+
+
+@router_api.post("/users/batch", status_code=201)
+async def add_users_batch_api(items: List[UserPayload]):
+    return await add_users_batch(items)
+
+
+@router_api.post("/exercises/batch", status_code=201)
+async def add_exercises_batch_api(items: List[ExercisePayload]):
+    return await add_exercises_batch(items)
+
+
+@router_api.post("/skills/batch", status_code=201)
+async def add_skills_batch_api(items: List[SkillPayload]):
+    return await add_skills_batch(items)
+
+
+@router_api.post("/interests/batch", status_code=201)
+async def add_interests_batch_api(items: List[InterestPayload]):
+    return await add_interests_batch(items)
+
+
+@router_api.post("/error-types/batch", status_code=201)
+async def add_error_types_batch_api(items: List[ErrorTypePayload]):
+    return await add_error_types_batch(items)
+
+
+@router_api.post("/performed/batch", status_code=201)
+async def add_performances_batch_api(items: List[PerformancePayload]):
+    return await add_performances_batch(items)
+
+
+@router_api.post("/difficulties/batch", status_code=201)
+async def add_difficulties_batch_api(items: List[DifficultyPayload]):
+    return await add_difficulties_batch(items)
+
+
+@router_api.post("/errors/batch", status_code=201)
+async def add_errors_batch_api(items: List[UserErrorPayload]):
+    return await add_errors_batch(items)
+
+
+@router_api.post("/interested-in/batch", status_code=201)
+async def add_interest_links_batch_api(items: List[InterestLinkPayload]):
+    return await add_interest_links_batch(items)
+
+
+@router_api.post("/tags/batch", status_code=201)
+async def add_tags_batch_api(items: List[ExerciseTagPayload]):
+    return await add_tags_batch(items)
+
+
+@router_api.post("/log/batch", status_code=201)
+async def log_recommendation_edges_batch_api(items: List[RecommendationLog]):
+    return await log_recommendation_edges_batch(items)
+
+
+@router_api.get("/materialized/status")
+def materialized_status_api():
+    return materialized_status()
+
+
+@router_api.get("/materialized/{user_id}")
+def materialized_recommendations_api(user_id: str):
+    return materialized_recommendations(user_id)
+
+
+@router_api.post("/materialized/refresh", status_code=202)
+def refresh_materialized_api(user_ids: Optional[List[str]] = None):
+    return refresh_materialized(user_ids)
+
+
+@router_api.get("/engine/status")
+def engine_status_api():
+    return engine_status()
+
+
+@router_api.get("/diagnostics/profile")
+def profile_recommendation_queries_api(user_id: Optional[str] = None, limit: int = Query(20, ge=1, le=200)):
+    return profile_recommendation_queries(user_id, limit)
 
 
 @router_api.get("/{user_id}")
-def recommend_user_api(user_id: str):
-    return recommend_user(user_id)
+async def recommend_user_api(user_id: str, engine: str = ENGINE_QUERY):
+    return await recommend_user(user_id, engine)
 
 
 # data getters under /api/recommend/data/...
 @router_api.get("/patterns/by-difficulty")
-def pattern_difficulty_api(user_id: str, threshold: float = 0.6, limit: int = 20):
-    return pattern_difficulty(user_id, threshold, limit)
+async def pattern_difficulty_api(
+    user_id: str, threshold: float = 0.6, limit: int = 20, engine: str = ENGINE_QUERY
+):
+    return await pattern_difficulty(user_id, threshold, limit, engine)
 
 
 @router_api.get("/patterns/by-similar-users")
-def pattern_similar_users_api(
+async def pattern_similar_users_api(
     user_id: str,
     similarity_threshold: float = 0.8,
     performance_threshold: float = 0.8,
     limit: int = 20,
+    engine: str = ENGINE_QUERY,
 ):
-    return pattern_similar_users(
-        user_id, similarity_threshold, performance_threshold, limit
+    return await pattern_similar_users(
+        user_id, similarity_threshold, performance_threshold, limit, engine
     )
 
 
 @router_api.get("/patterns/by-errors")
-def pattern_errors_api(
-    user_id: str, frequency_threshold: float = 0.7, limit: int = 20
+async def pattern_errors_api(
+    user_id: str, frequency_threshold: float = 0.7, limit: int = 20, engine: str = ENGINE_QUERY
 ):
-    return pattern_errors(user_id, frequency_threshold, limit)
+    return await pattern_errors(user_id, frequency_threshold, limit, engine)
 
 
 @router_api.get("/patterns/by-interests")
-def pattern_interests_api(
+async def pattern_interests_api(
     user_id: str,
     weight_threshold: float = 0.0,
     min_error_score: float = 0.0,
     limit: int = 20,
+    engine: str = ENGINE_QUERY,
 ):
-    return pattern_interests(
-        user_id, weight_threshold, min_error_score, limit
+    return await pattern_interests(
+        user_id, weight_threshold, min_error_score, limit, engine
     )
 
 
 @router_api.get("/patterns/multi-hop")
-def pattern_multi_hop_api(
-    user_id: str, performance_threshold: float = 0.75, limit: int = 20
+async def pattern_multi_hop_api(
+    user_id: str, performance_threshold: float = 0.75, limit: int = 20, engine: str = ENGINE_QUERY
 ):
-    return pattern_multi_hop_endpoint(user_id, performance_threshold, limit)
+    return await pattern_multi_hop_endpoint(user_id, performance_threshold, limit, engine)
 
 
 @router_api.get("/data/users")
-def get_users_api():
-    return get_users()
+async def get_users_api():
+    return await get_users()
 
 
 @router_api.get("/data/exercises")
-def get_exercises_api():
-    return get_exercises()
+async def get_exercises_api():
+    return await get_exercises()
 
 
 @router_api.get("/data/skills")
-def get_skills_api():
-    return get_skills()
+async def get_skills_api():
+    return await get_skills()
 
 
 @router_api.get("/data/interests")
-def get_interests_api():
-    return get_interests()
+async def get_interests_api():
+    return await get_interests()
 
 
 @router_api.get("/data/error-types")
-def get_error_types_api():
-    return get_error_types()
+async def get_error_types_api():
+    return await get_error_types()
+
+
+@router_api.get("/data/{resource}/export")
+def export_nodes_api(
+    resource: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+):
+    return export_nodes(resource, format, after, fields, limit)
 
 
 @router_api.get("/data/performed")
-def get_performed_api(limit: int = 200):
-    return get_performed(limit=limit)
+async def get_performed_api(
+    response: Response,
+    limit: int = Query(200, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    user_id: Optional[str] = None,
+    exercise_id: Optional[str] = None,
+):
+    return await get_performed(response, limit, page_token, user_id, exercise_id)
 
 
 @router_api.get("/data/difficulties")
-def get_difficulties_api(limit: int = 200):
-    return get_difficulties(limit=limit)
+async def get_difficulties_api(
+    response: Response,
+    limit: int = Query(200, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    user_id: Optional[str] = None,
+    skill_id: Optional[str] = None,
+):
+    return await get_difficulties(response, limit, page_token, user_id, skill_id)
 
 
 @router_api.get("/data/user-errors")
-def get_user_errors_api(limit: int = 200):
-    return get_user_errors(limit=limit)
+async def get_user_errors_api(
+    response: Response,
+    limit: int = Query(200, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    user_id: Optional[str] = None,
+    error_id: Optional[str] = None,
+):
+    return await get_user_errors(response, limit, page_token, user_id, error_id)
 
 
 @router_api.get("/data/user-interests")
-def get_user_interests_api(limit: int = 200):
-    return get_user_interests(limit=limit)
+async def get_user_interests_api(
+    response: Response,
+    limit: int = Query(200, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    user_id: Optional[str] = None,
+    interest_id: Optional[str] = None,
+):
+    return await get_user_interests(response, limit, page_token, user_id, interest_id)
 
 
 @router_api.get("/data/tags")
-def get_tags_api(limit: int = 200):
-    return get_tags(limit=limit)
+async def get_tags_api(limit: int = 200):
+    return await get_tags(limit=limit)
 
 
 @router_api.get("/data/similarities")
-def get_similarities_api(limit: int = 200):
-    return get_similarities(limit=limit)
+async def get_similarities_api(
+    response: Response,
+    limit: int = Query(200, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    user_id: Optional[str] = None,
+    similar_to: Optional[str] = None,
+):
+    return await get_similarities(response, limit, page_token, user_id, similar_to)
 
 
 @router_api.get("/data/recommended")
-def get_recommended_api(limit: int = 200):
-    return get_recommended(limit=limit)
+async def get_recommended_api(
+    response: Response,
+    limit: int = Query(200, ge=1, le=1000),
+    page_token: Optional[str] = None,
+    user_id: Optional[str] = None,
+    exercise_id: Optional[str] = None,
+):
+    return await get_recommended(response, limit, page_token, user_id, exercise_id)
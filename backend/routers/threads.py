@@ -1,19 +1,29 @@
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query, Response
+from pydantic import BaseModel, Field
 import uuid
 
-from database.cassandra import (
+from database.cassandra_async import (
     create_thread,
     list_threads_by_course,
     get_thread_metadata,
+    get_threads_metadata,
     create_post,
     list_posts_by_thread,
     list_posts_by_user,
     list_courses,
 )
+from database.cassandra import decode_token_bytes
+from database.cache import thread_cache
+from database.course_registry import course_registry
+from database.course_view import course_views
 
 router = APIRouter(prefix="/api", tags=["forum"])
 
+# El body de los listados sigue siendo una lista; el cursor viaja en este header.
+NEXT_PAGE_HEADER = "X-Next-Page-Token"
+
+BATCH_GET_MAX_IDS = 500
+
 
 class ThreadCreate(BaseModel):
     title: str
@@ -24,24 +34,65 @@ class ThreadCreateWithCourse(ThreadCreate):
     course_id: str
 
 
+class ThreadBatchGet(BaseModel):
+    thread_ids: list[str] = Field(min_length=1, max_length=BATCH_GET_MAX_IDS)
+
+
 class PostCreate(BaseModel):
     user_id: str
     content: str
 
 
+def _check_page_token(page_token: str | None):
+    """
+    Solo el formato (base64 estricto, no vacío); si el token es de este listado
+    lo decide la capa de datos, que levanta ValueError.
+    """
+    if not page_token:
+        return
+    try:
+        decode_token_bytes(page_token)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid page_token")
+
+
+def _paged(response: Response, page: dict):
+    if page["next_page_token"]:
+        response.headers[NEXT_PAGE_HEADER] = page["next_page_token"]
+    return page["items"]
+
+
 @router.get("/courses/{course_id}/threads")
-def api_list_threads(course_id: str, limit: int = Query(20, le=100)):
-    return list_threads_by_course(course_id, limit=limit)
+async def api_list_threads(
+    course_id: str,
+    response: Response,
+    limit: int = Query(20, le=100),
+    page_token: str | None = None,
+    sort: str = Query("created", pattern="^(created|activity)$"),
+):
+    """
+    sort=created (orden de threads_by_course) o sort=activity (last_activity_at,
+    de threads_by_course_activity). La primera página sale de la vista en memoria.
+    """
+    _check_page_token(page_token)
+    try:
+        page = await list_threads_by_course(course_id, limit=limit, page_token=page_token, sort=sort)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid page_token")
+    return _paged(response, page)
 
 
 @router.get("/courses")
-def api_list_courses(limit: int = Query(100, le=500)):
-    return list_courses(limit=limit)
+async def api_list_courses(limit: int = Query(100, le=500), details: bool = False):
+    """
+    Lista de course_id; con details=true cada curso trae thread_count y last_activity_at.
+    """
+    return await list_courses(limit=limit, details=details)
 
 
 @router.post("/courses/{course_id}/threads", status_code=201)
-def api_create_thread(course_id: str, payload: ThreadCreate):
-    return create_thread(
+async def api_create_thread(course_id: str, payload: ThreadCreate):
+    return await create_thread(
         course_id=course_id,
         title=payload.title,
         author_id=payload.author_id,
@@ -49,11 +100,11 @@ def api_create_thread(course_id: str, payload: ThreadCreate):
 
 
 @router.post("/threads", status_code=201)
-def api_create_thread_body(payload: ThreadCreateWithCourse):
+async def api_create_thread_body(payload: ThreadCreateWithCourse):
     """
     Variante para crear hilos con el course_id en el cuerpo (p/compatibilidad con el frontend).
     """
-    return create_thread(
+    return await create_thread(
         course_id=payload.course_id,
         title=payload.title,
         author_id=payload.author_id,
@@ -61,9 +112,9 @@ def api_create_thread_body(payload: ThreadCreateWithCourse):
 
 
 @router.get("/threads/{thread_id}")
-def api_get_thread(thread_id: str):
+async def api_get_thread(thread_id: str):
     try:
-        data = get_thread_metadata(thread_id)
+        data = await get_thread_metadata(thread_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid thread_id")
     if not data:
@@ -71,23 +122,45 @@ def api_get_thread(thread_id: str):
     return data
 
 
+@router.post("/threads:batchGet")
+async def api_batch_get_threads(payload: ThreadBatchGet):
+    """
+    Metadata de varios hilos en un request: una entrada por id, en el orden
+    pedido, con found=false para los que no existen.
+    """
+    return await get_threads_metadata(payload.thread_ids)
+
+
 @router.get("/threads/{thread_id}/posts")
-def api_list_posts(thread_id: str, limit: int = Query(100, le=500)):
+async def api_list_posts(
+    thread_id: str,
+    response: Response,
+    limit: int = Query(100, le=500),
+    page_token: str | None = None,
+):
     try:
-        return list_posts_by_thread(thread_id, limit=limit)
+        uuid.UUID(thread_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid thread_id")
+    _check_page_token(page_token)
+    try:
+        page = await list_posts_by_thread(thread_id, limit=limit, page_token=page_token)
+    except ValueError:
+        # token de otro listado, bucket mal formado con CASSANDRA_BUCKETED_POSTS
+        # o paging_state que rechazó Cassandra
+        raise HTTPException(status_code=400, detail="Invalid page_token")
+    return _paged(response, page)
 
 
 @router.post("/threads/{thread_id}/posts", status_code=201)
-def api_create_post(thread_id: str, payload: PostCreate):
+async def api_create_post(thread_id: str, payload: PostCreate):
     try:
         uuid.UUID(thread_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid thread_id")
 
     try:
-        return create_post(thread_id, payload.user_id, payload.content)
+        return await create_post(thread_id, payload.user_id, payload.content)
     except LookupError:
         raise HTTPException(status_code=404, detail="Thread not found")
     except ValueError as exc:  # pragma: no cover - defensive
@@ -95,5 +168,29 @@ def api_create_post(thread_id: str, payload: PostCreate):
 
 
 @router.get("/users/{user_id}/posts")
-def api_list_posts_user(user_id: str, limit: int = Query(50, le=200)):
-    return list_posts_by_user(user_id, limit=limit)
+async def api_list_posts_user(
+    user_id: str,
+    response: Response,
+    limit: int = Query(50, le=200),
+    page_token: str | None = None,
+    include: str | None = Query(None, pattern="^thread$"),
+):
+    """
+    include=thread agrega a cada post su hilo (title, course_id, ...): una
+    lectura por hilo distinto de la página, concurrentes y con el cache de hilos.
+    """
+    _check_page_token(page_token)
+    try:
+        page = await list_posts_by_user(
+            user_id, limit=limit, page_token=page_token, include_thread=include == "thread"
+        )
+    except ValueError:
+        # con CASSANDRA_BUCKETED_POSTS el token lleva el bucket en JSON
+        raise HTTPException(status_code=400, detail="Invalid page_token")
+    return _paged(response, page)
+
+
+@router.get("/cache/stats")
+async def api_cache_stats():
+    stats = await thread_cache.run(thread_cache.stats)
+    return dict(stats, course_views=course_views.stats(), courses=course_registry.stats())
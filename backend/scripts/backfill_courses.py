@@ -0,0 +1,61 @@
+"""
+Llena el registro de cursos (courses + course_thread_counts) a partir de
+thread_metadata, para las bases creadas antes de que existiera.
+
+Cuenta los hilos por curso recorriendo thread_metadata y suma al counter solo la
+diferencia con lo que ya tiene, así se puede volver a correr. Un hilo creado
+mientras corre puede quedar contado dos veces o ninguna: correrlo con la app
+parada o volver a correrlo después.
+Run from backend/ with the same env vars the app uses:
+    python scripts/backfill_courses.py [--fetch-size 1000] [--concurrency 64]
+"""
+import argparse
+import pathlib
+import sys
+
+from cassandra.query import SimpleStatement
+
+# Ensure the backend package is importable when running as a script
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from bulk_load_cassandra import write_course_registry
+from database.cassandra import COURSE_REGISTRY, init_cassandra, statement
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fetch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    session = init_cassandra()
+
+    print("thread_metadata -> courses")
+    threads: dict[str, int] = {}
+    activity = {}
+    scanned = 0
+    result = session.execute(SimpleStatement(
+        "SELECT course_id, created_at, last_activity_at FROM thread_metadata", fetch_size=args.fetch_size
+    ))
+    for r in result:
+        if not r.course_id:
+            continue
+        at = r.last_activity_at or r.created_at
+        threads[r.course_id] = threads.get(r.course_id, 0) + 1
+        if r.course_id not in activity or at > activity[r.course_id]:
+            activity[r.course_id] = at
+        scanned += 1
+        if scanned % 10000 == 0:
+            print(f"  {scanned} rows")
+
+    current = {
+        r.course_id: int(r.thread_count or 0)
+        for r in session.execute(statement("select_course_thread_counts"), (COURSE_REGISTRY,))
+    }
+    missing = {c: n - current.get(c, 0) for c, n in threads.items() if n != current.get(c, 0)}
+    write_course_registry(session, missing, activity, args.concurrency)
+    print(f"  {len(threads)} courses from {scanned} threads ({len(missing)} counters adjusted)")
+
+
+if __name__ == "__main__":
+    main()
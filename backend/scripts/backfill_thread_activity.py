@@ -0,0 +1,58 @@
+"""
+Llena threads_by_course_activity (y activity_buckets_by_course) a partir de
+thread_metadata, para los hilos creados antes de que existiera la tabla.
+
+Es idempotente (son INSERTs), así que se puede volver a correr si se corta.
+Si entra un post mientras corre puede quedar una fila vieja además de la nueva.
+La lectura de sort=activity solo la saltea (devuelve la más reciente); la borra
+el worker de la vista por curso (database/course_view.py) cuando reconcilia ese
+curso, y solo entre las primeras COURSE_VIEW_TOP_K filas. Con
+COURSE_VIEW_ENABLED=false, en un curso que nadie abre o más abajo de esa
+ventana, la fila vieja queda en la tabla (no cambia lo que se devuelve).
+Run from backend/ with the same env vars the app uses:
+    python scripts/backfill_thread_activity.py [--fetch-size 1000] [--concurrency 64]
+"""
+import argparse
+import pathlib
+import sys
+
+# Ensure the backend package is importable when running as a script
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from database.cassandra import init_cassandra, month_bucket
+from migrate_post_buckets import copy_table
+
+
+def activity(r):
+    return r.last_activity_at or r.created_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fetch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    session = init_cassandra()
+
+    print("thread_metadata -> threads_by_course_activity")
+    copy_table(
+        session,
+        "SELECT thread_id, course_id, title, author_id, created_at, last_activity_at FROM thread_metadata",
+        [
+            (
+                "insert_thread_activity",
+                lambda r: (
+                    r.course_id, month_bucket(activity(r)), activity(r), r.thread_id,
+                    r.title, r.author_id, r.created_at,
+                ),
+            ),
+            ("insert_course_activity_bucket", lambda r: (r.course_id, month_bucket(activity(r)))),
+        ],
+        args.fetch_size,
+        args.concurrency,
+    )
+
+
+if __name__ == "__main__":
+    main()
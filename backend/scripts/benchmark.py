@@ -0,0 +1,227 @@
+"""
+Concurrent load driver for the forum and recommendation endpoints.
+
+Picks ids from the manifest written by generate_bench_data.py and runs a
+weighted mix of requests against a running backend for a fixed duration:
+
+    threads      GET  /api/courses/{course_id}/threads
+    posts        GET  /api/threads/{thread_id}/posts
+    create_post  POST /api/threads/{thread_id}/posts
+    recommend    GET  /recommend/{user_id}
+
+Each worker keeps one HTTP keep-alive connection (stdlib only, no extra deps).
+The report is JSON with throughput, error count and p50/p95/p99 latency per
+endpoint, so two runs can be compared with --baseline.
+
+Start the stack (docker compose up), load data, then run from backend/:
+    python scripts/generate_bench_data.py --load
+    python scripts/benchmark.py --duration 60 --concurrency 32 --out results.json
+"""
+import argparse
+import http.client
+import json
+import math
+import pathlib
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+DEFAULT_MIX = "threads=4,posts=4,create_post=1,recommend=2"
+
+
+def build_request(name: str, manifest: dict, rng: random.Random):
+    """
+    Devuelve (método, path, body) para el endpoint `name` con ids al azar del manifest.
+    """
+    if name == "threads":
+        return "GET", f"/api/courses/{rng.choice(manifest['courses'])}/threads?limit=20", None
+    if name == "posts":
+        return "GET", f"/api/threads/{rng.choice(manifest['thread_ids'])}/posts?limit=100", None
+    if name == "create_post":
+        body = {"user_id": rng.choice(manifest["user_ids"]), "content": f"bench post {rng.getrandbits(32):08x}"}
+        return "POST", f"/api/threads/{rng.choice(manifest['thread_ids'])}/posts", body
+    if name == "recommend":
+        return "GET", f"/recommend/{rng.choice(manifest['user_ids'])}", None
+    raise ValueError(f"unknown endpoint {name}")
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    for name in mix:
+        build_request(name, {"courses": [""], "thread_ids": [""], "user_ids": [""]}, random.Random())
+    return mix
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """
+    Percentil por rango más cercano sobre una lista ya ordenada.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(p / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: dict[str, list] = {}
+        self.errors: dict[str, int] = {}
+        self.statuses: dict[str, dict] = {}
+
+    def add(self, name: str, seconds: float, status: int):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            codes = self.statuses.setdefault(name, {})
+            codes[str(status)] = codes.get(str(status), 0) + 1
+            if not 200 <= status < 300:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def worker(worker_id: int, args, manifest: dict, mix: dict, deadline: float, measure_from: float, recorder: Recorder):
+    rng = random.Random(args.seed * 1000 + worker_id)
+    url = urlsplit(args.base_url)
+    names, weights = list(mix), list(mix.values())
+    conn = None
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path, body = build_request(name, manifest, rng)
+        payload = json.dumps(body) if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload else {}
+        started = time.monotonic()
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=args.timeout)
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            # conexión rota: se cuenta como error (status 0) y se reconecta
+            if conn is not None:
+                conn.close()
+            conn = None
+            status = 0
+        if started >= measure_from:
+            recorder.add(name, time.monotonic() - started, status)
+    if conn is not None:
+        conn.close()
+
+
+def summarize(recorder: Recorder, seconds: float) -> dict:
+    endpoints = {}
+    for name, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": recorder.errors.get(name, 0),
+            "statuses": recorder.statuses.get(name, {}),
+            "throughput_rps": round(len(values) / seconds, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "total_requests": total,
+        "total_errors": sum(e["errors"] for e in endpoints.values()),
+        "throughput_rps": round(total / seconds, 2) if seconds else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def compare(current: dict, baseline: dict) -> dict:
+    """
+    Cociente actual/baseline por endpoint (<1 en latencia es mejora, >1 en throughput también).
+    """
+    result = {}
+    for name, stats in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        result[name] = {
+            key: round(stats[key] / before[key], 3) if before[key] else None
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+        }
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the forum and recommendation endpoints")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--manifest", default="bench_data/manifest.json")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds run before measuring")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent workers")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,... (threads, posts, create_post, recommend)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="per request timeout")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    args = parser.parse_args()
+
+    manifest = json.loads(pathlib.Path(args.manifest).read_text(encoding="utf-8"))
+    mix = parse_mix(args.mix)
+    recorder = Recorder()
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    measure_from = time.monotonic() + args.warmup
+    deadline = measure_from + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(worker, i, args, manifest, mix, deadline, measure_from, recorder)
+            for i in range(args.concurrency)
+        ]
+        for future in futures:
+            future.result()
+
+    report = {
+        "started_at": started_at,
+        "git_revision": git_revision(),
+        "config": {
+            "base_url": args.base_url,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "mix": mix,
+            "seed": args.seed,
+            "dataset": manifest.get("counts"),
+        },
+        **summarize(recorder, args.duration),
+    }
+    if args.baseline:
+        report["vs_baseline"] = compare(report, json.loads(pathlib.Path(args.baseline).read_text(encoding="utf-8")))
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        pathlib.Path(args.out).write_text(text + "\n", encoding="utf-8")
+        for name, stats in report["endpoints"].items():
+            print(
+                f"{name:12s} {stats['requests']:8d} req {stats['throughput_rps']:9.1f} rps  "
+                f"p50 {stats['p50_ms']:8.1f}  p95 {stats['p95_ms']:8.1f}  p99 {stats['p99_ms']:8.1f} ms  "
+                f"errors {stats['errors']}"
+            )
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
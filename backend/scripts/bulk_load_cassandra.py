@@ -0,0 +1,333 @@
+"""
+Carga masiva del esquema del foro en Cassandra (datasets de carga / importar el foro viejo).
+
+Lee hilos y posts de JSONL o CSV (según la extensión) de a chunks y los escribe
+con execute_concurrent_with_args, con como mucho --concurrency requests en vuelo.
+thread_counts, last_activity_at y la fila de threads_by_course_activity se
+escriben una vez por hilo al final en vez de una vez por post; el registro de
+cursos una vez por curso y chunk.
+
+Memoria: los posts no se acumulan (un chunk a la vez), pero los hilos sí: para
+los contadores y la actividad del final se guarda un dict con una entrada por
+hilo del archivo (id, curso, título, autor, fechas y contador), así que crece
+con la cantidad de hilos, no con la de posts. Para millones de hilos, partir el
+archivo de hilos (con sus posts) en varias corridas con checkpoints distintos.
+
+Campos de entrada:
+    threads: thread_id, course_id, title, author_id[, created_at]
+    posts:   thread_id, user_id, content[, created_at, post_id]
+thread_id / post_id pueden ser cualquier id de origen (los que no son UUID se
+mapean con uuid5), así correr de nuevo los mismos archivos escribe las mismas
+claves. El avance se guarda en un archivo de checkpoint y una nueva corrida
+sigue desde ahí. Los counters no son idempotentes: el checkpoint se guarda
+apenas termina cada ronda, pero si el proceso muere con una ronda en vuelo la
+nueva corrida la vuelve a sumar (como mucho --concurrency hilos, o los cursos
+de un chunk); scripts/backfill_courses.py corrige los counters de cursos.
+
+Run from backend/ with the same env vars the app uses:
+    python scripts/bulk_load_cassandra.py --threads threads.jsonl --posts posts.csv
+"""
+import argparse
+import collections
+import csv
+import hashlib
+import itertools
+import json
+import pathlib
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.util import uuid_from_time
+
+# Ensure the backend package is importable when running as a script
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from database import cassandra as cassandra_db
+from database.cassandra import COURSE_REGISTRY, init_cassandra, month_bucket, statement, write_timestamp
+
+ID_NAMESPACE = uuid.UUID("6f1c2a4e-3d0b-4c55-9a43-6a2f5d1e8b70")
+
+
+def read_records(path: str):
+    """
+    Generador de dicts, una fila por vez (CSV con header o JSON lines).
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def to_uuid(source_id: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(str(source_id))
+    except ValueError:
+        return uuid.uuid5(ID_NAMESPACE, str(source_id))
+
+
+def post_timeuuid(created_at: datetime, source_key: str) -> uuid.UUID:
+    """
+    TIMEUUID determinístico: el tiempo es created_at y node/clock_seq salen del
+    id de origen, así un re-run escribe las mismas filas en vez de duplicarlas.
+    """
+    digest = hashlib.sha1(source_key.encode("utf-8")).digest()
+    node = int.from_bytes(digest[:6], "big")
+    clock_seq = int.from_bytes(digest[6:8], "big") & 0x3FFF
+    return uuid_from_time(created_at, node=node, clock_seq=clock_seq)
+
+
+def parse_time(value, default: datetime) -> datetime:
+    if not value:
+        return default
+    dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+class Checkpoint:
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.data = {"threads_done": 0, "posts_done": 0, "counts_done": 0, "started_at": None}
+        if path.exists():
+            self.data.update(json.loads(path.read_text()))
+        if not self.data["started_at"]:
+            self.data["started_at"] = datetime.now(timezone.utc).isoformat()
+
+    def save(self, **values):
+        self.data.update(values)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.data))
+        tmp.replace(self.path)
+
+
+class Progress:
+    def __init__(self, label: str):
+        self.label = label
+        self.rows = 0
+        self.started = time.monotonic()
+
+    def add(self, n: int):
+        self.rows += n
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        print(f"  {self.label}: {self.rows} rows ({self.rows / elapsed:.0f} rows/s)")
+
+
+def write_chunk(session, writers, chunk, concurrency):
+    for name, to_params in writers:
+        execute_concurrent_with_args(
+            session,
+            statement(name),
+            [to_params(item) for item in chunk],
+            concurrency=concurrency,
+            raise_on_first_error=True,
+        )
+
+
+def write_course_registry(session, course_threads: dict, course_activity: dict, concurrency):
+    """
+    course_threads: course_id -> hilos nuevos (counter, no idempotente);
+    course_activity: course_id -> actividad máxima del chunk (USING TIMESTAMP,
+    así nunca pisa una más reciente).
+    """
+    if course_threads:
+        execute_concurrent_with_args(
+            session,
+            statement("add_course_thread_count"),
+            [(n, COURSE_REGISTRY, course_id) for course_id, n in course_threads.items()],
+            concurrency=concurrency,
+            raise_on_first_error=True,
+        )
+    if course_activity:
+        execute_concurrent_with_args(
+            session,
+            statement("update_course_activity"),
+            [(write_timestamp(at), at, COURSE_REGISTRY, course_id) for course_id, at in course_activity.items()],
+            concurrency=concurrency,
+            raise_on_first_error=True,
+        )
+
+
+def max_activity(items) -> dict:
+    """
+    Pares (course_id, datetime) -> {course_id: el más reciente}.
+    """
+    result = {}
+    for course_id, at in items:
+        if course_id not in result or at > result[course_id]:
+            result[course_id] = at
+    return result
+
+
+def chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_threads(session, path, threads, checkpoint, args, default_time):
+    """
+    threads: thread_id -> dict(course_id, title, author_id, created_at, post_count, last_activity_at).
+    Siempre se llena leyendo el archivo entero; solo se escriben las filas
+    posteriores al checkpoint.
+    """
+    done = checkpoint.data["threads_done"]
+    progress = Progress("threads")
+    writers = [
+        ("insert_thread_by_course", lambda t: (t["course_id"], t["thread_id"], t["title"], t["author_id"], t["created_at"], t["created_at"])),
+        ("insert_thread_metadata", lambda t: (t["thread_id"], t["course_id"], t["title"], t["author_id"], t["created_at"], t["created_at"])),
+    ]
+    line = 0
+    for chunk in chunks(read_records(path), args.chunk_size):
+        parsed = []
+        for rec in chunk:
+            t = {
+                "thread_id": to_uuid(rec["thread_id"]),
+                "course_id": rec["course_id"],
+                "title": rec["title"],
+                "author_id": rec["author_id"],
+                "created_at": parse_time(rec.get("created_at"), default_time),
+            }
+            threads[t["thread_id"]] = {
+                "course_id": t["course_id"],
+                "title": t["title"],
+                "author_id": t["author_id"],
+                "created_at": t["created_at"],
+                "post_count": 0,
+                "last_activity_at": None,
+            }
+            parsed.append(t)
+        pending = parsed[max(0, done - line):]
+        line += len(chunk)
+        if pending:
+            write_chunk(session, writers, pending, args.concurrency)
+            write_course_registry(
+                session, {}, max_activity((t["course_id"], t["created_at"]) for t in pending), args.concurrency
+            )
+            # el counter va último y justo antes del checkpoint: es lo único que
+            # un re-run del chunk no puede repetir sin contar dos veces
+            write_course_registry(
+                session, collections.Counter(t["course_id"] for t in pending), {}, args.concurrency
+            )
+            checkpoint.save(threads_done=line)
+            progress.add(len(pending))
+
+
+def load_posts(session, path, threads, checkpoint, args, default_time):
+    done = checkpoint.data["posts_done"]
+    progress = Progress("posts")
+    if cassandra_db.bucketed_posts:
+        writers = [
+            ("insert_post_by_thread_bucketed", lambda p: (p["thread_id"], month_bucket(p["created_at"]), p["post_id"], p["user_id"], p["content"], p["created_at"])),
+            ("insert_post_by_user_bucketed", lambda p: (p["user_id"], month_bucket(p["created_at"]), p["created_at"], p["thread_id"], p["post_id"], p["content"])),
+            ("insert_thread_post_bucket", lambda p: (p["thread_id"], month_bucket(p["created_at"]))),
+            ("insert_user_post_bucket", lambda p: (p["user_id"], month_bucket(p["created_at"]))),
+        ]
+    else:
+        writers = [
+            ("insert_post_by_thread", lambda p: (p["thread_id"], p["post_id"], p["user_id"], p["content"], p["created_at"])),
+            ("insert_post_by_user", lambda p: (p["user_id"], p["created_at"], p["thread_id"], p["post_id"], p["content"])),
+        ]
+    line = 0
+    for chunk in chunks(read_records(path), args.chunk_size):
+        parsed = []
+        for i, rec in enumerate(chunk, start=line):
+            tid = to_uuid(rec["thread_id"])
+            thread = threads.get(tid)
+            if thread is None:
+                raise LookupError(f"posts line {i + 1}: unknown thread_id {rec['thread_id']}")
+            created_at = parse_time(rec.get("created_at"), default_time)
+            source_key = str(rec.get("post_id") or f"{rec['thread_id']}:{i}")
+            thread["post_count"] += 1
+            if thread["last_activity_at"] is None or created_at > thread["last_activity_at"]:
+                thread["last_activity_at"] = created_at
+            parsed.append({
+                "thread_id": tid,
+                "post_id": post_timeuuid(created_at, source_key),
+                "user_id": rec["user_id"],
+                "content": rec["content"],
+                "created_at": created_at,
+            })
+        pending = parsed[max(0, done - line):]
+        line += len(chunk)
+        if pending:
+            write_chunk(session, writers, pending, args.concurrency)
+            checkpoint.save(posts_done=line)
+            progress.add(len(pending))
+
+
+def activity_of(thread: dict) -> datetime:
+    return thread["last_activity_at"] or thread["created_at"]
+
+
+def write_thread_aggregates(session, threads, checkpoint, args):
+    """
+    Un solo counter update, un solo last_activity_at y una sola fila de
+    threads_by_course_activity por hilo (los hilos sin posts van por created_at).
+    Los counters no son idempotentes: se escriben al final de cada chunk en
+    rondas de --concurrency hilos y el checkpoint avanza después de cada ronda.
+    Si el proceso muere con una ronda en vuelo, el re-run la vuelve a sumar
+    (como mucho --concurrency hilos con post_count de más).
+    """
+    done = checkpoint.data["counts_done"]
+    progress = Progress("thread aggregates")
+    items = [(tid, t) for tid, t in threads.items()][done:]
+    active_writers = [
+        ("update_thread_metadata_activity", lambda item: (item[1]["last_activity_at"], item[0])),
+        ("update_thread_course_activity", lambda item: (item[1]["last_activity_at"], item[1]["course_id"], item[1]["created_at"], item[0])),
+    ]
+    activity_writers = [
+        ("insert_thread_activity", lambda item: (
+            item[1]["course_id"], month_bucket(activity_of(item[1])), activity_of(item[1]), item[0],
+            item[1]["title"], item[1]["author_id"], item[1]["created_at"],
+        )),
+        ("insert_course_activity_bucket", lambda item: (item[1]["course_id"], month_bucket(activity_of(item[1])))),
+    ]
+    count_writer = ("add_thread_count", lambda item: (item[1]["post_count"], item[0]))
+    for chunk in chunks(items, args.chunk_size):
+        active = [item for item in chunk if item[1]["last_activity_at"] is not None]
+        if active:
+            write_chunk(session, active_writers, active, args.concurrency)
+        write_chunk(session, activity_writers, chunk, args.concurrency)
+        write_course_registry(
+            session, {}, max_activity((t["course_id"], activity_of(t)) for _, t in chunk), args.concurrency
+        )
+        for counts in chunks(chunk, args.concurrency):
+            write_chunk(session, [count_writer], counts, args.concurrency)
+            done += len(counts)
+            checkpoint.save(counts_done=done)
+        progress.add(len(chunk))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load threads and posts into Cassandra")
+    parser.add_argument("--threads", required=True, help="threads .jsonl or .csv")
+    parser.add_argument("--posts", help="posts .jsonl or .csv")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100, help="max requests in flight")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <threads>.checkpoint.json)")
+    args = parser.parse_args()
+
+    checkpoint = Checkpoint(pathlib.Path(args.checkpoint or f"{args.threads}.checkpoint.json"))
+    default_time = datetime.fromisoformat(checkpoint.data["started_at"])
+    checkpoint.save()
+    session = init_cassandra()
+
+    # El orden de inserción del dict es el del archivo, así counts_done sirve como offset
+    threads: dict[uuid.UUID, dict] = {}
+    load_threads(session, args.threads, threads, checkpoint, args, default_time)
+    if args.posts:
+        load_posts(session, args.posts, threads, checkpoint, args, default_time)
+    write_thread_aggregates(session, threads, checkpoint, args)
+    print(f"Done: {len(threads)} threads. Checkpoint: {checkpoint.path}")
+
+
+if __name__ == "__main__":
+    main()
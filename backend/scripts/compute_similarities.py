@@ -0,0 +1,182 @@
+"""
+Offline job that computes SIMILAR_TO edges between users.
+
+Exports the user x exercise PERFORMED.correct_ratio and/or user x skill
+HAS_DIFFICULTY.error_score matrices from Neo4j into SciPy sparse matrices,
+computes the top-k most similar users per user (cosine or Jaccard) with chunked
+sparse matrix products, and writes the pairs back with set_similarity_pairs
+(chunked UNWIND). Each edge records the metric it was computed with.
+
+Run from backend/ with the same env vars the app uses:
+    python scripts/compute_similarities.py --metric cosine --features both --top-k 10
+"""
+import argparse
+import pathlib
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+# Ensure the backend package is importable when running as a script
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from database import neo4j
+from database.neo4j import init_neo4j, set_similarity_pairs
+
+FEATURE_QUERIES = {
+    "performed": """
+        MATCH (u:User)-[p:PERFORMED]->(e:Exercise)
+        WHERE p.correct_ratio IS NOT NULL
+        RETURN u.user_id AS user_id, e.exercise_id AS item_id, p.correct_ratio AS value
+    """,
+    "difficulty": """
+        MATCH (u:User)-[d:HAS_DIFFICULTY]->(s:Skill)
+        WHERE d.error_score IS NOT NULL
+        RETURN u.user_id AS user_id, s.skill_id AS item_id, d.error_score AS value
+    """,
+}
+
+
+def export_matrix(query: str, user_index: dict):
+    """
+    Lee las aristas en streaming y arma una matriz CSR usuarios x items.
+    user_index se comparte entre features para que las filas coincidan.
+    """
+    item_index: dict[str, int] = {}
+    rows, cols, values = [], [], []
+    with neo4j.driver.session() as s:
+        for record in s.run(query):
+            rows.append(user_index.setdefault(record["user_id"], len(user_index)))
+            cols.append(item_index.setdefault(record["item_id"], len(item_index)))
+            values.append(float(record["value"]))
+    return (
+        np.asarray(rows, dtype=np.int64),
+        np.asarray(cols, dtype=np.int64),
+        np.asarray(values, dtype=np.float32),
+        len(item_index),
+    )
+
+
+def build_features(features: list):
+    user_index: dict[str, int] = {}
+    parts = [export_matrix(FEATURE_QUERIES[name], user_index) for name in features]
+    n_users = len(user_index)
+    blocks = [
+        sparse.csr_matrix((values, (rows, cols)), shape=(n_users, n_items))
+        for rows, cols, values, n_items in parts
+    ]
+    matrix = sparse.hstack(blocks, format="csr") if len(blocks) > 1 else blocks[0]
+    matrix.sum_duplicates()
+    user_ids = np.empty(n_users, dtype=object)
+    for user_id, i in user_index.items():
+        user_ids[i] = user_id
+    return matrix, user_ids
+
+
+def l2_normalize(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ matrix
+
+
+def similarity_chunks(matrix, metric: str, chunk_size: int):
+    """
+    Genera (fila inicial, bloque de similitudes CSR) de a chunk_size usuarios.
+    Solo se calculan los pares que comparten algún item (producto disperso).
+    """
+    if metric == "cosine":
+        x = l2_normalize(matrix).tocsr()
+        xt = x.T.tocsc()
+        for start in range(0, x.shape[0], chunk_size):
+            yield start, (x[start:start + chunk_size] @ xt).tocsr()
+    elif metric == "jaccard":
+        b = (matrix > 0).astype(np.float32).tocsr()
+        sizes = np.asarray(b.sum(axis=1)).ravel()
+        bt = b.T.tocsc()
+        for start in range(0, b.shape[0], chunk_size):
+            inter = (b[start:start + chunk_size] @ bt).tocsr()
+            local_rows = np.repeat(np.arange(inter.shape[0]), np.diff(inter.indptr))
+            union = sizes[start + local_rows] + sizes[inter.indices] - inter.data
+            inter.data = inter.data / np.maximum(union, 1.0)
+            yield start, inter
+    else:
+        raise ValueError(f"unknown metric {metric}")
+
+
+def top_k_pairs(start: int, block, user_ids, top_k: int, min_score: float, metric: str):
+    """
+    Top-k vecinos por fila del bloque (argpartition sobre los datos de cada fila).
+    El loop es por usuario, nunca por par de usuarios.
+    """
+    pairs = []
+    for local in range(block.shape[0]):
+        lo, hi = block.indptr[local], block.indptr[local + 1]
+        cols = block.indices[lo:hi]
+        scores = block.data[lo:hi]
+        keep = (cols != start + local) & (scores >= min_score) & (scores > 0)
+        cols, scores = cols[keep], scores[keep]
+        if not len(cols):
+            continue
+        if len(cols) > top_k:
+            idx = np.argpartition(-scores, top_k - 1)[:top_k]
+            cols, scores = cols[idx], scores[idx]
+        user1 = user_ids[start + local]
+        for col, score in zip(cols, scores):
+            pairs.append({
+                "user1": user1,
+                "user2": user_ids[col],
+                "score": round(min(float(score), 1.0), 6),
+                "metric": metric,
+            })
+    return pairs
+
+
+def clear_similarities(batch_size: int = 10000):
+    while True:
+        with neo4j.driver.session() as s:
+            deleted = s.run("""
+                MATCH ()-[r:SIMILAR_TO]->()
+                WITH r LIMIT $batch_size
+                DELETE r
+                RETURN count(*) AS deleted
+            """, batch_size=batch_size).single()["deleted"]
+        if deleted < batch_size:
+            return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute SIMILAR_TO edges offline")
+    parser.add_argument("--metric", choices=["cosine", "jaccard"], default="cosine")
+    parser.add_argument("--features", choices=["performed", "difficulty", "both"], default="both")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--min-score", type=float, default=0.0)
+    parser.add_argument("--chunk-size", type=int, default=2000, help="users per matrix product")
+    parser.add_argument("--clear", action="store_true", help="delete existing SIMILAR_TO edges first")
+    parser.add_argument("--dry-run", action="store_true", help="compute but do not write")
+    args = parser.parse_args()
+
+    init_neo4j()
+    features = ["performed", "difficulty"] if args.features == "both" else [args.features]
+    metric = f"{args.metric}:{'+'.join(features)}"
+
+    started = time.monotonic()
+    matrix, user_ids = build_features(features)
+    print(f"Exported {matrix.shape[0]} users x {matrix.shape[1]} features, {matrix.nnz} values")
+
+    if args.clear and not args.dry_run:
+        clear_similarities()
+
+    written = 0
+    for start, block in similarity_chunks(matrix, args.metric, args.chunk_size):
+        pairs = top_k_pairs(start, block, user_ids, args.top_k, args.min_score, metric)
+        if pairs and not args.dry_run:
+            set_similarity_pairs(pairs)
+        written += len(pairs)
+        print(f"  users {start}-{min(start + args.chunk_size, matrix.shape[0])}: {written} pairs")
+
+    print(f"Done: {written} SIMILAR_TO pairs ({metric}) in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Synthetic dataset generator for benchmarks.
+
+Scales the forum sample (seed_cassandra.py) and the Duolingo-style graph
+(cypher/seed/seedDuolingoSample.cypher) to configurable sizes. Output is
+deterministic for a given --seed and --now:
+
+    <out>/threads.jsonl, <out>/posts.jsonl   input for bulk_load_cassandra.py
+    <out>/manifest.json                      ids the load driver (benchmark.py) samples from
+
+With --load the forum files are loaded with bulk_load_cassandra.py and the graph
+is written to Neo4j with the batch writers of database/neo4j.py.
+
+Run from backend/ with the same env vars the app uses:
+    python scripts/generate_bench_data.py --courses 20 --threads-per-course 500 --users 5000 --load
+"""
+import argparse
+import json
+import pathlib
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# Ensure the backend package is importable when running as a script
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+SKILL_CATEGORIES = ["grammar", "vocabulary", "listening", "pronunciation"]
+INTEREST_NAMES = ["travel", "food", "music", "tech", "sports", "movies", "art", "science", "business", "games"]
+ERROR_CATEGORIES = ["grammar", "orthography", "syntax", "vocabulary"]
+EXERCISE_TYPES = ["translation", "listening", "multiple_choice", "speaking"]
+LANGUAGES = ["en", "es", "fr", "de", "pt"]
+# el driver de carga elige ids al azar de esta muestra
+MANIFEST_MAX_IDS = 100000
+# referencia fija para las fechas: con datetime.now() cada corrida daría otro dataset
+DEFAULT_NOW = "2025-01-01T00:00:00+00:00"
+WORDS = (
+    "verb plural tense gender practice lesson audio flashcard phrase word "
+    "grammar travel airport food order question answer tip help rule"
+).split()
+
+# Relaciones que no tienen writer en database/neo4j.py (en el seed salen del script cypher)
+EVALUATES_QUERY = """
+    UNWIND $rows AS row
+    MATCH (e:Exercise {exercise_id: row.exercise_id})
+    MATCH (s:Skill {skill_id: row.skill_id})
+    MERGE (e)-[:EVALUATES]->(s)
+"""
+
+TAG_ERROR_QUERY = """
+    UNWIND $rows AS row
+    MATCH (e:Exercise {exercise_id: row.exercise_id})
+    MATCH (et:ErrorType {error_id: row.error_id})
+    MERGE (e)-[:TAGGED_AS]->(et)
+"""
+
+
+def padded(prefix: str, n: int, total: int) -> str:
+    return f"{prefix}{n:0{max(3, len(str(total)))}d}"
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def post_count(rng: random.Random, mean: float) -> int:
+    """
+    Cantidad de posts por hilo con cola larga: la mayoría de los hilos son cortos
+    y unos pocos concentran mucha actividad, como en el foro real.
+    """
+    return max(1, min(int(rng.expovariate(1.0 / mean)) + 1, int(mean * 20)))
+
+
+def generate_forum(args, rng: random.Random, out: pathlib.Path, user_ids: list):
+    now = datetime.fromisoformat(args.now)
+    now = (now.replace(tzinfo=timezone.utc) if now.tzinfo is None else now.astimezone(timezone.utc)).replace(microsecond=0)
+    courses = [f"course_{i:03d}" for i in range(args.courses)]
+    thread_ids = []
+    posts_total = 0
+    with open(out / "threads.jsonl", "w", encoding="utf-8") as threads_f, \
+            open(out / "posts.jsonl", "w", encoding="utf-8") as posts_f:
+        for course_id in courses:
+            for _ in range(args.threads_per_course):
+                thread_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+                created_at = now - timedelta(seconds=rng.randint(0, args.days * 86400))
+                threads_f.write(json.dumps({
+                    "thread_id": thread_id,
+                    "course_id": course_id,
+                    "title": sentence(rng, rng.randint(3, 8)),
+                    "author_id": rng.choice(user_ids),
+                    "created_at": created_at.isoformat(),
+                }) + "\n")
+                thread_ids.append(thread_id)
+
+                span = max(1, int((now - created_at).total_seconds()))
+                for n in range(post_count(rng, args.posts_per_thread)):
+                    posts_f.write(json.dumps({
+                        "thread_id": thread_id,
+                        "post_id": f"{thread_id}:{n}",
+                        "user_id": rng.choice(user_ids),
+                        "content": sentence(rng, rng.randint(5, 40)),
+                        "created_at": (created_at + timedelta(seconds=rng.randint(0, span))).isoformat(),
+                    }) + "\n")
+                    posts_total += 1
+    return courses, thread_ids, posts_total
+
+
+def generate_graph(args, rng: random.Random, user_ids: list):
+    """
+    Devuelve {nombre: filas} en el formato de los *_batch de database/neo4j.py.
+    """
+    skills = [padded("skill_", i, args.skills) for i in range(args.skills)]
+    interests = [
+        INTEREST_NAMES[i] if i < len(INTEREST_NAMES) else padded("interest_", i, args.interests)
+        for i in range(args.interests)
+    ]
+    error_types = [padded("error_", i, args.error_types) for i in range(args.error_types)]
+    exercises = [padded("ex_", i, args.exercises) for i in range(args.exercises)]
+
+    graph = {
+        "skills": [
+            {"skill_id": s, "name": s.replace("_", " ").title(),
+             "category": rng.choice(SKILL_CATEGORIES), "level": rng.randint(1, 5)}
+            for s in skills
+        ],
+        "interests": [{"interest_id": t, "name": t.title(), "category": "topic"} for t in interests],
+        "error_types": [
+            {"error_id": e, "description": f"Synthetic error {e}", "category": rng.choice(ERROR_CATEGORIES)}
+            for e in error_types
+        ],
+        "exercises": [
+            {"exercise_id": e, "type": rng.choice(EXERCISE_TYPES),
+             "difficulty": rng.randint(1, 5), "language": rng.choice(LANGUAGES)}
+            for e in exercises
+        ],
+        "users": [
+            {"user_id": u, "primary_language": rng.choice(LANGUAGES),
+             "current_level": rng.randint(1, 10), "streak": rng.randint(0, 365)}
+            for u in user_ids
+        ],
+        "evaluates": [], "tags": [], "error_tags": [],
+        "difficulties": [], "user_errors": [], "user_interests": [],
+        "performed": [], "similarities": [],
+    }
+    for e in exercises:
+        for s in rng.sample(skills, min(len(skills), rng.randint(1, 2))):
+            graph["evaluates"].append({"exercise_id": e, "skill_id": s})
+        graph["tags"].append({"exercise_id": e, "interest_id": rng.choice(interests)})
+        graph["error_tags"].append({"exercise_id": e, "error_id": rng.choice(error_types)})
+
+    for u in user_ids:
+        for s in rng.sample(skills, min(len(skills), args.difficulties_per_user)):
+            graph["difficulties"].append({"user_id": u, "skill_id": s, "error_score": round(rng.random(), 3)})
+        for e in rng.sample(error_types, min(len(error_types), 2)):
+            graph["user_errors"].append({"user_id": u, "error_id": e, "frequency": round(rng.random(), 3)})
+        for t in rng.sample(interests, min(len(interests), 2)):
+            graph["user_interests"].append({"user_id": u, "interest_id": t, "weight": round(rng.uniform(0.3, 1.0), 3)})
+        for e in rng.sample(exercises, min(len(exercises), args.performed_per_user)):
+            graph["performed"].append({
+                "user_id": u, "exercise_id": e,
+                "correct_ratio": round(rng.betavariate(4, 2), 3), "attempts": rng.randint(1, 10),
+            })
+        # vecinos al azar; para similitudes reales correr compute_similarities.py después
+        neighbors = rng.sample(user_ids, min(len(user_ids), args.similar_per_user + 1))
+        for v in [v for v in neighbors if v != u][:args.similar_per_user]:
+            graph["similarities"].append({
+                "user1": u, "user2": v, "score": round(rng.uniform(0.5, 1.0), 3), "metric": "synthetic",
+            })
+    return graph
+
+
+def write_graph(graph: dict, chunk_rows: int):
+    from database import neo4j
+    from database.neo4j import init_neo4j
+
+    writers = [
+        ("skills", neo4j.upsert_skills_batch),
+        ("interests", neo4j.upsert_interests_batch),
+        ("error_types", neo4j.upsert_error_types_batch),
+        ("exercises", neo4j.upsert_exercises_batch),
+        ("users", neo4j.upsert_users_batch),
+        ("evaluates", lambda rows: neo4j.write_rows(EVALUATES_QUERY, rows)),
+        ("tags", neo4j.tag_exercise_with_interest_batch),
+        ("error_tags", lambda rows: neo4j.write_rows(TAG_ERROR_QUERY, rows)),
+        ("difficulties", neo4j.set_difficulty_batch),
+        ("user_errors", neo4j.set_user_error_batch),
+        ("user_interests", neo4j.set_user_interest_batch),
+        ("performed", neo4j.register_performance_batch),
+        ("similarities", neo4j.set_similarity_pairs),
+    ]
+    init_neo4j()
+    for name, writer in writers:
+        started = time.monotonic()
+        rows = graph[name]
+        # una transacción por bloque: write_rows junta todo lo que recibe en una sola
+        for i in range(0, len(rows), chunk_rows):
+            writer(rows[i:i + chunk_rows])
+        print(f"  neo4j {name}: {len(rows)} rows in {time.monotonic() - started:.1f}s")
+
+
+def load_cassandra(out: pathlib.Path):
+    script = pathlib.Path(__file__).resolve().parent / "bulk_load_cassandra.py"
+    # los archivos se acaban de regenerar: un checkpoint de una corrida anterior
+    # saltearía líneas que ahora son otras
+    checkpoint = out / "cassandra.checkpoint.json"
+    checkpoint.unlink(missing_ok=True)
+    subprocess.run(
+        [
+            sys.executable, str(script),
+            "--threads", str(out / "threads.jsonl"),
+            "--posts", str(out / "posts.jsonl"),
+            "--checkpoint", str(checkpoint),
+        ],
+        check=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic forum + graph data for benchmarks")
+    parser.add_argument("--out", default="bench_data", help="output directory")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--courses", type=int, default=10)
+    parser.add_argument("--threads-per-course", type=int, default=200)
+    parser.add_argument("--posts-per-thread", type=float, default=15, help="mean posts per thread")
+    parser.add_argument("--days", type=int, default=180, help="spread of created_at into the past")
+    parser.add_argument("--now", default=DEFAULT_NOW, help="ISO timestamp the dates are spread back from")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--exercises", type=int, default=500)
+    parser.add_argument("--skills", type=int, default=30)
+    parser.add_argument("--interests", type=int, default=10)
+    parser.add_argument("--error-types", type=int, default=12)
+    parser.add_argument("--difficulties-per-user", type=int, default=3)
+    parser.add_argument("--performed-per-user", type=int, default=20)
+    parser.add_argument("--similar-per-user", type=int, default=5)
+    parser.add_argument("--load", action="store_true", help="load Cassandra and Neo4j after generating")
+    parser.add_argument("--skip-cassandra", action="store_true")
+    parser.add_argument("--skip-neo4j", action="store_true")
+    parser.add_argument("--chunk-rows", type=int, default=20000, help="rows per Neo4j transaction")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    out = pathlib.Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    user_ids = [padded("u", i + 1, args.users) for i in range(args.users)]
+
+    started = time.monotonic()
+    courses, thread_ids, posts_total = generate_forum(args, rng, out, user_ids)
+    print(f"Forum: {len(courses)} courses, {len(thread_ids)} threads, {posts_total} posts -> {out}")
+    graph = generate_graph(args, rng, user_ids)
+    print("Graph: " + ", ".join(f"{len(rows)} {name}" for name, rows in graph.items()))
+
+    manifest = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "args": vars(args),
+        "courses": courses,
+        "thread_ids": thread_ids[:MANIFEST_MAX_IDS],
+        # todos tienen HAS_DIFFICULTY, así las recomendaciones no salen vacías
+        "user_ids": user_ids[:MANIFEST_MAX_IDS],
+        "counts": {"threads": len(thread_ids), "posts": posts_total, **{k: len(v) for k, v in graph.items()}},
+    }
+    (out / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+
+    if args.load and not args.skip_cassandra:
+        load_cassandra(out)
+    if args.load and not args.skip_neo4j:
+        write_graph(graph, args.chunk_rows)
+    print(f"Done in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Copia posts_by_thread / posts_by_user a las tablas particionadas por mes
+(posts_by_thread_bucketed, posts_by_user_bucketed y sus índices de buckets).
+
+Es idempotente (son INSERTs), así que se puede volver a correr si se corta.
+Run from backend/ with the same env vars the app uses:
+    python scripts/migrate_post_buckets.py [--fetch-size 1000] [--concurrency 64]
+Después de migrar, levantar la app con CASSANDRA_BUCKETED_POSTS=true.
+"""
+import argparse
+import pathlib
+import sys
+
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import SimpleStatement
+
+# Ensure the backend package is importable when running as a script
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from database.cassandra import init_cassandra, month_bucket, statement
+
+
+def copy_table(session, select_cql, writers, fetch_size, concurrency):
+    """
+    Recorre la tabla origen página por página y, por cada página, escribe con
+    execute_concurrent_with_args en cada tabla destino.
+    writers: [(nombre de sentencia, fila -> params)]
+    """
+    copied = 0
+    result = session.execute(SimpleStatement(select_cql, fetch_size=fetch_size))
+    while True:
+        rows = result.current_rows
+        for name, to_params in writers:
+            execute_concurrent_with_args(
+                session,
+                statement(name),
+                [to_params(r) for r in rows],
+                concurrency=concurrency,
+                raise_on_first_error=True,
+            )
+        copied += len(rows)
+        print(f"  {copied} rows")
+        if not result.has_more_pages:
+            return copied
+        result.fetch_next_page()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fetch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    session = init_cassandra(bucketed=True)
+
+    print("posts_by_thread -> posts_by_thread_bucketed")
+    copy_table(
+        session,
+        "SELECT thread_id, post_id, user_id, content, created_at FROM posts_by_thread",
+        [
+            (
+                "insert_post_by_thread_bucketed",
+                lambda r: (r.thread_id, month_bucket(r.created_at), r.post_id, r.user_id, r.content, r.created_at),
+            ),
+            ("insert_thread_post_bucket", lambda r: (r.thread_id, month_bucket(r.created_at))),
+        ],
+        args.fetch_size,
+        args.concurrency,
+    )
+
+    print("posts_by_user -> posts_by_user_bucketed")
+    copy_table(
+        session,
+        "SELECT user_id, created_at, thread_id, post_id, content FROM posts_by_user",
+        [
+            (
+                "insert_post_by_user_bucketed",
+                lambda r: (r.user_id, month_bucket(r.created_at), r.created_at, r.thread_id, r.post_id, r.content),
+            ),
+            ("insert_user_post_bucket", lambda r: (r.user_id, month_bucket(r.created_at))),
+        ],
+        args.fetch_size,
+        args.concurrency,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -876,15 +876,22 @@ function DataTable({ title, endpoint, columns }: DataTableProps) {
   const [rows, setRows] = useState<any[]>([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [nextToken, setNextToken] = useState<string | null>(null);
 
-  const fetchRows = async () => {
+  // pageToken: cursor del header X-Next-Page-Token; con cursor se agregan filas
+  const fetchRows = async (pageToken?: string) => {
     setLoading(true);
     setError(null);
     try {
-      const res = await fetch(`${RECOMMEND_BASE}${endpoint}`);
+      const url = pageToken
+        ? `${RECOMMEND_BASE}${endpoint}?page_token=${encodeURIComponent(pageToken)}`
+        : `${RECOMMEND_BASE}${endpoint}`;
+      const res = await fetch(url);
       if (!res.ok) throw new Error(`Error ${res.status}`);
       const data = await res.json();
-      setRows(Array.isArray(data) ? data : []);
+      const page = Array.isArray(data) ? data : [];
+      setRows(pageToken ? (prev) => [...prev, ...page] : page);
+      setNextToken(res.headers.get("X-Next-Page-Token"));
     } catch (err: any) {
       setError(err?.message || "Error");
     } finally {
@@ -901,7 +908,7 @@ function DataTable({ title, endpoint, columns }: DataTableProps) {
           </p>
           <h2 className="font-semibold text-lg">{title}</h2>
         </div>
-        <button className="btn" onClick={fetchRows} disabled={loading}>
+        <button className="btn" onClick={() => fetchRows()} disabled={loading}>
           {loading ? "Cargando..." : "Refrescar"}
         </button>
       </div>
@@ -941,6 +948,15 @@ function DataTable({ title, endpoint, columns }: DataTableProps) {
           </table>
         </div>
       )}
+      {nextToken && (
+        <button
+          className="btn"
+          onClick={() => fetchRows(nextToken)}
+          disabled={loading}
+        >
+          Cargar más
+        </button>
+      )}
     </div>
   );
 }